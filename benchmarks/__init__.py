@@ -0,0 +1,3 @@
+"""
+Timing scripts for data_algebra, not part of the installed package.
+"""
@@ -0,0 +1,68 @@
+"""
+Compare two timing files written by benchmarks.node_types.
+
+Cases are matched on (node, engine, n_row, n_col).  A case is reported as a
+regression when its new time is more than --threshold times its old time.
+
+run as:
+    python -m benchmarks.compare old.json new.json
+"""
+
+import argparse
+import json
+import sys
+
+
+def _case_key(rec):
+    return rec["node"], rec["engine"], rec["n_row"], rec["n_col"]
+
+
+def compare(old, new, *, threshold=1.2):
+    """
+    :param old: timing report (dictionary from benchmarks.node_types.run())
+    :param new: timing report
+    :param threshold: ratio of new to old time counted as a regression
+    :return: list of (case key, old seconds, new seconds, ratio, is regression), by key
+    """
+    old_times = {_case_key(r): r["seconds"] for r in old["results"]}
+    rows = []
+    for r in new["results"]:
+        key = _case_key(r)
+        if key not in old_times.keys():
+            continue
+        ratio = r["seconds"] / max(old_times[key], 1e-9)
+        rows.append((key, old_times[key], r["seconds"], ratio, ratio > threshold))
+    rows.sort(key=lambda row: row[0])
+    return rows
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="compare data_algebra timing files")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    opts = parser.parse_args(args)
+    with open(opts.old) as f:
+        old = json.load(f)
+    with open(opts.new) as f:
+        new = json.load(f)
+    rows = compare(old, new, threshold=opts.threshold)
+    print("old commit", old["environment"]["commit"])
+    print("new commit", new["environment"]["commit"])
+    print("node", "engine", "n_row", "n_col", "old_seconds", "new_seconds", "ratio")
+    n_regressions = 0
+    for (key, old_s, new_s, ratio, regression) in rows:
+        print(
+            *key,
+            round(old_s, 6),
+            round(new_s, 6),
+            round(ratio, 3),
+            "REGRESSION" if regression else ""
+        )
+        if regression:
+            n_regressions = n_regressions + 1
+    return n_regressions
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main() > 0 else 0)
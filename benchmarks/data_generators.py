@@ -0,0 +1,61 @@
+"""
+Synthetic data for the timing scripts.
+"""
+
+import numpy
+
+import data_algebra
+import data_algebra.cdata
+
+
+def make_table(*, n_row, n_col, n_group=100, prefix="x_", na_rate=0.1, seed=2020):
+    """
+    Build a table with an integer "id" column, a string group column "g", and
+    n_col - 2 numeric columns prefix + "0", prefix + "1", ... (with some missing values).
+
+    :param n_row: number of rows
+    :param n_col: number of columns, at least 4
+    :param n_group: number of distinct values of g
+    :param prefix: prefix of the numeric column names
+    :param na_rate: fraction of numeric values that are missing
+    :param seed: random seed
+    :return: data frame
+    """
+    if n_col < 4:
+        raise ValueError("n_col must be at least 4")
+    rng = numpy.random.RandomState(seed)
+    groups = numpy.array(["g_" + str(i) for i in range(n_group)], dtype=object)
+    cols = {
+        "id": numpy.arange(n_row),
+        "g": groups[rng.choice(n_group, size=n_row)],
+    }
+    for i in range(n_col - 2):
+        v = rng.normal(size=n_row)
+        v[rng.uniform(size=n_row) < na_rate] = numpy.nan
+        cols[prefix + str(i)] = v
+    return data_algebra.default_data_model.pd.DataFrame(cols)
+
+
+def value_columns(d, *, prefix="x_"):
+    """
+    :return: names of the numeric columns of a make_table() result
+    """
+    return [c for c in d.columns if c.startswith(prefix)]
+
+
+def record_spec(*, value_cols, record_keys=("id",)):
+    """
+    Record specification moving value_cols into rows of a "measure", "value" block.
+
+    :param value_cols: names of the columns to move
+    :param record_keys: columns identifying a record
+    :return: data_algebra.cdata.RecordSpecification
+    """
+    control_table = data_algebra.default_data_model.pd.DataFrame(
+        {"measure": [c for c in value_cols], "value": [c for c in value_cols]}
+    )
+    return data_algebra.cdata.RecordSpecification(
+        control_table,
+        control_table_keys=["measure"],
+        record_keys=[k for k in record_keys],
+    )
@@ -0,0 +1,61 @@
+"""
+Time importing data_algebra and generating SQL, in fresh interpreters.
+
+Building operator DAGs and generating SQL should not import Pandas or the
+optional pretty printers (black, sqlparse), so SQL only command line tools start
+quickly.  tests/test_lazy_import.py checks the module list, this script reports
+the times.
+
+run as:
+    python -m benchmarks.import_time
+"""
+
+import subprocess
+import sys
+import timeit
+
+
+sql_script = """
+import sys
+import data_algebra.SQLite
+from data_algebra.data_ops import TableDescription
+ops = TableDescription("d", ["g", "x"]).extend({"y": "x + 1"}).project(
+    {"s": "y.sum()"}, group_by=["g"]
+)
+sql = ops.to_sql(data_algebra.SQLite.SQLiteModel())
+heavy = ["pandas", "numpy", "black", "sqlparse", "yaml", "graphviz"]
+print(" ".join([m for m in heavy if m in sys.modules]))
+"""
+
+cases = {
+    "python": "pass",
+    "import data_algebra": "import data_algebra",
+    "import data_algebra.data_ops": "import data_algebra.data_ops",
+    "generate SQL": sql_script,
+    "default_data_model": "import data_algebra; data_algebra.default_data_model",
+}
+
+
+def run_script(script):
+    """
+    :return: standard output of running script in a new interpreter
+    """
+    return subprocess.check_output([sys.executable, "-c", script]).decode("utf-8")
+
+
+def time_script(script, *, repeat=5):
+    """
+    :return: minimum wall clock seconds to run script in a new interpreter
+    """
+    return min(timeit.repeat(lambda: run_script(script), number=1, repeat=repeat))
+
+
+def main():
+    print("case", "seconds")
+    for (name, script) in cases.items():
+        print(name, round(time_script(script), 4))
+    print("heavy modules loaded generating SQL:", run_script(sql_script).strip())
+
+
+if __name__ == "__main__":
+    main()
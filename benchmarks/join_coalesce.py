@@ -0,0 +1,52 @@
+"""
+Time natural_join() on the Pandas engine as the number of shared (non-key) columns grows.
+
+The coalescing of shared columns is done as one block operation, so the time
+per shared column should fall as the number of shared columns grows.
+
+run as:
+    python -m benchmarks.join_coalesce
+"""
+
+import timeit
+
+import numpy
+
+import data_algebra
+from data_algebra.data_ops import *
+
+
+def make_frames(*, n_row, n_shared, seed=2020):
+    rng = numpy.random.RandomState(seed)
+    pd = data_algebra.default_data_model.pd
+    left = {"id": numpy.arange(n_row)}
+    right = {"id": numpy.arange(n_row)}
+    for i in range(n_shared):
+        c = "c_" + str(i)
+        vl = rng.normal(size=n_row)
+        vl[rng.uniform(size=n_row) < 0.2] = numpy.nan
+        left[c] = vl
+        right[c] = rng.normal(size=n_row)
+    return pd.DataFrame(left), pd.DataFrame(right)
+
+
+def time_join(*, n_row, n_shared, repeat=5):
+    left, right = make_frames(n_row=n_row, n_shared=n_shared)
+    ops = describe_table(left, "left").natural_join(
+        b=describe_table(right, "right"), by=["id"], jointype="left"
+    )
+    data_map = {"left": left, "right": right}
+    ops.eval(data_map)  # warm up
+    return min(timeit.repeat(lambda: ops.eval(data_map), number=1, repeat=repeat))
+
+
+def main():
+    n_row = 10000
+    print("n_shared", "seconds", "seconds_per_shared_column")
+    for n_shared in [10, 50, 100, 200, 400]:
+        t = time_join(n_row=n_row, n_shared=n_shared)
+        print(n_shared, round(t, 4), round(t / n_shared, 6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Time each node type on the Pandas and SQLite engines, over a grid of table sizes,
+and write the timings to JSON so runs on different commits can be compared (see
+benchmarks.compare).
+
+For Pandas the time is that of ops.eval().  For SQLite the tables are inserted
+once (that time is reported separately) and the time is that of running the
+query from ops.to_sql().  Size combinations with more than --max-cells cells are
+skipped.
+
+run as:
+    python -m benchmarks.node_types --output timings.json
+    python -m benchmarks.node_types --rows 1000 10000 --widths 5 50 --output quick.json
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import sqlite3
+import subprocess
+import sys
+import timeit
+
+import numpy
+
+import data_algebra
+import data_algebra.SQLite
+from data_algebra.cdata import RecordMap
+from data_algebra.data_ops import *
+
+from benchmarks.data_generators import make_table, value_columns, record_spec
+
+
+default_rows = [1000, 10000, 100000, 1000000, 10000000]
+default_widths = [5, 50, 1000]
+
+
+def _extend_plain(tables):
+    x = value_columns(tables["d"])
+    return describe_table(tables["d"], "d").extend({"y": x[0] + " + " + x[1]})
+
+
+def _extend_windowed(tables):
+    x = value_columns(tables["d"])
+    return describe_table(tables["d"], "d").extend(
+        {"y": x[0] + ".max()"}, partition_by=["g"]
+    )
+
+
+def _project(tables):
+    x = value_columns(tables["d"])
+    return describe_table(tables["d"], "d").project(
+        {"s": x[0] + ".sum()", "m": x[1] + ".max()"}, group_by=["g"]
+    )
+
+
+def _natural_join(tables):
+    return describe_table(tables["d"], "d").natural_join(
+        b=describe_table(tables["f"], "f"), by=["id"], jointype="LEFT"
+    )
+
+
+def _concat_rows(tables):
+    return describe_table(tables["d"], "d").concat_rows(
+        describe_table(tables["e"], "e")
+    )
+
+
+def _order_rows(tables):
+    x = value_columns(tables["d"])
+    return describe_table(tables["d"], "d").order_rows(["g", x[0]])
+
+
+def _convert_records(tables):
+    x = value_columns(tables["d"])
+    return describe_table(tables["d"], "d").convert_records(
+        RecordMap(blocks_out=record_spec(value_cols=x[0:2]))
+    )
+
+
+# node type to (function building ops from tables, names of tables used)
+node_types = {
+    "ExtendNode_plain": (_extend_plain, ["d"]),
+    "ExtendNode_windowed": (_extend_windowed, ["d"]),
+    "ProjectNode": (_project, ["d"]),
+    "NaturalJoinNode": (_natural_join, ["d", "f"]),
+    "ConcatRowsNode": (_concat_rows, ["d", "e"]),
+    "OrderRowsNode": (_order_rows, ["d"]),
+    "ConvertRecordsNode": (_convert_records, ["d"]),
+}
+
+
+def make_tables(*, n_row, n_col):
+    """
+    :return: dictionary of the tables the node type cases use
+    """
+    d = make_table(n_row=n_row, n_col=n_col, seed=2020)
+    e = make_table(n_row=n_row, n_col=n_col, seed=2021)
+    # join partner: shares half its value columns with d (to be coalesced)
+    f = make_table(n_row=n_row, n_col=n_col, seed=2022)
+    n_shared = (n_col - 2) // 2
+    f = f.rename(columns={c: "y_" + c for c in value_columns(f)[n_shared:]})
+    return {"d": d, "e": e, "f": f}
+
+
+def time_pandas(ops, data_map, *, repeat):
+    """
+    :return: list of seconds, and number of result rows
+    """
+    res = ops.eval(data_map)  # warm up
+    times = timeit.repeat(lambda: ops.eval(data_map), number=1, repeat=repeat)
+    return times, res.shape[0]
+
+
+def time_sqlite(ops, data_map, *, repeat):
+    """
+    :return: list of seconds, insert seconds, and number of result rows
+    """
+    db_model = data_algebra.SQLite.SQLiteModel()
+    with sqlite3.connect(":memory:") as conn:
+        db_model.prepare_connection(conn)
+        temp_tables = dict()
+        sql = ops.to_sql(db_model, temp_tables=temp_tables)
+        start = timeit.default_timer()
+        for k, d in data_map.items():
+            db_model.insert_table(conn, d, table_name=k)
+        insert_time = timeit.default_timer() - start
+        for k, d in temp_tables.items():
+            db_model.insert_table(conn, d, table_name=k)
+        res = db_model.read_query(conn, sql)  # warm up
+        times = timeit.repeat(
+            lambda: db_model.read_query(conn, sql), number=1, repeat=repeat
+        )
+    return times, insert_time, res.shape[0]
+
+
+def _git_commit():
+    # noinspection PyBroadException
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL
+            )
+            .decode("utf-8")
+            .strip()
+        )
+    except Exception:
+        return None
+
+
+def environment():
+    """
+    :return: dictionary describing the machine and package versions
+    """
+    return {
+        "commit": _git_commit(),
+        "time": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": sys.version,
+        "platform": platform.platform(),
+        "data_algebra": data_algebra.__version__,
+        "pandas": data_algebra.default_data_model.pd.__version__,
+        "numpy": numpy.__version__,
+        "sqlite": sqlite3.sqlite_version,
+    }
+
+
+def run(
+    *,
+    rows=None,
+    widths=None,
+    engines=("pandas", "sqlite"),
+    nodes=None,
+    repeat=3,
+    max_cells=10 ** 8,
+    verbose=True,
+):
+    """
+    Time the node types.
+
+    :param rows: list of row counts
+    :param widths: list of column counts
+    :param engines: engines to time, from "pandas" and "sqlite"
+    :param nodes: node types to time (keys of node_types), None for all
+    :param repeat: timings per case, the minimum is the headline number
+    :param max_cells: skip sizes with more than this many cells per table
+    :param verbose: if True print a line per case
+    :return: dictionary with "environment" and "results"
+    """
+    if rows is None:
+        rows = default_rows
+    if widths is None:
+        widths = default_widths
+    if nodes is None:
+        nodes = [k for k in node_types.keys()]
+    unknown = set(nodes) - set(node_types.keys())
+    if len(unknown) > 0:
+        raise ValueError("unknown node types: " + str(unknown))
+    unknown = set(engines) - {"pandas", "sqlite"}
+    if len(unknown) > 0:
+        raise ValueError("unknown engines: " + str(unknown))
+    results = []
+    for n_row in rows:
+        for n_col in widths:
+            if n_row * n_col > max_cells:
+                continue
+            tables = make_tables(n_row=n_row, n_col=n_col)
+            for node in nodes:
+                build, used = node_types[node]
+                ops = build(tables)
+                data_map = {k: tables[k] for k in used}
+                for engine in engines:
+                    insert_seconds = None
+                    if engine == "pandas":
+                        times, n_res = time_pandas(ops, data_map, repeat=repeat)
+                    else:
+                        times, insert_seconds, n_res = time_sqlite(
+                            ops, data_map, repeat=repeat
+                        )
+                    rec = {
+                        "node": node,
+                        "engine": engine,
+                        "n_row": n_row,
+                        "n_col": n_col,
+                        "seconds": min(times),
+                        "times": times,
+                        "insert_seconds": insert_seconds,
+                        "result_rows": n_res,
+                    }
+                    results.append(rec)
+                    if verbose:
+                        print(node, engine, n_row, n_col, round(rec["seconds"], 6))
+    return {"environment": environment(), "results": results}
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="time data_algebra node types")
+    parser.add_argument("--rows", type=int, nargs="+", default=default_rows)
+    parser.add_argument("--widths", type=int, nargs="+", default=default_widths)
+    parser.add_argument(
+        "--engines",
+        nargs="+",
+        default=["pandas", "sqlite"],
+        choices=["pandas", "sqlite"],
+    )
+    parser.add_argument(
+        "--nodes", nargs="+", default=None, choices=[k for k in node_types.keys()]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-cells", type=int, default=10 ** 8)
+    parser.add_argument("--output", default="node_timings.json")
+    opts = parser.parse_args(args)
+    report = run(
+        rows=opts.rows,
+        widths=opts.widths,
+        engines=opts.engines,
+        nodes=opts.nodes,
+        repeat=opts.repeat,
+        max_cells=opts.max_cells,
+    )
+    with open(opts.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print("wrote", opts.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -150,11 +150,43 @@ class SQLiteModel(data_algebra.db_model.DBModel, data_algebra.eval_model.EvalMod
         cur.execute("DROP TABLE IF EXISTS " + table_name)
         d.to_sql(name=table_name, con=conn)
 
-    def eval(self, ops, data_map, *, eval_env=None, data_model=None, narrow=True):
+    def eval(
+        self, ops, data_map, *, eval_env=None, data_model=None, narrow=True, profile=None
+    ):
+        """
+        Evaluate ops in an in-memory SQLite database.
+
+        :param ops: data_algebra.data_ops.ViewRepresentation
+        :param data_map: map from table names to data frames
+        :param eval_env: not used
+        :param data_model: not used
+        :param narrow: not used
+        :param profile: optional data_algebra.eval_profile.EvalProfile, the database runs
+                        ops as a single query, so this records the table inserts and the
+                        query (as the cost of ops)
+        :return: result
+        """
         with sqlite3.connect(":memory:") as conn:
             self.prepare_connection(conn)
+            tables = ops.get_tables()
             for k, d in data_map.items():
-                self.insert_table(conn, d, table_name=k)
+                if (profile is not None) and (k in tables.keys()):
+
+                    def insert():
+                        self.insert_table(conn, d, table_name=k)
+                        return d
+
+                    profile.record(tables[k], insert)
+                else:
+                    self.insert_table(conn, d, table_name=k)
             query = ops.to_sql(self)
-            res = self.read_query(conn, query)
+            if profile is not None:
+                input_rows = sum([data_map[k].shape[0] for k in tables.keys()])
+                res = profile.record(
+                    ops,
+                    lambda: self.read_query(conn, query),
+                    input_rows=input_rows,
+                )
+            else:
+                res = self.read_query(conn, query)
         return res
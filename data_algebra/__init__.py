@@ -19,7 +19,40 @@ the `rquery`<https://github.com/WinVector/rquery> and `rqdatatable`<https://gith
 Recommended packages include: Pandas, PyYAML (supplies yaml), sqlparse, and black. 
 """
 
-import data_algebra.pandas_model
-
-default_data_model = data_algebra.pandas_model.PandasModel()
+import importlib
+import threading
+
+
+# submodules loaded on first attribute access, as they (or what they import) are
+# expensive to import, and not needed to build operator DAGs or generate SQL
+_lazy_submodules = {
+    "pandas_model",
+    "parallel_pandas_model",
+    "streaming",
+    "out_of_core",
+    "cdata",
+    "cdata_impl",
+    "diagram",
+    "eval_profile",
+    "test_util",
+    "yaml",
+}
+
+_default_data_model_lock = threading.Lock()
+
+
+def __getattr__(name):
+    # module level __getattr__ (PEP 562), only called for names not yet defined
+    if name == "default_data_model":
+        # created on first use, so importing data_algebra does not import Pandas
+        with _default_data_model_lock:
+            model = globals().get("default_data_model", None)
+            if model is None:
+                pandas_model = importlib.import_module("data_algebra.pandas_model")
+                model = pandas_model.PandasModel()
+                globals()["default_data_model"] = model
+        return model
+    if name in _lazy_submodules:
+        return importlib.import_module("data_algebra." + name)
+    raise AttributeError("module 'data_algebra' has no attribute " + repr(name))
 
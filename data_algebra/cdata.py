@@ -151,127 +151,582 @@ def record_spec_from_simple_obj(obj, *, local_data_model=None):
     )
 
 
+def _record_codes(data, record_keys, pd):
+    # record of each data row (-1: a key is missing), records numbered in key order
+    rec_code = numpy.zeros((data.shape[0],), dtype=numpy.int64)
+    n_rec = 1 if data.shape[0] > 0 else 0
+    for rk in record_keys:
+        codes, uniques = pd.factorize(data[rk], sort=True)
+        rec_code = numpy.where(
+            (rec_code < 0) | (codes < 0), -1, rec_code * len(uniques) + codes
+        )
+        # re-number densely, keeping the codes small and in key order
+        rec_code, uniques = pd.factorize(rec_code, sort=True)
+        if (len(uniques) > 0) and (uniques[0] < 0):
+            rec_code = rec_code - 1  # -1 sorts first
+        n_rec = len(uniques) - int(numpy.sum(uniques < 0))
+    return rec_code, n_rec
+
+
+def _first_rows(rec_code, n_rec):
+    # position of the first data row of each record
+    first = numpy.full((n_rec,), -1, dtype=numpy.int64)
+    rows = numpy.flatnonzero(rec_code >= 0)
+    first[rec_code[rows[::-1]]] = rows[::-1]
+    return first
+
+
+def _is_null_name(name):
+    return (name is None) or (isinstance(name, float) and numpy.isnan(name))
+
+
+class _Records:
+    """Records read from a data frame: record keys, and a way to get content columns."""
+
+    def __init__(self, *, keys, n, column, sorted_by):
+        """
+        :param keys: dictionary from record key to array of values, one per record
+        :param n: number of records
+        :param column: function from content key to array of values (one per record), or None if absent
+        :param sorted_by: record keys the records are ordered by
+        """
+        self.keys = keys
+        self.n = n
+        self.column = column
+        self.sorted_by = sorted_by
+
+
+def _stack(cols, *, pd):
+    # concatenate arrays, finding the common type as pd.concat() would
+    dtypes = set([c.dtype for c in cols])
+    if (len(dtypes) == 1) and all([isinstance(c, numpy.ndarray) for c in cols]):
+        return numpy.concatenate(cols)
+    return pd.concat(
+        [pd.Series(c) for c in cols], axis=0, ignore_index=True
+    ).values
+
+
+class _RowReader:
+    """Read row records: one data row per record."""
+
+    def __init__(self, record_keys, *, keyed):
+        """
+        :param record_keys: record key columns
+        :param keyed: if True drop rows with missing keys and insist on one row per record
+        """
+        self.record_keys = [k for k in record_keys]
+        self.keyed = keyed
+
+    def read(self, data, *, pd):
+        if self.keyed:
+            rec_code, n_rec = _record_codes(data, self.record_keys, pd)
+            counts = numpy.bincount(rec_code[rec_code >= 0])
+            if (n_rec > 0) and (numpy.max(counts) > 1):
+                raise ValueError("table is not keyed by " + str(self.record_keys))
+            order = _first_rows(rec_code, n_rec)
+        elif len(self.record_keys) == 1:
+            order = (
+                data[self.record_keys[0]]
+                .reset_index(drop=True)
+                .sort_values(kind="mergesort")
+                .index.values
+            )
+        elif len(self.record_keys) > 1:
+            order = (
+                data[self.record_keys]
+                .reset_index(drop=True)
+                .sort_values(by=self.record_keys, kind="mergesort")
+                .index.values
+            )
+        else:
+            order = numpy.arange(data.shape[0])
+        columns = set(data.columns)
+
+        def column(name):
+            if _is_null_name(name) or (name not in columns):
+                return None
+            return data[name].values.take(order)
+
+        keys = {k: data[k].values.take(order) for k in self.record_keys}
+        return _Records(
+            keys=keys, n=len(order), column=column, sorted_by=self.record_keys
+        )
+
+
+class _BlockReader:
+    """Read block records: one data row per (record, control table row) pair."""
+
+    def __init__(self, blocks_in, *, pd):
+        """
+        :param blocks_in: data_algebra.cdata.RecordSpecification describing the blocks
+        :param pd: Pandas module
+        """
+        self.record_keys = [k for k in blocks_in.record_keys]
+        self.control_table_keys = [k for k in blocks_in.control_table_keys]
+        ctrl = blocks_in.control_table
+        self.n_ctrl = ctrl.shape[0]
+        # control key values are encoded once, data rows are matched against the codes
+        self.levels = []
+        ctrl_ck = numpy.zeros((self.n_ctrl,), dtype=numpy.int64)
+        for ck in self.control_table_keys:
+            levels = pd.Index(pd.unique(ctrl[ck]))
+            self.levels.append(levels)
+            ctrl_ck = ctrl_ck * len(levels) + levels.get_indexer(ctrl[ck])
+        self.ctrl_index = pd.Index(ctrl_ck)
+        self.control_values = [
+            tuple([ctrl[ck][i] for ck in self.control_table_keys])
+            for i in range(self.n_ctrl)
+        ]
+        # content key to (control row, value column) cell holding it
+        self.cells = dict()
+        for vk in ctrl.columns:
+            if vk in set(self.control_table_keys):
+                continue
+            for i in range(self.n_ctrl):
+                dcol = ctrl[vk][i]
+                if not pd.isnull(dcol):
+                    self.cells[dcol] = (i, vk)
+
+    def read(self, data, *, pd):
+        rec_code, n_rec = _record_codes(data, self.record_keys, pd)
+        # control row of each data row (-1: matches no control row)
+        data_ck = numpy.zeros((data.shape[0],), dtype=numpy.int64)
+        for ck, levels in zip(self.control_table_keys, self.levels):
+            d_codes = levels.get_indexer(data[ck])
+            data_ck = numpy.where(
+                (data_ck < 0) | (d_codes < 0), -1, data_ck * len(levels) + d_codes
+            )
+        ctrl_code = self.ctrl_index.get_indexer(data_ck)
+        ctrl_code[data_ck < 0] = -1
+        # data row position of each (record, control row) cell, -1 for none
+        positions = numpy.full((n_rec, self.n_ctrl), -1, dtype=numpy.int64)
+        keep = (rec_code >= 0) & (ctrl_code >= 0)
+        # table must be keyed by record_keys + control_table_keys (rows with missing
+        # record keys, or matching no control row, are not used)
+        cells = rec_code[keep] * self.n_ctrl + ctrl_code[keep]
+        if (len(cells) > 1) and (numpy.max(numpy.bincount(cells)) > 1):
+            raise ValueError(
+                "table is not keyed by blocks_in.record_keys + blocks_in.control_table_keys"
+            )
+        positions[rec_code[keep], ctrl_code[keep]] = numpy.flatnonzero(keep)
+        columns = set(data.columns)
+
+        def column(name):
+            if _is_null_name(name):
+                return None
+            cell = self.cells.get(name, None)
+            if (cell is None) or (cell[1] not in columns) or (n_rec < 1):
+                return None
+            i, vk = cell
+            return pd.api.extensions.take(
+                data[vk].values, positions[:, i], allow_fill=True
+            )
+
+        first = _first_rows(rec_code, n_rec)
+        keys = {k: data[k].values.take(first) for k in self.record_keys}
+        return _Records(keys=keys, n=n_rec, column=column, sorted_by=self.record_keys)
+
+
+class _RowWriter:
+    """Write row records: one row per record, one column per content key."""
+
+    def __init__(self, blocks_in):
+        """
+        :param blocks_in: data_algebra.cdata.RecordSpecification naming the columns
+        """
+        self.record_keys = [k for k in blocks_in.record_keys]
+        ctrl = blocks_in.control_table
+        value_keys = [
+            k for k in ctrl.columns if k not in set(blocks_in.control_table_keys)
+        ]
+        # columns are filled control row by control row, absent ones added at the end
+        self.columns = []
+        for i in range(ctrl.shape[0]):
+            for vk in value_keys:
+                dcol = ctrl[vk][i]
+                if not _is_null_name(dcol):
+                    self.columns.append(dcol)
+        self.row_version = blocks_in.row_version(include_record_keys=False)
+        self.columns_produced = blocks_in.row_version(include_record_keys=True)
+
+    def write(self, records, *, pd, check_keying=False):
+        res = {k: records.keys[k] for k in self.record_keys}
+        for c in self.columns:
+            v = records.column(c)
+            if v is not None:
+                res[c] = v
+        for c in self.row_version:
+            if c not in res.keys():
+                res[c] = numpy.full((records.n,), None, dtype=object)
+        return pd.DataFrame(res)
+
+
+class _BlockWriter:
+    """Write block records: one row per (record, control table row) pair."""
+
+    def __init__(self, blocks_out):
+        """
+        :param blocks_out: data_algebra.cdata.RecordSpecification describing the blocks
+        """
+        self.record_keys = [k for k in blocks_out.record_keys]
+        self.control_table_keys = [k for k in blocks_out.control_table_keys]
+        ctemp = blocks_out.control_table.sort_values(
+            by=self.control_table_keys, kind="mergesort"
+        )
+        self.control_table = ctemp.reset_index(drop=True)
+        self.n_ctrl = self.control_table.shape[0]
+        self.control_columns = {
+            ck: self.control_table[ck].values for ck in self.control_table_keys
+        }
+        self.value_keys = [
+            k
+            for k in self.control_table.columns
+            if k not in set(self.control_table_keys)
+        ]
+        # content key feeding each (control row, value column) cell, None if none
+        self.donors = {
+            vk: [
+                None if _is_null_name(d) else d for d in self.control_table[vk]
+            ]
+            for vk in self.value_keys
+        }
+        self.columns_produced = self.record_keys + [
+            c for c in self.control_table.columns
+        ]
+
+    def write(self, records, *, pd, check_keying=False):
+        keys = records.keys
+        column = records.column
+        if check_keying:
+            # prefer table be keyed by record_keys
+            if not data_algebra.util.table_is_keyed_by_columns(
+                pd.DataFrame(keys), self.record_keys
+            ):
+                raise ValueError("table is not keyed by blocks_out.record_keys")
+        if (len(self.record_keys) > 0) and (records.sorted_by != self.record_keys):
+            order = (
+                pd.DataFrame({k: keys[k] for k in self.record_keys})
+                .sort_values(by=self.record_keys, kind="mergesort")
+                .index.values
+            )
+            keys = {k: v.take(order) for k, v in keys.items()}
+
+            def column(name):
+                v = records.column(name)
+                if v is None:
+                    return None
+                return v.take(order)
+
+        # The result has one row per (record, control row) pair: records in order of
+        # their keys, each expanded into the control table rows in order of the control
+        # keys (with no record keys: all records for the first control row, then the
+        # next...).  So each result column is a repeat or tile of a data or control
+        # column, and each value column interleaves the data columns it draws from.
+        n_data = records.n
+        positions = numpy.arange(n_data * self.n_ctrl)
+        if len(self.record_keys) > 0:
+            data_idx = positions // self.n_ctrl
+            ctrl_idx = positions % self.n_ctrl
+        else:
+            data_idx = positions % max(n_data, 1)
+            ctrl_idx = positions // max(n_data, 1)
+        res = {k: keys[k].take(data_idx) for k in self.record_keys}
+        for ck in self.control_table_keys:
+            res[ck] = self.control_columns[ck].take(ctrl_idx)
+        gather = ctrl_idx * n_data + data_idx
+        for vk in self.value_keys:
+            cols = [None if d is None else column(d) for d in self.donors[vk]]
+            present = [c for c in cols if c is not None]
+            if all([pd.api.types.is_numeric_dtype(c) for c in present]):
+                filler = numpy.full((n_data,), numpy.nan)
+            else:
+                filler = numpy.full((n_data,), None, dtype=object)
+            # all of the column's values, control row by control row, then gathered
+            # into result order
+            stacked = _stack([filler if c is None else c for c in cols], pd=pd)
+            res[vk] = stacked.take(gather)
+        return pd.DataFrame({c: res[c] for c in self.columns_produced})
+
+
+class CompiledRecordMap:
+    """
+    The data movement of a RecordMap, with everything that depends only on the
+    record specifications (validation, control key encodings, cell to column plans,
+    output schema) worked out once.  Build with RecordMap.compile().
+    """
+
+    def __init__(
+        self, *, reader, writer, sources, columns_needed, local_data_model=None
+    ):
+        """
+        :param reader: _RowReader or _BlockReader for the incoming records
+        :param writer: _RowWriter or _BlockWriter for the outgoing records
+        :param sources: dictionary from outgoing content key to incoming content key
+        :param columns_needed: columns the incoming data must have
+        :param local_data_model: data_algebra.data_model.DataModel supplying Pandas
+        """
+        if local_data_model is None:
+            local_data_model = data_algebra.default_data_model
+        self.reader = reader
+        self.writer = writer
+        self.sources = sources
+        self.columns_needed = [c for c in columns_needed]
+        self.columns_produced = [c for c in writer.columns_produced]
+        self.local_data_model = local_data_model
+
+    # noinspection PyPep8Naming
+    def transform(self, X, *, check_blocks_out_keying=False, local_data_model=None):
+        """
+        :param X: data frame of incoming records
+        :param check_blocks_out_keying: if True insist outgoing blocks be keyed by record keys
+        :param local_data_model: data_algebra.data_model.DataModel, default: the one compiled with
+        :return: data frame of outgoing records
+        """
+        unknown = set(self.columns_needed) - set(X.columns)
+        if len(unknown) > 0:
+            raise ValueError("missing required columns: " + str(unknown))
+        if local_data_model is None:
+            local_data_model = self.local_data_model
+        pd = local_data_model.pd
+        records = self.reader.read(X, pd=pd)
+        if len(self.sources) > 0:
+            read = records.column
+            records.column = lambda name: read(self.sources.get(name, name))
+        return self.writer.write(records, pd=pd, check_keying=check_blocks_out_keying)
+
+    def transform_stream(
+        self, chunks, *, check_blocks_out_keying=False, local_data_model=None
+    ):
+        """
+        Transform an iterable of data frames chunk by chunk, in bounded memory.
+
+        Records must arrive sorted by the record keys, else ValueError is raised.
+        Block records may be split across chunks: the last record of each chunk is
+        held back and completed from the next, so at most one chunk plus one record
+        is held.  Row records are transformed one chunk at a time, each chunk's keys
+        must be no smaller than the keys before it (larger when records must be
+        keyed), and rows with missing keys must come last.  Concatenated, the
+        results equal transform() of all the data (with no record keys blocks are
+        produced control row by control row within each chunk, and blocks_in
+        treats all rows as one record).
+
+        :param chunks: iterable of data frames
+        :param check_blocks_out_keying: if True insist outgoing blocks be keyed by record keys
+        :param local_data_model: data_algebra.data_model.DataModel, default: the one compiled with
+        :return: generator of data frames (at least one)
+        """
+        if local_data_model is None:
+            local_data_model = self.local_data_model
+        pd = local_data_model.pd
+        carries = isinstance(self.reader, _BlockReader)
+        record_keys = self.reader.record_keys
+        carry = None
+        # row records: largest keys seen so far, and whether a missing key was seen
+        prev_keys = None
+        seen_missing = False
+        distinct = (not carries) and (
+            self.reader.keyed
+            or (check_blocks_out_keying and isinstance(self.writer, _BlockWriter))
+        )
+        n_yielded = 0
+        for chunk in chunks:
+            if (not carries) and (len(record_keys) > 0) and (chunk.shape[0] > 0):
+                keys = chunk.loc[:, record_keys]
+                if prev_keys is not None:
+                    keys = pd.concat([prev_keys, keys], axis=0, ignore_index=True)
+                rec_code, n_rec = _record_codes(keys, record_keys, pd)
+                if prev_keys is not None:
+                    prev_code = rec_code[0]
+                    rec_code = rec_code[1:]
+                    seen = rec_code[rec_code >= 0]
+                    if distinct and numpy.any(seen == prev_code):
+                        raise ValueError("table is not keyed by " + str(record_keys))
+                    if numpy.any(seen < prev_code) or (
+                        seen_missing and (len(seen) > 0)
+                    ):
+                        raise ValueError(
+                            "transform_stream() needs row records sorted by "
+                            + str(record_keys)
+                            + " across chunks"
+                        )
+                    keys = keys.iloc[1:, :]
+                if not self.reader.keyed:
+                    seen_missing = seen_missing or numpy.any(rec_code < 0)
+                last = numpy.flatnonzero(rec_code == (n_rec - 1))
+                if len(last) > 0:
+                    prev_keys = keys.iloc[[last[0]], :]
+            if carries:
+                if carry is not None:
+                    chunk = pd.concat([carry, chunk], axis=0, ignore_index=True)
+                rec_code, n_rec = _record_codes(chunk, record_keys, pd)
+                seen = rec_code[rec_code >= 0]
+                if numpy.any(seen[1:] < seen[:-1]):
+                    raise ValueError(
+                        "transform_stream() needs block records sorted by "
+                        + str(record_keys)
+                    )
+                last = rec_code == (n_rec - 1)
+                carry = chunk.loc[last]
+                chunk = chunk.loc[(rec_code >= 0) & (~last)]
+                if chunk.shape[0] < 1:
+                    continue
+            res = self.transform(
+                chunk,
+                check_blocks_out_keying=check_blocks_out_keying,
+                local_data_model=local_data_model,
+            )
+            if res.shape[0] > 0:
+                n_yielded = n_yielded + 1
+                yield res
+        if (carry is not None) and (carry.shape[0] > 0):
+            n_yielded = n_yielded + 1
+            yield self.transform(
+                carry,
+                check_blocks_out_keying=check_blocks_out_keying,
+                local_data_model=local_data_model,
+            )
+        if n_yielded < 1:
+            yield self.transform(
+                local_data_model.data_frame({c: [] for c in self.columns_needed}),
+                local_data_model=local_data_model,
+            )
+
+    def compose(self, other):
+        """
+        Fuse two compiled maps: self.compose(other).transform(data) equals
+        self.transform(other.transform(data)), without the intermediate frame.
+
+        :param other: CompiledRecordMap applied first
+        :return: CompiledRecordMap
+        """
+        if not isinstance(other, CompiledRecordMap):
+            raise TypeError("expected other to be data_algebra.cdata.CompiledRecordMap")
+        if set(other.writer.record_keys) != set(self.reader.record_keys):
+            raise ValueError("can only compose operations with matching record_keys")
+        # name of each intermediate content key in other's incoming records
+        if isinstance(other.writer, _RowWriter) and isinstance(self.reader, _RowReader):
+            produced = set(other.writer.columns)
+            link = {c: other.sources.get(c, c) for c in produced}
+        elif isinstance(other.writer, _BlockWriter) and isinstance(
+            self.reader, _BlockReader
+        ):
+            ckeys = self.reader.control_table_keys
+            ctrl = other.writer.control_table
+            unknown = set(ckeys) - set(ctrl.columns)
+            if len(unknown) > 0:
+                raise ValueError(
+                    "can not compose, blocks lack control table keys: " + str(unknown)
+                )
+            # intermediate cells, addressed by control key values and value column
+            produced = dict()
+            for j in range(ctrl.shape[0]):
+                at = tuple([ctrl[ck][j] for ck in ckeys])
+                for vk in other.writer.value_keys:
+                    if at + (vk,) in produced.keys():
+                        raise ValueError(
+                            "can not compose, blocks not keyed by " + str(ckeys)
+                        )
+                    produced[at + (vk,)] = other.writer.donors[vk][j]
+            link = dict()
+            for name, (i, vk) in self.reader.cells.items():
+                at = self.reader.control_values[i] + (vk,)
+                donor = produced.get(at, None)
+                if donor is not None:
+                    link[name] = other.sources.get(donor, donor)
+        else:
+            raise ValueError("can not compose, record shapes do not match")
+        reader = other.reader
+        if isinstance(reader, _RowReader) and isinstance(self.reader, _BlockReader):
+            # the blocks would have been checked for keying by self's reader
+            reader = _RowReader(reader.record_keys, keyed=True)
+        writer_names = set(self.sources.keys())
+        if isinstance(self.writer, _RowWriter):
+            writer_names.update(self.writer.columns)
+        else:
+            for donors in self.writer.donors.values():
+                writer_names.update([d for d in donors if d is not None])
+        # outgoing content key to other's incoming content key (None: not produced)
+        sources = dict()
+        for name in writer_names:
+            sources[name] = link.get(self.sources.get(name, name), None)
+        return CompiledRecordMap(
+            reader=reader,
+            writer=self.writer,
+            sources=sources,
+            columns_needed=other.columns_needed,
+            local_data_model=self.local_data_model,
+        )
+
+    # noinspection PyTypeChecker
+    def __rrshift__(self, other):  # override other >> self
+        if other is None:
+            return self
+        if isinstance(other, CompiledRecordMap):
+            # (data >> other) >> self == data >> (other >> self)
+            return self.compose(other)
+        return self.transform(other)
+
+
+def _compile(*, blocks_in, blocks_out, local_data_model=None):
+    # plan for converting blocks_in records (rows if None) to blocks_out (rows if None)
+    if local_data_model is None:
+        local_data_model = data_algebra.default_data_model
+    pd = local_data_model.pd
+    if blocks_in is not None:
+        ck = [k for k in blocks_in.content_keys if k is not None]
+        if len(ck) != len(set(ck)):
+            raise ValueError("blocks_in can not have duplicate content keys")
+        reader = _BlockReader(blocks_in, pd=pd)
+        columns_needed = blocks_in.block_columns
+    else:
+        reader = _RowReader(blocks_out.record_keys, keyed=False)
+        columns_needed = blocks_out.row_columns
+    if blocks_out is not None:
+        rv = [
+            k
+            for k in blocks_out.row_version(include_record_keys=True)
+            if k is not None
+        ]
+        if len(rv) != len(set(rv)):
+            raise ValueError("duplicate row columns")
+        writer = _BlockWriter(blocks_out)
+    else:
+        writer = _RowWriter(blocks_in)
+    return CompiledRecordMap(
+        reader=reader,
+        writer=writer,
+        sources=dict(),
+        columns_needed=columns_needed,
+        local_data_model=local_data_model,
+    )
+
+
 def blocks_to_rowrecs(data, *, blocks_in, local_data_model=None):
     if not isinstance(blocks_in, data_algebra.cdata.RecordSpecification):
         raise TypeError("blocks_in should be a data_algebra.cdata.RecordSpecification")
-    ck = [k for k in blocks_in.content_keys if k is not None]
-    if len(ck) != len(set(ck)):
-        raise ValueError("blocks_in can not have duplicate content keys")
-    if local_data_model is None:
-        local_data_model = data_algebra.default_data_model
-    data = data.reset_index(drop=True)
     missing_cols = set(blocks_in.control_table_keys).union(blocks_in.record_keys) - set(
         data.columns
     )
     if len(missing_cols) > 0:
         raise KeyError("missing required columns: " + str(missing_cols))
-    # table must be keyed by record_keys + control_table_keys
-    if not data_algebra.util.table_is_keyed_by_columns(
-        data, blocks_in.record_keys + blocks_in.control_table_keys
-    ):
-        raise ValueError(
-            "table is not keyed by blocks_in.record_keys + blocks_in.control_table_keys"
-        )
-    # convert to row-records
-    # regularize/complete records
-    dtemp = data.copy()  # TODO: select down columns
-    dtemp['FALSE_AGG_KEY'] = 1
-    if len(blocks_in.record_keys) > 0:
-        ideal = dtemp[blocks_in.record_keys + ['FALSE_AGG_KEY']].copy()
-        res = ideal.groupby(blocks_in.record_keys)['FALSE_AGG_KEY'].agg('sum')
-        ideal = local_data_model.data_frame(res).reset_index(drop=False)
-        ideal['FALSE_AGG_KEY'] = 1
-        ctemp = blocks_in.control_table[blocks_in.control_table_keys].copy()
-        ctemp['FALSE_AGG_KEY'] = 1
-        ideal = ideal.merge(ctemp, how='outer', on='FALSE_AGG_KEY')
-        ideal = ideal.reset_index(drop=True)
-        dtemp = ideal.merge(right=dtemp,
-                            how='left',
-                            on=blocks_in.record_keys + blocks_in.control_table_keys + ['FALSE_AGG_KEY'])
-    dtemp.sort_values(by=blocks_in.record_keys + blocks_in.control_table_keys, inplace=True)
-    dtemp = dtemp.reset_index(drop=True)
-    # start building up result frame
-    res = dtemp.groupby(blocks_in.record_keys)['FALSE_AGG_KEY'].agg('sum')
-    res = local_data_model.data_frame(res).reset_index(drop=False)
-    res.sort_values(by=blocks_in.record_keys, inplace=True)
-    res = local_data_model.data_frame(res).reset_index(drop=True)
-    del res['FALSE_AGG_KEY']
-    # now fill in columns
-    ckeys = blocks_in.control_table_keys
-    value_keys = [k for k in blocks_in.control_table.columns if k not in set(ckeys)]
-    donor_cols = set(dtemp.columns)
-    for i in range(blocks_in.control_table.shape[0]):
-        want = numpy.ones((dtemp.shape[0],), dtype=bool)
-        for ck in ckeys:
-            want = numpy.logical_and(want, dtemp[ck] == blocks_in.control_table[ck][i])
-        if numpy.any(want):
-            for vk in value_keys:
-                if vk in donor_cols:
-                    dcol = blocks_in.control_table[vk][i]
-                    res[dcol] = numpy.asarray(dtemp.loc[want, vk])
-    # fill in any missed columns
-    colset = set(res.columns)
-    for c in blocks_in.row_version():
-        if c not in colset:
-            res[c] = None
-    return res
+    compiled = _compile(
+        blocks_in=blocks_in, blocks_out=None, local_data_model=local_data_model
+    )
+    return compiled.transform(data)
 
 
 def rowrecs_to_blocks(data, *, blocks_out, check_blocks_out_keying=False, local_data_model=None):
     if not isinstance(blocks_out, data_algebra.cdata.RecordSpecification):
         raise TypeError("blocks_out should be a data_algebra.cdata.RecordSpecification")
-    if local_data_model is None:
-        local_data_model = data_algebra.default_data_model
-    data = data.reset_index(drop=True)
-    missing_cols = set(blocks_out.record_keys) - set(data.columns)
+    missing_cols = set(blocks_out.row_version(include_record_keys=True)) - set(
+        data.columns
+    )
     if len(missing_cols) > 0:
         raise KeyError("missing required columns: " + str(missing_cols))
-    if check_blocks_out_keying:
-        # prefer table be keyed by record_keys
-        if not data_algebra.util.table_is_keyed_by_columns(
-            data, blocks_out.record_keys
-        ):
-            raise ValueError("table is not keyed by blocks_out.record_keys")
-    # convert to block records, first build up parallel structures
-    rv = [k for k in blocks_out.row_version(include_record_keys=True) if k is not None]
-    if len(rv) != len(set(rv)):
-        raise ValueError("duplicate row columns")
-    dtemp_cols = [k for k in rv if k is not None and k in set(blocks_out.record_keys + blocks_out.content_keys)]
-    dtemp = data[dtemp_cols].copy()
-    dtemp.sort_values(by=blocks_out.record_keys, inplace=True)
-    dtemp = dtemp.reset_index(drop=True)
-    if len(dtemp.columns) != len(set(dtemp.columns)):
-        raise ValueError("targeted data columns not unique")
-    ctemp = blocks_out.control_table.copy()
-    dtemp['FALSE_JOIN_KEY'] = 1
-    ctemp['FALSE_JOIN_KEY'] = 1
-    res = dtemp[blocks_out.record_keys + ['FALSE_JOIN_KEY']].merge(ctemp, how='outer', on=['FALSE_JOIN_KEY'])
-    del res['FALSE_JOIN_KEY']
-    ckeys = blocks_out.control_table_keys
-    res.sort_values(by=blocks_out.record_keys + ckeys, inplace=True)
-    res = res.reset_index(drop=True)
-    del ctemp['FALSE_JOIN_KEY']
-    del dtemp['FALSE_JOIN_KEY']
-    value_keys = [k for k in ctemp.columns if k not in set(ckeys)]
-    donor_cols = set(dtemp.columns)
-    for vk in value_keys:
-        res[vk] = None
-    # we now have parallel structures to copy between
-    for i in range(ctemp.shape[0]):
-        want = numpy.ones((res.shape[0],), dtype=bool)
-        for ck in ckeys:
-            want = numpy.logical_and(want, res[ck] == ctemp[ck][i])
-        if numpy.any(want):
-            for vk in value_keys:
-                dcol = ctemp[vk][i]
-                if dcol in donor_cols:
-                    res.loc[want, vk] = numpy.asarray(dtemp[dcol])
-    # see about promoting composite columns to numeric
-    for vk in set(value_keys):
-        converted = local_data_model.to_numeric(res[vk], errors='coerce')
-        if numpy.all(local_data_model.isnull(converted) == local_data_model.isnull(res[vk])):
-            res[vk] = converted
-    return res
+    compiled = _compile(
+        blocks_in=None, blocks_out=blocks_out, local_data_model=local_data_model
+    )
+    return compiled.transform(data, check_blocks_out_keying=check_blocks_out_keying)
 
 
 class RecordMap:
@@ -320,6 +775,7 @@ class RecordMap:
         else:
             self.columns_produced = self.blocks_in.row_columns
         self.fmt_string = self.fmt()
+        self._compiled = None  # data movement plan, built by compile()
 
     def record_keys(self):
         if self.blocks_in is not None:
@@ -337,45 +793,64 @@ class RecordMap:
             for rk in self.blocks_in.record_keys:
                 example[rk] = [rk] * nrow
             return example
-        if self.blocks_in is not None:
+        if self.blocks_out is not None:
             example = local_data_model.data_frame()
             for k in self.blocks_out.row_columns:
                 example[k] = [k]
             return example
         return None
 
+    def compile(self):
+        """
+        Work out (once, the result is kept) everything about the conversion that
+        depends only on the record specifications, so transform() only moves data.
+
+        :return: data_algebra.cdata.CompiledRecordMap
+        """
+        compiled = self._compiled
+        if compiled is None:
+            compiled = _compile(blocks_in=self.blocks_in, blocks_out=self.blocks_out)
+            self._compiled = compiled
+        return compiled
+
     # noinspection PyPep8Naming
     def transform(
         self, X, *, check_blocks_out_keying=False, local_data_model=None
     ):
-        unknown = set(self.columns_needed) - set(X.columns)
-        if len(unknown) > 0:
-            raise ValueError("missing required columns: " + str(unknown))
-        if local_data_model is None:
-            local_data_model = data_algebra.default_data_model
-        X = X.reset_index(drop=True)
-        if self.blocks_in is not None:
-            X = blocks_to_rowrecs(
-                X,
-                blocks_in=self.blocks_in,
-                local_data_model=local_data_model
-            )
-        if self.blocks_out is not None:
-            X = rowrecs_to_blocks(
-                X,
-                blocks_out=self.blocks_out,
-                check_blocks_out_keying=check_blocks_out_keying,
-                local_data_model=local_data_model
-            )
-        return X
+        return self.compile().transform(
+            X,
+            check_blocks_out_keying=check_blocks_out_keying,
+            local_data_model=local_data_model,
+        )
+
+    def transform_stream(
+        self, chunks, *, check_blocks_out_keying=False, local_data_model=None
+    ):
+        """
+        Transform an iterable of data frames, see CompiledRecordMap.transform_stream().
+        Incoming records must be sorted by the record keys.
+
+        :param chunks: iterable of data frames
+        :param check_blocks_out_keying: if True insist outgoing blocks be keyed by record keys
+        :param local_data_model: data_algebra.data_model.DataModel
+        :return: generator of data frames
+        """
+        return self.compile().transform_stream(
+            chunks,
+            check_blocks_out_keying=check_blocks_out_keying,
+            local_data_model=local_data_model,
+        )
 
     def compose(self, other):
         """
         Experimental method to compose transforms
         (self.compose(other)).transform(data) == self.transform(other.transform(data))
 
+        The result transforms with a single fused plan (no intermediate frame).  The
+        fused plan of a rows to rows composition is self.compile().compose(other.compile()).
+
         :param other: another data_algebra.cdata.RecordMap
-        :return:
+        :return: data_algebra.cdata.RecordMap, or None if the composition is rows to rows
         """
 
         if not isinstance(other, RecordMap):
@@ -390,39 +865,25 @@ class RecordMap:
         out = s2.transform(s1.transform(inp))
         rsi = inp.drop(rk, axis=1, inplace=False)
         rso = out.drop(rk, axis=1, inplace=False)
-        if inp.shape[0] < 2:
-            if out.shape[0] < 2:
-                return None
-            else:
-                return RecordMap(
-                    blocks_out=data_algebra.cdata.RecordSpecification(
-                        control_table=rso,
-                        record_keys=rk,
-                        control_table_keys=s2.blocks_out.control_table_keys,
-                    )
-                )
-        else:
-            if out.shape[0] < 2:
-                return RecordMap(
-                    blocks_in=data_algebra.cdata.RecordSpecification(
-                        control_table=rsi,
-                        record_keys=rk,
-                        control_table_keys=s1.blocks_in.control_table_keys,
-                    )
-                )
-            else:
-                return RecordMap(
-                    blocks_in=data_algebra.cdata.RecordSpecification(
-                        control_table=rsi,
-                        record_keys=rk,
-                        control_table_keys=s1.blocks_in.control_table_keys,
-                    ),
-                    blocks_out=data_algebra.cdata.RecordSpecification(
-                        control_table=rso,
-                        record_keys=rk,
-                        control_table_keys=s2.blocks_out.control_table_keys,
-                    ),
-                )
+        blocks_in = None
+        blocks_out = None
+        if inp.shape[0] >= 2:
+            blocks_in = data_algebra.cdata.RecordSpecification(
+                control_table=rsi,
+                record_keys=rk,
+                control_table_keys=s1.blocks_in.control_table_keys,
+            )
+        if out.shape[0] >= 2:
+            blocks_out = data_algebra.cdata.RecordSpecification(
+                control_table=rso,
+                record_keys=rk,
+                control_table_keys=s2.blocks_out.control_table_keys,
+            )
+        if (blocks_in is None) and (blocks_out is None):
+            return None
+        res = RecordMap(blocks_in=blocks_in, blocks_out=blocks_out)
+        res._compiled = s2.compile().compose(s1.compile())
+        return res
 
     # noinspection PyTypeChecker
     def __rrshift__(self, other):  # override other >> self
@@ -1,11 +1,14 @@
 from abc import ABC
 
 import data_algebra.eval_model
+import data_algebra.eval_plan
 
 
 class DataModel(data_algebra.eval_model.EvalModel, ABC):
     def __init__(self, presentation_model_name):
         self.presentation_model_name = presentation_model_name
+        self.eval_plan = None  # data_algebra.eval_plan.EvalPlan of evaluation in progress
+        self.memory_tracker = None  # data_algebra.memory_budget.MemoryTracker of evaluation in progress
         data_algebra.eval_model.EvalModel.__init__(self)
 
     # helper functions
@@ -30,6 +33,117 @@ class DataModel(data_algebra.eval_model.EvalModel, ABC):
         """ for numeric vector x, return logical vector of positions that are null, NaN, infinite"""
         raise NotImplementedError("base method called")
 
+    # evaluation
+
+    def table_version(self, df):
+        """
+        Version token of a data frame, equal tokens mean equal contents.
+        Used to key data_algebra.eval_cache.EvalCache entries when the user does not
+        supply a version.
+
+        :param df: data frame
+        :return: hashable token
+        """
+        raise NotImplementedError("base method called")
+
+    def eval_dag(
+        self,
+        op,
+        *,
+        data_map,
+        eval_env,
+        narrow,
+        cache=None,
+        table_versions=None,
+        max_workers=None,
+        profile=None,
+        memory_tracker=None,
+    ):
+        """
+        Evaluate an operator DAG, calculating shared nodes only once, and without
+        recursion (see data_algebra.eval_plan.EvalPlan.run()).
+
+        :param op: data_algebra.data_ops.ViewRepresentation
+        :param data_map: map from table names to data frames
+        :param eval_env: environment to evaluate in
+        :param narrow: logical, if True don't copy unexpected columns
+        :param cache: optional data_algebra.eval_cache.EvalCache to re-use results across calls,
+                      not used if op has user functions or eval_env holds values other than
+                      None, int, float, str, or bool
+        :param table_versions: optional map from table names to version tokens (used with cache),
+                               tables not mentioned get self.table_version() of their data
+        :param max_workers: if more than 1, the number of threads to evaluate independent branches on
+        :param profile: optional data_algebra.eval_profile.EvalProfile to record per node costs in
+        :param memory_tracker: optional data_algebra.memory_budget.MemoryTracker to account result sizes in
+        :return: result
+        """
+        env_key = None
+        if cache is not None:
+            env_key = data_algebra.eval_plan.eval_env_key(eval_env)
+            if (env_key is None) or (not op.fingerprint_is_stable()):
+                # user functions can be re-defined without changing the DAG or
+                # environment key, so their results are not cached
+                cache = None
+        versions = None
+        if cache is not None:
+            versions = dict()
+            for k in op.get_tables().keys():
+                if (table_versions is not None) and (k in table_versions.keys()):
+                    versions[k] = table_versions[k]
+                else:
+                    versions[k] = self.table_version(data_map[k])
+        prev_plan = self.eval_plan
+        prev_tracker = self.memory_tracker
+        self.eval_plan = data_algebra.eval_plan.EvalPlan(
+            op,
+            cache=cache,
+            table_versions=versions,
+            cache_context=(self.presentation_model_name, narrow, env_key),
+        )
+
+        def compute(node):
+            return node.eval_implementation(
+                data_map=data_map, eval_env=eval_env, data_model=self, narrow=narrow
+            )
+
+        if memory_tracker is not None:
+            compute = memory_tracker.wrap(compute, self.eval_plan)
+            memory_tracker.begin()
+        if profile is not None:
+            compute = profile.wrap(compute)
+        self.memory_tracker = memory_tracker
+        try:
+            if (max_workers is not None) and (max_workers > 1):
+                return self.eval_plan.run_parallel(
+                    op, compute, max_workers=max_workers
+                )
+            return self.eval_plan.run(op, compute)
+        finally:
+            self.eval_plan = prev_plan
+            self.memory_tracker = prev_tracker
+            if memory_tracker is not None:
+                memory_tracker.end()
+
+    def eval_source(self, op, *, data_map, eval_env, narrow):
+        """
+        Get the result of a source node, shared through the current evaluation plan.
+
+        :param op: data_algebra.data_ops.ViewRepresentation
+        :param data_map: map from table names to data frames
+        :param eval_env: environment to evaluate in
+        :param narrow: logical, if True don't copy unexpected columns
+        :return: result, steps are free to alter it
+        """
+
+        def compute():
+            return op.eval_implementation(
+                data_map=data_map, eval_env=eval_env, data_model=self, narrow=narrow
+            )
+
+        if self.eval_plan is None:
+            return compute()
+        return self.eval_plan.get(op, compute)
+
     # operation implementations
 
     def table_step(self, op, *, data_map, eval_env, narrow):
@@ -1,5 +1,6 @@
-from abc import ABC
+from abc import ABC, ABCMeta
 from typing import Set, Dict, List, Union
+import contextlib
 import numbers
 import collections
 import re
@@ -8,30 +9,16 @@ import data_algebra
 import data_algebra.flow_text
 import data_algebra.data_model
 import data_algebra.db_model
-import data_algebra.pandas_model
 import data_algebra.expr_rep
 import data_algebra.env
 from data_algebra.data_ops_types import *
 import data_algebra.data_ops_utils
 import data_algebra.near_sql
+import data_algebra.optimizer
+import data_algebra.memory_budget
+import data_algebra.util
 
-_have_black = False
-try:
-    # noinspection PyUnresolvedReferences
-    import black
-
-    _have_black = True
-except ImportError:
-    pass
-
-_have_sqlparse = False
-try:
-    # noinspection PyUnresolvedReferences
-    import sqlparse
-
-    _have_sqlparse = True
-except ImportError:
-    pass
+# black and sqlparse are optional, and imported only when pretty printing
 
 
 # wrap a single argument function as a user callable function in pipeling
@@ -54,7 +41,42 @@ def user_fn(fn, var, display_form=None):
     )
 
 
-class ViewRepresentation(OperatorPlatform, ABC):
+# stack of dictionaries from fingerprint to node, top one is active
+_hash_cons_tables = []
+
+
+@contextlib.contextmanager
+def hash_consing(table=None):
+    """
+    Context where building a node structurally identical to one already built in the
+    context returns the earlier node, so identical sub-plans are shared objects.
+
+    :param table: optional dictionary from fingerprint to node, to share nodes across contexts
+    :return: the dictionary from fingerprint to node
+    """
+    if table is None:
+        table = dict()
+    _hash_cons_tables.append(table)
+    try:
+        yield table
+    finally:
+        _hash_cons_tables.pop()
+
+
+class _ViewRepresentationMeta(ABCMeta):
+    """Metaclass implementing the hash_consing() constructor mode."""
+
+    def __call__(cls, *args, **kwargs):
+        node = super().__call__(*args, **kwargs)
+        if len(_hash_cons_tables) < 1:
+            return node
+        if not node.fingerprint_is_stable():
+            return node  # user functions are only equal to themselves
+        table = _hash_cons_tables[-1]
+        return table.setdefault(node.fingerprint(), node)
+
+
+class ViewRepresentation(OperatorPlatform, ABC, metaclass=_ViewRepresentationMeta):
     """Structure to represent the columns of a query or a table.
        Abstract base class."""
 
@@ -89,6 +111,8 @@ class ViewRepresentation(OperatorPlatform, ABC):
                 raise ValueError("all sources must be of class ViewRepresentation")
         self.sources = [si for si in sources]
         self.columns_currently_used = set()
+        self.fingerprint_value = None  # cache for fingerprint()
+        self.fingerprint_stable = None  # cache for fingerprint_is_stable()
         OperatorPlatform.__init__(self, node_name=node_name)
 
     # adaptors
@@ -103,30 +127,61 @@ class ViewRepresentation(OperatorPlatform, ABC):
 
     # characterization
 
+    def _post_order(self):
+        """List of the distinct nodes of the DAG, each after all of its sources.
+        Walks without recursion, so long pipelines do not exhaust the stack."""
+        order = []
+        seen = set()
+        stack = [(self, False)]
+        while len(stack) > 0:
+            node, sources_done = stack.pop()
+            if sources_done:
+                order.append(node)
+                continue
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            stack.append((node, True))
+            for si in reversed(node.sources):
+                if id(si) not in seen:
+                    stack.append((si, False))
+        return order
+
     def get_tables(self, *, replacements=None):
         """Get a dictionary of all tables used in an operator DAG,
         raise an exception if the values are not consistent."""
         tables = {}
-        for i in range(len(self.sources)):
-            s = self.sources[i]
-            if isinstance(s, TableDescription):
-                if replacements is not None and s.key in replacements:
-                    orig_table = replacements[s.key]
-                    if s.column_set != orig_table.column_set:
-                        raise ValueError(
-                            "table " + s.key + " has two incompatible definitions"
-                        )
-                    self.sources[i] = orig_table
-                    s = orig_table
-            ti = s.get_tables(replacements=replacements)
-            for (k, v) in ti.items():
-                if k in tables.keys():
-                    if not tables[k] is v:
-                        raise ValueError(
-                            "Table " + k + " has two different representation objects"
-                        )
-                else:
-                    tables[k] = v
+        changed = set()  # ids of nodes with a replaced table at or under them
+        for node in self._post_order():
+            if isinstance(node, TableDescription):
+                continue
+            for i in range(len(node.sources)):
+                s = node.sources[i]
+                if isinstance(s, TableDescription):
+                    if replacements is not None and s.key in replacements:
+                        orig_table = replacements[s.key]
+                        if s.column_set != orig_table.column_set:
+                            raise ValueError(
+                                "table " + s.key + " has two incompatible definitions"
+                            )
+                        if orig_table is not s:
+                            node.sources[i] = orig_table
+                            changed.add(id(node))
+                        s = orig_table
+                    if s.key in tables.keys():
+                        if not tables[s.key] is s:
+                            raise ValueError(
+                                "Table "
+                                + s.key
+                                + " has two different representation objects"
+                            )
+                    else:
+                        tables[s.key] = s
+                elif id(s) in changed:
+                    changed.add(id(node))
+            if id(node) in changed:
+                # a source changed, so re-derive our fingerprint on demand
+                node.fingerprint_value = None
         return tables
 
     def columns_used_from_sources(self, using=None):
@@ -134,25 +189,41 @@ class ViewRepresentation(OperatorPlatform, ABC):
         with the using columns (None means all)."""
         raise NotImplementedError("base method called")
 
+    def replace_sources(self, sources):
+        """Return a copy of this node (same parameters) with new source nodes.
+        Unlike apply_to() this does not re-run the builder simplifications."""
+        raise NotImplementedError("base method called")
+
     def columns_produced(self):
         return self.column_names.copy()
 
     def _clear_columns_currently_used(self):
-        self.columns_currently_used = set()
-        for si in self.sources:
-            si._clear_columns_currently_used()
+        for node in self._post_order():
+            node.columns_currently_used = set()
 
     def _columns_used_implementation(self, *, using=None):
-        if using is None:
-            self.columns_currently_used.update(self.column_names)
-        else:
-            unknown = set(using) - set(self.column_names)
-            if len(unknown) > 0:
-                raise ValueError("asked for unknown columns: " + str(unknown))
-            self.columns_currently_used.update(using)
-        cu_list = self.columns_used_from_sources(self.columns_currently_used.copy())
-        for i in range(len(self.sources)):
-            self.sources[i]._columns_used_implementation(using=cu_list[i])
+        # work list instead of recursion, so long pipelines do not exhaust the stack
+        visited = set()
+        work = [(self, using)]
+        while len(work) > 0:
+            node, node_using = work.pop()
+            if node_using is None:
+                node_using = node.column_names
+            else:
+                unknown = set(node_using) - set(node.column_names)
+                if len(unknown) > 0:
+                    raise ValueError("asked for unknown columns: " + str(unknown))
+            if (id(node) in visited) and node.columns_currently_used.issuperset(
+                node_using
+            ):
+                continue  # nothing new to pass on
+            visited.add(id(node))
+            node.columns_currently_used.update(node_using)
+            cu_list = node.columns_used_from_sources(
+                node.columns_currently_used.copy()
+            )
+            for i in range(len(node.sources)):
+                work.append((node.sources[i], cu_list[i]))
 
     def columns_used(self, *, using=None):
         """Determine which columns are used from source tables.
@@ -168,20 +239,30 @@ class ViewRepresentation(OperatorPlatform, ABC):
             columns_used[k] = vi.copy()
         return columns_used
 
+    def _forbidden_for_sources(self, forbidden):
+        """Columns forbidden in each source, given columns forbidden in our result."""
+        return [forbidden for _ in self.sources]
+
     def forbidden_columns(self, *, forbidden=None):
         """Determine which columns should not be in source tables"""
         if forbidden is None:
             forbidden = set()
         res = dict()
-        for source in self.sources:
-            forbidden_i = source.forbidden_columns(forbidden=forbidden)
-            for (tk, f) in forbidden_i.items():
-                try:
-                    have = res[tk]
-                except KeyError:
-                    have = set()
-                    res[tk] = have
-                have.update(f)
+        # work list instead of recursion, so long pipelines do not exhaust the stack
+        visited = set()
+        work = [(self, frozenset(forbidden))]
+        while len(work) > 0:
+            node, node_forbidden = work.pop()
+            if (id(node), node_forbidden) in visited:
+                continue
+            visited.add((id(node), node_forbidden))
+            if isinstance(node, TableDescription):
+                res.setdefault(node.key, set()).update(node_forbidden)
+                continue
+            for (si, fi) in zip(
+                node.sources, node._forbidden_for_sources(set(node_forbidden))
+            ):
+                work.append((si, frozenset(fi)))
         return res
 
     # collect as simple structures for YAML I/O and other generic tasks
@@ -212,7 +293,8 @@ class ViewRepresentation(OperatorPlatform, ABC):
             indent=indent, strict=strict, print_sources=True
         )
         if pretty:
-            if _have_black:
+            black = data_algebra.util.optional_import("black")
+            if black is not None:
                 try:
                     if black_mode is None:
                         black_mode = black.FileMode()
@@ -227,31 +309,67 @@ class ViewRepresentation(OperatorPlatform, ABC):
     def __str__(self):
         return self.to_python(strict=True)
 
-    # noinspection PyMethodMayBeStatic,PyUnusedLocal
-    def _equiv_nodes(self, other):
-        """Check if immediate node structure is equivalent, assumes non
-        recursive __eq__ checks are TRUE"""
+    def _fingerprint_parts(self):
+        """List of values that, with the node name, columns, and sources, identify
+        this node's structure"""
+        raise NotImplementedError("base method called")
+
+    def _fingerprint_parts_stable(self):
+        """True if _fingerprint_parts() identifies this node's operations across runs"""
         return True
 
+    def fingerprint(self):
+        """
+        Stable structural hash of the operator DAG rooted at this node (cached).
+        Nodes with the same fingerprint perform the same operations on the same tables.
+        User functions (FnTerm) are only identified by the term holding them, see
+        fingerprint_is_stable().
+
+        :return: hex string
+        """
+        # post-order walk without recursion, so long pipelines do not exhaust the stack
+        stack = [self]
+        while len(stack) > 0:
+            node = stack[-1]
+            if node.fingerprint_value is not None:
+                stack.pop()
+                continue
+            pending = [si for si in node.sources if si.fingerprint_value is None]
+            if len(pending) > 0:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            node.fingerprint_value = data_algebra.util.stable_fingerprint(
+                [node.node_name, node.column_names]
+                + node._fingerprint_parts()
+                + [si.fingerprint_value for si in node.sources]
+            )
+            node.fingerprint_stable = node._fingerprint_parts_stable() and all(
+                [si.fingerprint_stable for si in node.sources]
+            )
+        return self.fingerprint_value
+
+    def fingerprint_is_stable(self):
+        """
+        True if equal fingerprints mean equal operations across runs and processes,
+        False if the DAG uses user functions.
+
+        :return: bool
+        """
+        self.fingerprint()
+        return self.fingerprint_stable
+
     def __eq__(self, other):
         if not isinstance(other, ViewRepresentation):
             return False
+        if self is other:
+            return True
         if not type(self) is type(other):
             return False
-        if self.node_name != other.node_name:
-            return False
-        if self.column_names != other.column_names:
-            return False
-        if self.column_map != other.column_map:
-            return False
-        if len(self.sources) != len(other.sources):
-            return False
-        if not self._equiv_nodes(other):
-            return False
-        for i in range(len(self.sources)):
-            if not self.sources[i].__eq__(other.sources[i]):
-                return False
-        return True
+        return self.fingerprint() == other.fingerprint()
+
+    def __hash__(self):
+        return hash(self.fingerprint())
 
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -269,8 +387,17 @@ class ViewRepresentation(OperatorPlatform, ABC):
         pretty=False,
         encoding=None,
         sqlparse_options=None,
-        temp_tables=None
+        temp_tables=None,
+        optimize=False
     ):
+        if optimize:
+            return data_algebra.optimizer.optimize(self).to_sql(
+                db_model,
+                pretty=pretty,
+                encoding=encoding,
+                sqlparse_options=sqlparse_options,
+                temp_tables=temp_tables,
+            )
         if sqlparse_options is None:
             sqlparse_options = {"reindent": True, "keyword_case": "upper"}
         if not isinstance(db_model, data_algebra.db_model.DBModel):
@@ -289,7 +416,10 @@ class ViewRepresentation(OperatorPlatform, ABC):
                 )
             temp_tables.update(sub_sql.temp_tables)
         sql_str = sub_sql.to_sql(db_model=db_model, force_sql=True)
-        if pretty and _have_sqlparse:
+        sqlparse = None
+        if pretty:
+            sqlparse = data_algebra.util.optional_import("sqlparse")
+        if sqlparse is not None:
             try:
                 sql_str = sqlparse.format(
                     sql_str, encoding=encoding, **sqlparse_options
@@ -331,16 +461,52 @@ class ViewRepresentation(OperatorPlatform, ABC):
                         "Table " + k + " has forbidden columns: " + str(excess)
                     )
 
-    def eval(self, data_map, *, eval_env=None, data_model=None, narrow=True):
+    def eval(
+        self,
+        data_map,
+        *,
+        eval_env=None,
+        data_model=None,
+        narrow=True,
+        optimize=False,
+        cache=None,
+        table_versions=None,
+        max_workers=None,
+        profile=None,
+        memory_tracker=None,
+    ):
         """
          Evaluate operators with respect to Pandas data frames.
          :param data_map: map from table names to data frames
          :param eval_env: environment to evaluate in
          :param data_model: adaptor to data dialect (Pandas for now)
          :param narrow logical, if True don't copy unexpected columns
+         :param optimize logical, if True run data_algebra.optimizer.optimize() first
+         :param cache optional data_algebra.eval_cache.EvalCache, re-use results of earlier evaluations
+                (not used for pipelines with user functions, or eval_env holding values other
+                than None, int, float, str, or bool)
+         :param table_versions optional map from table names to version tokens for the cache,
+                by default tables are versioned by a hash of their contents
+         :param max_workers if more than 1, evaluate independent branches on this many threads
+         :param profile optional data_algebra.eval_profile.EvalProfile, records per node costs
+         :param memory_tracker optional data_algebra.memory_budget.MemoryTracker, records result
+                sizes and enforces its memory budget
          :return:
          """
 
+        if optimize:
+            return data_algebra.optimizer.optimize(self).eval(
+                data_map,
+                eval_env=eval_env,
+                data_model=data_model,
+                narrow=narrow,
+                cache=cache,
+                table_versions=table_versions,
+                max_workers=max_workers,
+                profile=profile,
+                memory_tracker=memory_tracker,
+            )
+
         if not isinstance(data_map, dict):
             raise TypeError("data_map should be a dictionary")
         if len(data_map) < 1:
@@ -362,12 +528,56 @@ class ViewRepresentation(OperatorPlatform, ABC):
             else:
                 if not data_model.is_appropriate_data_instance(data_map[k]):
                     raise ValueError("data_map[" + k + "] was not a usable type")
-        return self.eval_implementation(
-            data_map=data_map, eval_env=eval_env, data_model=data_model, narrow=narrow
+        try:
+            return data_model.eval_dag(
+                self,
+                data_map=data_map,
+                eval_env=eval_env,
+                narrow=narrow,
+                cache=cache,
+                table_versions=table_versions,
+                max_workers=max_workers,
+                profile=profile,
+                memory_tracker=memory_tracker,
+            )
+        except data_algebra.memory_budget.MemoryBudgetExceeded:
+            if (memory_tracker is None) or (memory_tracker.on_exceeded != "spill"):
+                raise
+        # over budget in memory, re-run spilling intermediates to disk
+        memory_tracker.spilled = True
+        evaluator = data_algebra.out_of_core.OutOfCoreEvaluator(
+            memory_budget=memory_tracker.budget, data_model=data_model
+        )
+        return evaluator.eval(self, data_map, eval_env=eval_env, narrow=narrow)
+
+    def eval_stream(self, data_map, *, eval_env=None, data_model=None, narrow=True):
+        """
+         Evaluate operators over streams of data frame chunks, see data_algebra.streaming.
+         :param data_map: map from table names to iterables of data frames
+         :param eval_env: environment to evaluate in
+         :param data_model: adaptor to data dialect (Pandas for now)
+         :param narrow logical, if True don't copy unexpected columns
+         :return: iterator of result data frames
+         """
+        return data_algebra.streaming.eval_stream(
+            self, data_map, eval_env=eval_env, data_model=data_model, narrow=narrow
         )
 
     # noinspection PyPep8Naming
-    def transform(self, X, *, eval_env=None, data_model=None, narrow=True):
+    def transform(
+        self,
+        X,
+        *,
+        eval_env=None,
+        data_model=None,
+        narrow=True,
+        optimize=False,
+        cache=None,
+        table_versions=None,
+        max_workers=None,
+        profile=None,
+        memory_tracker=None,
+    ):
         if data_model is None:
             data_model = data_algebra.pandas_model.PandasModel()
         if not isinstance(data_model, data_algebra.data_model.DataModel):
@@ -389,9 +599,21 @@ class ViewRepresentation(OperatorPlatform, ABC):
                 eval_env=eval_env,
                 data_model=data_model,
                 narrow=narrow,
+                optimize=optimize,
+                cache=cache,
+                table_versions=table_versions,
+                max_workers=max_workers,
+                profile=profile,
+                memory_tracker=memory_tracker,
             )
         raise TypeError("can not apply transform() to type " + str(type(X)))
 
+    # optimization
+
+    def explain(self):
+        """Return a description of this operator DAG before and after optimization."""
+        return data_algebra.optimizer.explain(self)
+
     # composition (used to eliminate intermediate order nodes)
 
     def is_trivial_when_intermediate(self):
@@ -652,6 +874,11 @@ class TableDescription(ViewRepresentation):
             forbidden = set()
         return {self.key: set(forbidden)}
 
+    def replace_sources(self, sources):
+        if len(sources) != 0:
+            raise ValueError("TableDescription has no sources")
+        return self
+
     def apply_to(self, a, *, target_table_key=None):
         if (target_table_key is None) or (target_table_key == self.key):
             # replace table with a
@@ -665,16 +892,8 @@ class TableDescription(ViewRepresentation):
         )
         return r
 
-    def _equiv_nodes(self, other):
-        if not self.table_name == other.table_name:
-            return False
-        if not self.column_names == other.column_names:
-            return False
-        if not self.qualifiers == other.qualifiers:
-            return False
-        if not self.key == other.key:
-            return False
-        return True
+    def _fingerprint_parts(self):
+        return [self.key, sorted(self.qualifiers.items())]
 
     def collect_representation_implementation(self, *, pipeline=None, dialect="Python"):
         if pipeline is None:
@@ -867,6 +1086,18 @@ class ExtendNode(ViewRepresentation):
             self, column_names=column_names, sources=[source], node_name="ExtendNode"
         )
 
+    def replace_sources(self, sources):
+        partition_by = self.partition_by
+        if self.windowed_situation and (len(partition_by) < 1):
+            partition_by = 1  # keep windowed situation
+        return ExtendNode(
+            source=sources[0],
+            parsed_ops=self.ops,
+            partition_by=partition_by,
+            order_by=self.order_by,
+            reverse=self.reverse,
+        )
+
     def apply_to(self, a, *, target_table_key=None):
         new_sources = [
             s.apply_to(a, target_table_key=target_table_key) for s in self.sources
@@ -878,18 +1109,17 @@ class ExtendNode(ViewRepresentation):
             reverse=self.reverse,
         )
 
-    def _equiv_nodes(self, other):
-        if not self.windowed_situation == other.windowed_situation:
-            return False
-        if not self.partition_by == other.partition_by:
-            return False
-        if not self.order_by == other.order_by:
-            return False
-        if not self.reverse == other.reverse:
-            return False
-        if not self.ops == other.ops:
-            return False
-        return True
+    def _fingerprint_parts(self):
+        return [
+            self.windowed_situation,
+            self.partition_by,
+            self.order_by,
+            self.reverse,
+            [(k, op.fingerprint()) for (k, op) in self.ops.items()],
+        ]
+
+    def _fingerprint_parts_stable(self):
+        return all([op.fingerprint_is_stable() for op in self.ops.values()])
 
     def check_extend_window_fns(self):
         window_situation = (len(self.partition_by) > 0) or (len(self.order_by) > 0)
@@ -1034,11 +1264,11 @@ class ProjectNode(ViewRepresentation):
             # TODO: check op is in list of aggregators
             # Note: non-aggregators making through will be caught by table shape check
 
-    def forbidden_columns(self, *, forbidden=None):
-        if forbidden is None:
-            forbidden = set()
-        forbidden = set(forbidden).intersection(self.column_names)
-        return self.sources[0].forbidden_columns(forbidden=forbidden)
+    def _forbidden_for_sources(self, forbidden):
+        return [set(forbidden).intersection(self.column_names)]
+
+    def replace_sources(self, sources):
+        return ProjectNode(source=sources[0], parsed_ops=self.ops, group_by=self.group_by)
 
     def apply_to(self, a, *, target_table_key=None):
         new_sources = [
@@ -1048,12 +1278,11 @@ class ProjectNode(ViewRepresentation):
             parsed_ops=self.ops, group_by=self.group_by
         )
 
-    def _equiv_nodes(self, other):
-        if not self.group_by == other.group_by:
-            return False
-        if not self.ops == other.ops:
-            return False
-        return True
+    def _fingerprint_parts(self):
+        return [self.group_by, [(k, op.fingerprint()) for (k, op) in self.ops.items()]]
+
+    def _fingerprint_parts_stable(self):
+        return all([op.fingerprint_is_stable() for op in self.ops.values()])
 
     def columns_used_from_sources(self, using=None):
         if using is None:
@@ -1132,18 +1361,20 @@ class SelectRowsNode(ViewRepresentation):
             node_name="SelectRowsNode",
         )
 
+    def replace_sources(self, sources):
+        return SelectRowsNode(source=sources[0], ops=self.ops)
+
     def apply_to(self, a, *, target_table_key=None):
         new_sources = [
             s.apply_to(a, target_table_key=target_table_key) for s in self.sources
         ]
         return new_sources[0].select_rows_parsed(parsed_ops=self.ops)
 
-    def _equiv_nodes(self, other):
-        if not self.expr == other.expr:
-            return False
-        if not self.decision_columns == other.decision_columns:
-            return False
-        return True
+    def _fingerprint_parts(self):
+        return [self.expr.fingerprint()]
+
+    def _fingerprint_parts_stable(self):
+        return self.expr.fingerprint_is_stable()
 
     def columns_used_from_sources(self, using=None):
         columns_we_take = self.sources[0].column_set.copy()
@@ -1208,11 +1439,11 @@ class SelectColumnsNode(ViewRepresentation):
             node_name="SelectColumnsNode",
         )
 
-    def forbidden_columns(self, *, forbidden=None):
-        if forbidden is None:
-            forbidden = set()
-        forbidden = set(forbidden).intersection(self.column_selection)
-        return self.sources[0].forbidden_columns(forbidden=forbidden)
+    def _forbidden_for_sources(self, forbidden):
+        return [set(forbidden).intersection(self.column_selection)]
+
+    def replace_sources(self, sources):
+        return SelectColumnsNode(source=sources[0], columns=self.column_selection)
 
     def apply_to(self, a, *, target_table_key=None):
         new_sources = [
@@ -1220,10 +1451,8 @@ class SelectColumnsNode(ViewRepresentation):
         ]
         return new_sources[0].select_columns(columns=self.column_selection)
 
-    def _equiv_nodes(self, other):
-        if not self.column_selection == other.column_selection:
-            return False
-        return True
+    def _fingerprint_parts(self):
+        return [self.column_selection]
 
     def columns_used_from_sources(self, using=None):
         cols = set(self.column_selection.copy())
@@ -1284,11 +1513,13 @@ class DropColumnsNode(ViewRepresentation):
             node_name="DropColumnsNode",
         )
 
-    def forbidden_columns(self, *, forbidden=None):
-        if forbidden is None:
-            forbidden = set()
-        forbidden = set(forbidden) - set(self.column_deletions)
-        return self.sources[0].forbidden_columns(forbidden=forbidden)
+    def _forbidden_for_sources(self, forbidden):
+        return [set(forbidden) - set(self.column_deletions)]
+
+    def replace_sources(self, sources):
+        return DropColumnsNode(
+            source=sources[0], column_deletions=self.column_deletions
+        )
 
     def apply_to(self, a, *, target_table_key=None):
         new_sources = [
@@ -1296,10 +1527,8 @@ class DropColumnsNode(ViewRepresentation):
         ]
         return new_sources[0].drop_columns(column_deletions=self.column_deletions)
 
-    def _equiv_nodes(self, other):
-        if not self.column_deletions == other.column_deletions:
-            return False
-        return True
+    def _fingerprint_parts(self):
+        return [self.column_deletions]
 
     def columns_used_from_sources(self, using=None):
         if using is None:
@@ -1369,6 +1598,14 @@ class OrderRowsNode(ViewRepresentation):
             node_name="OrderRowsNode",
         )
 
+    def replace_sources(self, sources):
+        return OrderRowsNode(
+            source=sources[0],
+            columns=self.order_columns,
+            reverse=self.reverse,
+            limit=self.limit,
+        )
+
     def apply_to(self, a, *, target_table_key=None):
         new_sources = [
             s.apply_to(a, target_table_key=target_table_key) for s in self.sources
@@ -1377,14 +1614,8 @@ class OrderRowsNode(ViewRepresentation):
             columns=self.order_columns, reverse=self.reverse, limit=self.limit
         )
 
-    def _equiv_nodes(self, other):
-        if not self.order_columns == other.order_columns:
-            return False
-        if not self.reverse == other.reverse:
-            return False
-        if not self.limit == other.limit:
-            return False
-        return True
+    def _fingerprint_parts(self):
+        return [self.order_columns, self.reverse, self.limit]
 
     def columns_used_from_sources(self, using=None):
         cols = set(self.column_names.copy())
@@ -1476,13 +1707,16 @@ class RenameColumnsNode(ViewRepresentation):
             node_name="RenameColumnsNode",
         )
 
-    def forbidden_columns(self, *, forbidden=None):
+    def _forbidden_for_sources(self, forbidden):
         # this is where forbidden columns are introduced
-        if forbidden is None:
-            forbidden = set()
         new_forbidden = set(forbidden) - self.reverse_mapping.keys()
         new_forbidden.update(self.new_columns)
-        return self.sources[0].forbidden_columns(forbidden=new_forbidden)
+        return [new_forbidden]
+
+    def replace_sources(self, sources):
+        return RenameColumnsNode(
+            source=sources[0], column_remapping=self.column_remapping
+        )
 
     def apply_to(self, a, *, target_table_key=None):
         new_sources = [
@@ -1490,10 +1724,8 @@ class RenameColumnsNode(ViewRepresentation):
         ]
         return new_sources[0].rename_columns(column_remapping=self.column_remapping)
 
-    def _equiv_nodes(self, other):
-        if not self.column_remapping == other.column_remapping:
-            return False
-        return True
+    def _fingerprint_parts(self):
+        return [sorted(self.column_remapping.items())]
 
     def columns_used_from_sources(self, using=None):
         if using is None:
@@ -1578,6 +1810,11 @@ class NaturalJoinNode(ViewRepresentation):
         self.jointype = data_algebra.expr_rep.standardize_join_type(jointype)
         self.get_tables()  # causes a throw if left and right table descriptions are inconsistent
 
+    def replace_sources(self, sources):
+        return NaturalJoinNode(
+            a=sources[0], b=sources[1], by=self.by, jointype=self.jointype
+        )
+
     def apply_to(self, a, *, target_table_key=None):
         new_sources = [
             s.apply_to(a, target_table_key=target_table_key) for s in self.sources
@@ -1586,12 +1823,8 @@ class NaturalJoinNode(ViewRepresentation):
             b=new_sources[1], by=self.by, jointype=self.jointype
         )
 
-    def _equiv_nodes(self, other):
-        if not self.by == other.by:
-            return False
-        if not self.jointype == other.jointype:
-            return False
-        return True
+    def _fingerprint_parts(self):
+        return [self.by, self.jointype]
 
     def columns_used_from_sources(self, using=None):
         if using is None:
@@ -1679,6 +1912,15 @@ class ConcatRowsNode(ViewRepresentation):
         self.b_name = b_name
         self.get_tables()  # causes a throw if left and right table descriptions are inconsistent
 
+    def replace_sources(self, sources):
+        return ConcatRowsNode(
+            a=sources[0],
+            b=sources[1],
+            id_column=self.id_column,
+            a_name=self.a_name,
+            b_name=self.b_name,
+        )
+
     def apply_to(self, a, *, target_table_key=None):
         new_sources = [
             s.apply_to(a, target_table_key=target_table_key) for s in self.sources
@@ -1690,14 +1932,8 @@ class ConcatRowsNode(ViewRepresentation):
             b_name=self.b_name,
         )
 
-    def _equiv_nodes(self, other):
-        if not self.id_column == other.id_column:
-            return False
-        if not self.a_name == other.a_name:
-            return False
-        if not self.b_name == other.b_name:
-            return False
-        return True
+    def _fingerprint_parts(self):
+        return [self.id_column, self.a_name, self.b_name]
 
     def columns_used_from_sources(self, using=None):
         if using is None:
@@ -1783,16 +2019,17 @@ class ConvertRecordsNode(ViewRepresentation):
         )
         return res
 
+    def replace_sources(self, sources):
+        return ConvertRecordsNode(source=sources[0], record_map=self.record_map)
+
     def apply_to(self, a, *, target_table_key=None):
         new_sources = [
             s.apply_to(a, target_table_key=target_table_key) for s in self.sources
         ]
         return new_sources[0].convert_records(record_map=self.record_map)
 
-    def _equiv_nodes(self, other):
-        if not self.record_map == other.record_map:
-            return False
-        return True
+    def _fingerprint_parts(self):
+        return [self.record_map.to_simple_obj()]
 
     def columns_used_from_sources(self, using=None):
         return [self.record_map.columns_needed]
@@ -1825,21 +2062,25 @@ class ConvertRecordsNode(ViewRepresentation):
     def to_sql_implementation(self, db_model, *, using, temp_id_source):
         if temp_id_source is None:
             temp_id_source = [0]
-        # TODO: narrow to what we are using
+        # the source only needs to supply the columns the record map reads
+        subusing = self.columns_used_from_sources()[0]
         sub_query = self.sources[0].to_sql_implementation(
-            db_model=db_model, using=None, temp_id_source=temp_id_source
-        )
-        # claims to use all columns
-        query = sub_query.to_sql(
-            columns=self.columns_used_from_sources()[0], db_model=db_model
+            db_model=db_model, using=set(subusing), temp_id_source=temp_id_source
         )
+        query = sub_query.to_sql(columns=subusing, db_model=db_model)
         blocks_out_table = None
         if self.record_map.blocks_in is not None:
             query = db_model.blocks_to_row_recs_query(
                 query, record_spec=self.record_map.blocks_in
             )
         if self.record_map.blocks_out is not None:
-            blocks_out_table = self.blocks_out_table(temp_id_source=temp_id_source)
+            # small control tables are written into the query, larger ones are
+            # returned as temporary tables for the caller to insert
+            control_table = self.record_map.blocks_out.control_table
+            if control_table.shape[0] > db_model.max_inline_control_rows:
+                blocks_out_table = self.blocks_out_table(
+                    temp_id_source=temp_id_source
+                )
             query = db_model.row_recs_to_blocks_query(
                 query,
                 record_spec=self.record_map.blocks_out,
@@ -2,6 +2,8 @@ import math
 import re
 import io
 
+import numpy
+
 import data_algebra
 
 import data_algebra.near_sql
@@ -92,11 +94,13 @@ class DBModel:
         string_quote="'",
         sql_formatters=None,
         op_replacements=None,
-        local_data_model=None
+        local_data_model=None,
+        max_inline_control_rows=1000
     ):
-        if local_data_model is None:
-            local_data_model = data_algebra.default_data_model
-        self.local_data_model = local_data_model
+        # None means data_algebra.default_data_model, looked up on first use
+        self._local_data_model = local_data_model
+        # larger record control tables are shipped as temporary tables
+        self.max_inline_control_rows = max_inline_control_rows
         if sql_formatters is None:
             sql_formatters = {}
         self.identifier_quote = identifier_quote
@@ -111,6 +115,16 @@ class DBModel:
             op_replacements = db_default_op_replacements
         self.op_replacements = op_replacements
 
+    @property
+    def local_data_model(self):
+        if self._local_data_model is None:
+            self._local_data_model = data_algebra.default_data_model
+        return self._local_data_model
+
+    @local_data_model.setter
+    def local_data_model(self, value):
+        self._local_data_model = value
+
     def prepare_connection(self, conn):
         pass
 
@@ -685,19 +699,58 @@ class DBModel:
         )
         return near_sql
 
+    def control_table_to_sql(self, control_table):
+        """
+        SQL listing the rows of a record control table as literals (a UNION ALL of
+        single row SELECTs), so the table need not be stored in the database.
+
+        :param control_table: data frame
+        :return: SQL query string
+        """
+        rows = []
+        for i in range(control_table.shape[0]):
+            terms = []
+            for c in control_table.columns:
+                v = control_table[c].iloc[i]
+                if isinstance(v, numpy.generic):
+                    v = v.item()
+                terms.append(self.value_to_sql(v) + " AS " + self.quote_identifier(c))
+            rows.append("SELECT " + ", ".join(terms))
+        return "\n  UNION ALL\n  ".join(rows)
+
     def row_recs_to_blocks_query(
-        self, source_sql, record_spec, record_view, *, using=None, temp_id_source=None
+        self,
+        source_sql,
+        record_spec,
+        record_view=None,
+        *,
+        using=None,
+        temp_id_source=None
     ):
+        """
+        :param source_sql: SQL of the row records
+        :param record_spec: data_algebra.cdata.RecordSpecification of the blocks
+        :param record_view: description of a table holding the control table, None to inline it
+        :return: SQL query string
+        """
         if temp_id_source is None:
             temp_id_source = [0]
         # if not isinstance(record_spec, data_algebra.cdata.RecordSpecification):
         #     raise TypeError(
         #         "record_spec should be a data_algebra.cdata.RecordSpecification"
         #     )
-        if not isinstance(record_view, data_algebra.data_ops_types.OperatorPlatform):
-            raise TypeError(
-                "record_view should be a data_algebra.data_ops_types.OperatorPlatform"
-            )
+        if record_view is None:
+            record_sql = self.control_table_to_sql(record_spec.control_table)
+        else:
+            if not isinstance(
+                record_view, data_algebra.data_ops_types.OperatorPlatform
+            ):
+                raise TypeError(
+                    "record_view should be a data_algebra.data_ops_types.OperatorPlatform"
+                )
+            record_sql = record_view.to_sql_implementation(
+                self, using=using, temp_id_source=temp_id_source
+            ).to_sql(db_model=self, columns=using, force_sql=True)
         control_value_cols = [
             c
             for c in record_spec.control_table.columns
@@ -752,9 +805,7 @@ class DBModel:
             + source_sql
             + " ) a\n"
             + "CROSS JOIN (\n  "
-            + record_view.to_sql_implementation(
-                self, using=using, temp_id_source=temp_id_source
-            ).to_sql(db_model=self, columns=using, force_sql=True)
+            + record_sql
             + " ) b\n"
             + " ORDER BY "
             + ", ".join(control_cols)
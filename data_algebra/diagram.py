@@ -1,39 +1,32 @@
-have_graphviz = False
-try:
-    # noinspection PyUnresolvedReferences
-    import graphviz
+import importlib.util
 
-    have_graphviz = True
-except ImportError:
-    have_graphviz = False
-
-
-have_black = False
-try:
-    # noinspection PyUnresolvedReferences
-    import black
-
-    have_black = True
-except ImportError:
-    have_black = False
+import data_algebra.data_ops
+import data_algebra.util
 
 
-import data_algebra.data_ops
+# check for the optional packages without importing them, they are imported on first use
+have_graphviz = importlib.util.find_spec("graphviz") is not None
+have_black = importlib.util.find_spec("black") is not None
 
 
-def _get_op_str(op):
+def _get_op_str(op, annotate=None):
     op_str = op.to_python_implementation(print_sources=False)
-    if have_black:
+    black = data_algebra.util.optional_import("black")
+    if black is not None:
         # noinspection PyBroadException
         try:
             black_mode = black.FileMode(line_length=60)
             op_str = black.format_str(op_str, mode=black_mode)
         except Exception:
             pass
+    if annotate is not None:
+        note = annotate(op)
+        if note is not None:
+            op_str = op_str.rstrip() + "\n[" + note + "]"
     return op_str
 
 
-def _to_digraph_r_nodes(ops, dot, table_keys, nextid, edges):
+def _to_digraph_r_nodes(ops, dot, table_keys, nextid, edges, annotate=None):
     if isinstance(ops, data_algebra.data_ops.TableDescription):
         try:
             return table_keys[ops.key]
@@ -42,11 +35,16 @@ def _to_digraph_r_nodes(ops, dot, table_keys, nextid, edges):
             table_keys[ops.key] = node_id
             nextid[0] = node_id + 1
             dot.attr("node", shape="folder", color="blue")
-            dot.node(str(node_id), _get_op_str(ops))
+            dot.node(str(node_id), _get_op_str(ops, annotate))
             return node_id
     source_ids = [
         _to_digraph_r_nodes(
-            ops=op, dot=dot, table_keys=table_keys, nextid=nextid, edges=edges
+            ops=op,
+            dot=dot,
+            table_keys=table_keys,
+            nextid=nextid,
+            edges=edges,
+            annotate=annotate,
         )
         for op in ops.sources
     ]
@@ -60,16 +58,26 @@ def _to_digraph_r_nodes(ops, dot, table_keys, nextid, edges):
         for sub_id in source_ids:
             edges.append((str(sub_id), str(node_id), None))
     dot.attr("node", shape="note", color="darkgreen")
-    dot.node(str(node_id), _get_op_str(ops))
+    dot.node(str(node_id), _get_op_str(ops, annotate))
     return node_id
 
 
-def to_digraph(ops):
-    if not have_graphviz:
+def to_digraph(ops, *, annotate=None):
+    """
+    Draw an operator DAG.
+
+    :param ops: data_algebra.data_ops.ViewRepresentation
+    :param annotate: optional function from nodes to extra label text (or None)
+    :return: graphviz.Digraph
+    """
+    graphviz = data_algebra.util.optional_import("graphviz")
+    if graphviz is None:
         raise RuntimeError("graphviz not installed")
     dot = graphviz.Digraph()
     edges = []
-    _to_digraph_r_nodes(ops=ops, dot=dot, table_keys={}, nextid=[0], edges=edges)
+    _to_digraph_r_nodes(
+        ops=ops, dot=dot, table_keys={}, nextid=[0], edges=edges, annotate=annotate
+    )
     for (sub_id, node_id, label) in edges:
         if label is None:
             dot.edge(sub_id, node_id)
@@ -0,0 +1,117 @@
+"""
+Cache of evaluation results shared across calls to ViewRepresentation.eval().
+
+Results are stored per node, keyed by the node's structural fingerprint, the
+columns it was asked to produce, the evaluation settings (including eval_env),
+and version tokens of the tables it reads.  Pipelines using user functions are
+not cached, as functions can be re-defined without changing the pipeline.  So
+re-running a pipeline after one input table changed re-uses the results of the
+branches that do not read that table.  Entries are evicted least recently used
+first once the entry or byte limits are exceeded.  A cache can be shared by
+threads (such as those of eval(max_workers=...)).
+"""
+
+import collections
+import threading
+
+
+class EvalCache:
+    """Bounded least recently used store of intermediate and final results."""
+
+    def __init__(self, *, max_entries=128, max_bytes=None):
+        """
+        :param max_entries: maximum number of results to keep, None for no limit
+        :param max_bytes: maximum total size of results to keep, None for no limit
+        """
+        if (max_entries is not None) and (max_entries < 1):
+            raise ValueError("max_entries must be at least 1")
+        if (max_bytes is not None) and (max_bytes < 1):
+            raise ValueError("max_bytes must be at least 1")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()  # key to (result, size), oldest first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()  # guards entries, sizes, and counts
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries.keys()
+
+    def get(self, key):
+        """
+        Look up a result, marking it as recently used.
+
+        :param key: hashable key
+        :return: a copy of the stored result, or None if not present
+        """
+        with self.lock:
+            try:
+                res, size = self.entries[key]
+            except KeyError:
+                self.misses = self.misses + 1
+                return None
+            self.hits = self.hits + 1
+            self.entries.move_to_end(key)
+        # stored results are never altered, so they can be copied outside the lock
+        return res.copy()
+
+    def put(self, key, res):
+        """
+        Store a result (a copy is kept, so the caller is free to alter res).
+
+        :param key: hashable key
+        :param res: result to store
+        :return: None
+        """
+        size = _result_size(res)
+        if (self.max_bytes is not None) and (size > self.max_bytes):
+            return  # would evict everything else, and still not fit
+        res = res.copy()
+        with self.lock:
+            if key in self.entries.keys():
+                self.total_bytes = self.total_bytes - self.entries[key][1]
+                del self.entries[key]
+            self.entries[key] = (res, size)
+            self.total_bytes = self.total_bytes + size
+            while (
+                (self.max_entries is not None)
+                and (len(self.entries) > self.max_entries)
+            ) or (
+                (self.max_bytes is not None) and (self.total_bytes > self.max_bytes)
+            ):
+                _, (_, old_size) = self.entries.popitem(last=False)
+                self.total_bytes = self.total_bytes - old_size
+                self.evictions = self.evictions + 1
+
+    def clear(self):
+        """Remove all entries (statistics are kept)."""
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        """
+        :return: dictionary of hit, miss, eviction counts and current size
+        """
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+            }
+
+
+def _result_size(res):
+    try:
+        return int(res.memory_usage(index=True, deep=True).sum())
+    except AttributeError:
+        return 0
@@ -0,0 +1,296 @@
+"""
+Book-keeping for a single evaluation of an operator DAG.
+
+Operator DAGs can share sub-DAGs (a self join of an aggregated view, or a
+concat_rows() of two filters of the same extended table).  Plain recursive
+evaluation would calculate a shared node once per consumer.  An EvalPlan counts
+the consumers of each node, keeps the first result of a shared node until its
+last consumer has taken it, and then releases it.
+
+Nodes are identified by structural fingerprint (and the columns they are asked
+to produce), so separately built but identical sub-DAGs are also calculated once.
+With a data_algebra.eval_cache.EvalCache, results are also looked up and stored
+across evaluations, additionally keyed by versions of the tables each node reads
+(and the evaluation settings, see eval_env_key()).
+
+run() calculates the nodes one at a time in a linear (topological) order, instead
+of recursing from the root.  So pipelines of thousands of steps do not hit the
+recursion limit, and each intermediate result is released as soon as its last
+consumer has taken it.  run_parallel() calculates the nodes on a pool of threads,
+each node as soon as its sources are ready, so independent branches (such as the
+two sides of a join) run at the same time.  Results do not depend on the scheduling.
+"""
+
+import concurrent.futures
+import threading
+
+
+def node_key(op):
+    """
+    Key identifying the result of evaluating a node.
+
+    :param op: data_algebra.data_ops.ViewRepresentation
+    :return: hashable key
+    """
+    return op.fingerprint(), tuple(sorted(op.columns_currently_used))
+
+
+def eval_env_key(eval_env):
+    """
+    Key identifying an evaluation environment by value, for cache keys.
+
+    :param eval_env: None or dictionary from names to values
+    :return: hashable key, or None if the environment can not be keyed by value
+             (such as one holding functions, which can be re-defined)
+    """
+    if eval_env is None:
+        return ()
+    key = []
+    for k in sorted(eval_env.keys()):
+        v = eval_env[k]
+        if (v is not None) and (type(v) not in {int, float, str, bool}):
+            return None
+        key.append((k, type(v).__name__, repr(v)))
+    return tuple(key)
+
+
+class EvalPlan:
+    """Evaluate each distinct node of an operator DAG at most once."""
+
+    def __init__(self, ops, *, cache=None, table_versions=None, cache_context=None):
+        """
+        :param ops: data_algebra.data_ops.ViewRepresentation, root of the DAG to evaluate
+        :param cache: optional data_algebra.eval_cache.EvalCache to re-use results across evaluations
+        :param table_versions: dictionary from table names to version tokens, required with cache
+        :param cache_context: hashable value added to cache keys (evaluation settings)
+        """
+        if (cache is not None) and (table_versions is None):
+            raise ValueError("table_versions is required when using a cache")
+        self.cache = cache
+        self.table_versions = table_versions
+        self.cache_context = cache_context
+        self.tables_read = dict()  # id(node) to sorted tuple of table names read
+        self.keys = dict()  # id(node) to node_key(node)
+        self.consumer_counts = dict()  # node key to number of consuming edges
+        self.results = dict()  # node key to result waiting for more consumers
+        self.remaining = dict()  # node key to number of consumers yet to take result
+        self.nodes = dict()  # node key to a node with that key
+        self.lock = threading.Lock()  # guards results and remaining
+        stack = [ops]
+        while len(stack) > 0:
+            node = stack.pop()
+            key = self.key(node)
+            if key in self.nodes.keys():
+                continue
+            self.nodes[key] = node
+            for s in node.sources:
+                s_key = self.key(s)
+                self.consumer_counts[s_key] = self.consumer_counts.get(s_key, 0) + 1
+                stack.append(s)
+
+    def key(self, op):
+        try:
+            return self.keys[id(op)]
+        except KeyError:
+            key = node_key(op)
+            self.keys[id(op)] = key
+            return key
+
+    def _get_tables_read(self, op):
+        # post-order walk without recursion, so long pipelines do not exhaust the stack
+        stack = [op]
+        while len(stack) > 0:
+            node = stack[-1]
+            if id(node) in self.tables_read.keys():
+                stack.pop()
+                continue
+            pending = [s for s in node.sources if id(s) not in self.tables_read.keys()]
+            if len(pending) > 0:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            tables = set()
+            if node.node_name == "TableDescription":
+                tables.add(node.table_name)
+            for s in node.sources:
+                tables.update(self.tables_read[id(s)])
+            self.tables_read[id(node)] = tuple(sorted(tables))
+        return self.tables_read[id(op)]
+
+    def cache_key(self, op):
+        """
+        Key of op's result in the cache, changes when a table op reads changes version.
+
+        :param op: data_algebra.data_ops.ViewRepresentation
+        :return: hashable key
+        """
+        versions = tuple(
+            [(k, self.table_versions[k]) for k in self._get_tables_read(op)]
+        )
+        return self.cache_context, self.key(op), versions
+
+    def _cached(self, op, compute):
+        def compute_cached():
+            key = self.cache_key(op)
+            res = self.cache.get(key)
+            if res is None:
+                res = compute()
+                self.cache.put(key, res)
+            return res
+
+        return compute_cached
+
+    def is_shared(self, op):
+        return self.consumer_counts.get(self.key(op), 0) > 1
+
+    def get(self, op, compute):
+        """
+        Get the result of op, calculating it only on first request.
+
+        :param op: data_algebra.data_ops.ViewRepresentation
+        :param compute: function with no arguments that calculates the result of op
+        :return: result, a value steps are free to alter
+        """
+        key = self.key(op)
+        with self.lock:
+            if key in self.results.keys():
+                return self._take(key)
+        if (self.cache is not None) and (op.node_name != "TableDescription"):
+            compute = self._cached(op, compute)
+        if not self.is_shared(op):
+            return compute()
+        res = compute()
+        with self.lock:
+            self._store(key, res)
+            return self._take(key)
+
+    def _store(self, key, res):
+        self.results[key] = res
+        self.remaining[key] = self.consumer_counts.get(key, 0)
+
+    def _take(self, key):
+        # call holding self.lock, so the last consumer can't alter res during our copy
+        res = self.results[key]
+        self.remaining[key] = self.remaining[key] - 1
+        if self.remaining[key] <= 0:
+            # last consumer gets the original, and we release our reference
+            del self.results[key]
+            del self.remaining[key]
+            return res
+        return res.copy()
+
+    def _task(self, node, compute):
+        if (self.cache is not None) and (node.node_name != "TableDescription"):
+            return self._cached(node, lambda: compute(node))()
+        return compute(node)
+
+    def _needed_order(self, ops):
+        """
+        Keys of the nodes that must be calculated for ops, each after its sources.
+        Sources of nodes found in the cache are not needed.  Re-counts consumers
+        to match.
+
+        :param ops: data_algebra.data_ops.ViewRepresentation, the root this plan was built for
+        :return: list of keys, ending with the key of ops
+        """
+        # post-order walk over distinct keys, without recursion
+        order = []
+        done = set()
+        consumer_counts = dict()
+        stack = [(self.key(ops), False)]
+        while len(stack) > 0:
+            key, sources_done = stack.pop()
+            if sources_done:
+                order.append(key)
+                continue
+            if key in done:
+                continue
+            done.add(key)
+            stack.append((key, True))
+            node = self.nodes[key]
+            if (
+                (self.cache is not None)
+                and (node.node_name != "TableDescription")
+                and (self.cache_key(node) in self.cache)
+            ):
+                continue
+            for s in reversed(node.sources):
+                s_key = self.key(s)
+                consumer_counts[s_key] = consumer_counts.get(s_key, 0) + 1
+                if s_key not in done:
+                    stack.append((s_key, False))
+        self.consumer_counts = consumer_counts
+        return order
+
+    def run(self, ops, compute):
+        """
+        Calculate the nodes of the DAG, each once and after the nodes it reads.
+        The node calculations get their source results through get().
+
+        :param ops: data_algebra.data_ops.ViewRepresentation, the root this plan was built for
+        :param compute: function taking a node and returning its result
+        :return: result of ops
+        """
+        root_key = self.key(ops)
+        order = self._needed_order(ops)
+        for key in order[:-1]:
+            res = self._task(self.nodes[key], compute)
+            with self.lock:
+                self._store(key, res)
+            del res  # only the plan holds the result, until the last consumer takes it
+        return self._task(self.nodes[root_key], compute)
+
+    def run_parallel(self, ops, compute, *, max_workers):
+        """
+        Calculate every node of the DAG on a pool of threads, each node once and as
+        soon as the nodes it reads are done.  The node calculations get their source
+        results through get().
+
+        :param ops: data_algebra.data_ops.ViewRepresentation, the root this plan was built for
+        :param compute: function taking a node and returning its result
+        :param max_workers: number of threads
+        :return: result of ops
+        """
+        root_key = self.key(ops)
+        needed = set(self._needed_order(ops))
+        waiting_on = dict()  # node key to set of source keys not yet calculated
+        dependents = dict()  # node key to set of keys of nodes reading it
+        for key in needed:
+            node = self.nodes[key]
+            waiting_on[key] = set([self.key(s) for s in node.sources]).intersection(
+                needed
+            )
+            for s_key in waiting_on[key]:
+                dependents.setdefault(s_key, set()).add(key)
+
+        root_res = None
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = dict()
+            for (key, w) in waiting_on.items():
+                if len(w) < 1:
+                    futures[executor.submit(self._task, self.nodes[key], compute)] = key
+            try:
+                while len(futures) > 0:
+                    done, _ = concurrent.futures.wait(
+                        futures.keys(), return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for f in done:
+                        key = futures.pop(f)
+                        res = f.result()
+                        if key == root_key:
+                            root_res = res
+                            continue
+                        with self.lock:
+                            self._store(key, res)
+                        for d_key in sorted(dependents.get(key, set())):
+                            waiting_on[d_key].discard(key)
+                            if len(waiting_on[d_key]) < 1:
+                                f_d = executor.submit(
+                                    self._task, self.nodes[d_key], compute
+                                )
+                                futures[f_d] = d_key
+            except Exception:
+                for f in futures.keys():
+                    f.cancel()
+                raise
+        return root_res
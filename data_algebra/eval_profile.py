@@ -0,0 +1,169 @@
+"""
+Per node measurements of an evaluation.
+
+Pass an EvalProfile as the profile argument of ViewRepresentation.eval() (or
+transform(), or SQLiteModel.eval()) to record, for each node calculated, the
+wall and CPU time spent, the input and output row counts, the output column
+count, and the approximate output memory.  Without a profile nothing is timed or
+measured.  Nodes whose results came from a data_algebra.eval_cache.EvalCache are
+not calculated, so they are not recorded (and their consumers' input row counts
+are None).
+"""
+
+import threading
+import time
+
+import data_algebra
+import data_algebra.diagram
+
+
+# CPU time of the calling thread (Python 3.7 and later), else of the whole process
+_cpu_clock = getattr(time, "thread_time", time.process_time)
+
+
+_fields = [
+    "step",
+    "op",
+    "node_name",
+    "wall_time",
+    "cpu_time",
+    "input_rows",
+    "output_rows",
+    "output_columns",
+    "output_bytes",
+]
+
+
+def _shape(res):
+    # noinspection PyBroadException
+    try:
+        n_rows, n_columns = res.shape
+    except Exception:
+        return None, None
+    return int(n_rows), int(n_columns)
+
+
+def _memory(res):
+    try:
+        return int(res.memory_usage(index=True, deep=True).sum())
+    except AttributeError:
+        return None
+
+
+class EvalProfile:
+    """Collects one record per evaluated node."""
+
+    def __init__(self):
+        self.records = []
+        self.by_fingerprint = dict()  # node fingerprint to record
+        self.lock = threading.Lock()  # guards records, nodes may run on several threads
+
+    def __len__(self):
+        return len(self.records)
+
+    def clear(self):
+        """Remove all records."""
+        with self.lock:
+            self.records = []
+            self.by_fingerprint = dict()
+
+    def _input_rows(self, op):
+        total = 0
+        for s in op.sources:
+            rec = self.by_fingerprint.get(s.fingerprint(), None)
+            if (rec is None) or (rec["output_rows"] is None):
+                return None
+            total = total + rec["output_rows"]
+        return total
+
+    def record(self, op, compute, *, input_rows=None):
+        """
+        Run compute() and record its costs as those of op.
+
+        :param op: data_algebra.data_ops.ViewRepresentation being calculated
+        :param compute: function with no arguments returning the result of op
+        :param input_rows: number of rows read, default: sum of recorded source output rows
+        :return: result of compute()
+        """
+        wall_start = time.perf_counter()
+        cpu_start = _cpu_clock()
+        res = compute()
+        cpu_time = _cpu_clock() - cpu_start
+        wall_time = time.perf_counter() - wall_start
+        n_rows, n_columns = _shape(res)
+        if input_rows is None:
+            if op.node_name == "TableDescription":
+                input_rows = n_rows
+            else:
+                with self.lock:
+                    input_rows = self._input_rows(op)
+        rec = {
+            "op": op.to_python_implementation(print_sources=False).strip(),
+            "node_name": op.node_name,
+            "wall_time": wall_time,
+            "cpu_time": cpu_time,
+            "input_rows": input_rows,
+            "output_rows": n_rows,
+            "output_columns": n_columns,
+            "output_bytes": _memory(res),
+        }
+        with self.lock:
+            rec["step"] = len(self.records)
+            self.records.append(rec)
+            self.by_fingerprint[op.fingerprint()] = rec
+        return res
+
+    def wrap(self, compute):
+        """
+        :param compute: function taking a node and returning its result
+        :return: function taking a node and returning its result, recording costs
+        """
+
+        def profiled_compute(node):
+            return self.record(node, lambda: compute(node))
+
+        return profiled_compute
+
+    def report(self):
+        """
+        :return: list of dictionaries, one per evaluated node, in order of completion
+        """
+        with self.lock:
+            return [{k: rec[k] for k in _fields} for rec in self.records]
+
+    def to_data_frame(self, *, data_model=None):
+        """
+        :param data_model: data_algebra.data_model.DataModel, default data_algebra.default_data_model
+        :return: report as a data frame
+        """
+        if data_model is None:
+            data_model = data_algebra.default_data_model
+        return data_model.pd.DataFrame(self.report(), columns=_fields)
+
+    def annotation(self, op):
+        """
+        :param op: data_algebra.data_ops.ViewRepresentation
+        :return: summary of the recorded costs of op, or None if op was not recorded
+        """
+        with self.lock:
+            rec = self.by_fingerprint.get(op.fingerprint(), None)
+        if rec is None:
+            return None
+        parts = [
+            "wall " + "{:.3g}".format(rec["wall_time"]) + "s",
+            "cpu " + "{:.3g}".format(rec["cpu_time"]) + "s",
+            "rows " + str(rec["input_rows"]) + " -> " + str(rec["output_rows"]),
+            "columns " + str(rec["output_columns"]),
+        ]
+        if rec["output_bytes"] is not None:
+            parts.append("bytes " + str(rec["output_bytes"]))
+        return ", ".join(parts)
+
+    def to_digraph(self, ops):
+        """
+        Render ops with recorded costs, see data_algebra.diagram.to_digraph().
+
+        :param ops: data_algebra.data_ops.ViewRepresentation that was evaluated
+        :return: graphviz.Digraph
+        """
+        return data_algebra.diagram.to_digraph(ops, annotate=self.annotation)
@@ -0,0 +1,156 @@
+"""
+Compile data_algebra.expr_rep.Term trees into Python closures over column arrays.
+
+The Pandas engine used to render each expression back to a string (Term.to_pandas())
+and hand it to DataFrame.eval() or DataFrame.query(), which re-tokenizes and re-parses
+the string on every call.  Here we walk the expression tree once, build a closure
+that calls NumPy (and the data model's custom function implementations) directly,
+and cache the closure on the Term.  Expressions we do not know how to compile return
+None, and the caller falls back to the pandas eval path.
+"""
+
+import operator
+
+import numpy
+
+import data_algebra.expr_rep
+
+
+# infix operators, keyed by the op-name stored in data_algebra.expr_rep.Expression
+# ("//" and "%" are left to pandas eval(), whose integer division by zero gives
+# inf and NaN where NumPy gives 0)
+_inline_ops = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "pow": numpy.power,
+    "**": numpy.power,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "and": numpy.logical_and,
+    "or": numpy.logical_or,
+    "xor": numpy.logical_xor,
+}
+
+
+# custom functions (see data_algebra.custom_functions) we can call positionally
+_custom_fn_names = {
+    "is_bad",
+    "is_null",
+    "if_else",
+    "neg",
+    "co_equalizer",
+    "connected_components",
+    "max",
+    "min",
+}
+
+
+def is_numpy_ufunc_name(op):
+    """
+    True if op names an element-wise NumPy function (a numpy.ufunc).
+
+    :param op: string, name of operator
+    :return: bool
+    """
+    return isinstance(getattr(numpy, op, None), numpy.ufunc)
+
+
+def _compile_value(term):
+    value = term.value
+    return lambda frame, fns: value
+
+
+def _compile_column(term):
+    column_name = term.column_name
+    return lambda frame, fns: frame[column_name].values
+
+
+def _compile_list(term):
+    items = [_compile_term(ti) for ti in term.value]
+    if any([fi is None for fi in items]):
+        return None
+    return lambda frame, fns: [fi(frame, fns) for fi in items]
+
+
+def _compile_expression(term):
+    if term.params is not None:
+        return None
+    op = term.op
+    if op == "partitioned_eval":
+        # args: FnTerm, ListTerm of arguments, ListTerm of partition columns
+        if len(term.args) != 3:
+            return None
+        if not isinstance(term.args[0], data_algebra.expr_rep.FnTerm):
+            return None
+        user_fn = term.args[0].value
+        arg_fns = _compile_term(term.args[1])
+        partition_fns = _compile_term(term.args[2])
+        if (arg_fns is None) or (partition_fns is None):
+            return None
+        return lambda frame, fns: fns["partitioned_eval"](
+            user_fn, arg_fns(frame, fns), partition_fns(frame, fns)
+        )
+    args = [_compile_term(ai) for ai in term.args]
+    if (len(args) < 1) or any([ai is None for ai in args]):
+        return None
+    if op in _custom_fn_names:
+        return lambda frame, fns: fns[op](*[ai(frame, fns) for ai in args])
+    if term.inline:
+        if (len(args) != 2) or (op not in _inline_ops.keys()):
+            return None
+        f = _inline_ops[op]
+        a0 = args[0]
+        a1 = args[1]
+        return lambda frame, fns: f(a0(frame, fns), a1(frame, fns))
+    # element-wise NumPy functions: exp(), sin(), arctan2(), ...
+    f = getattr(numpy, op, None)
+    if not isinstance(f, numpy.ufunc):
+        return None
+    if f.nin != len(args):
+        return None
+    if len(args) == 1:
+        a0 = args[0]
+        return lambda frame, fns: f(a0(frame, fns))
+    return lambda frame, fns: f(*[ai(frame, fns) for ai in args])
+
+
+def _compile_term(term):
+    if isinstance(term, data_algebra.expr_rep.Value):
+        return _compile_value(term)
+    if isinstance(term, data_algebra.expr_rep.ColumnReference):
+        return _compile_column(term)
+    if isinstance(term, data_algebra.expr_rep.ListTerm):
+        return _compile_list(term)
+    if isinstance(term, data_algebra.expr_rep.Expression):
+        return _compile_expression(term)
+    return None
+
+
+def compile_term(term):
+    """
+    Compile a term into a function f(frame, fns), or return None if we can not.
+
+    frame is a data frame (anything whose [column_name].values is an array), and fns is
+    a map from custom function names to implementations (PandasModel.pandas_eval_env).
+    The result is cached on the term, so each expression tree is walked only once.
+
+    :param term: data_algebra.expr_rep.Term
+    :return: callable or None
+    """
+    if not isinstance(term, data_algebra.expr_rep.Term):
+        raise TypeError("expected term to be a data_algebra.expr_rep.Term")
+    compiled = getattr(term, "compiled_fn", None)
+    if compiled is None:
+        compiled = _compile_term(term)
+        if compiled is None:
+            compiled = False  # remember we could not compile
+        term.compiled_fn = compiled
+    if compiled is False:
+        return None
+    return compiled
@@ -1,5 +1,6 @@
 from typing import Union
 import collections
+import uuid
 
 import data_algebra.util
 import data_algebra.env
@@ -61,6 +62,14 @@ class Term:
 
     def __init__(self,):
         self.source_string = None
+        self.compiled_fn = None  # cache for data_algebra.expr_compile.compile_term()
+        self.fingerprint_value = None  # cache for fingerprint()
+
+    def __getstate__(self):
+        # compiled closures are only a cache, and are not picklable
+        state = self.__dict__.copy()
+        state["compiled_fn"] = None
+        return state
 
     # builders
 
@@ -111,6 +120,31 @@ class Term:
         """
         pass
 
+    def _fingerprint_parts(self):
+        """List of values that, with the class name, identify this term's structure"""
+        raise NotImplementedError("base class called")
+
+    def fingerprint(self):
+        """
+        Stable structural hash of this term (cached).
+
+        :return: hex string
+        """
+        if self.fingerprint_value is None:
+            self.fingerprint_value = data_algebra.util.stable_fingerprint(
+                [self.__class__.__name__] + self._fingerprint_parts()
+            )
+        return self.fingerprint_value
+
+    def fingerprint_is_stable(self):
+        """
+        True if equal fingerprints mean equal operations across runs and processes.
+        False for terms holding user functions, whose fingerprints only identify the term.
+
+        :return: bool
+        """
+        return True
+
     # emitters
 
     def to_python(self, *, want_inline_parens=False):
@@ -728,6 +762,9 @@ class Value(Term):
     def replace_view(self, view):
         return self
 
+    def _fingerprint_parts(self):
+        return [type(self.value).__name__, self.value.__repr__()]
+
     def to_python(self, *, want_inline_parens=False):
         return self.value.__repr__()
 
@@ -761,6 +798,9 @@ class FnTerm(Term):
             if not isinstance(fn_arg, ColumnReference):
                 raise TypeError("Expected fn_arg to be None or a ColumnReference")
             self.args = [fn_arg]
+        # functions are not identified by name (or id(), which is re-used), so each
+        # FnTerm gets its own fingerprint
+        self.fingerprint_token = uuid.uuid4().hex
         Term.__init__(self)
 
     def get_column_names(self, columns_seen):
@@ -771,6 +811,14 @@ class FnTerm(Term):
         self.args = [ai.replace_view(view) for ai in self.args]
         return self
 
+    def _fingerprint_parts(self):
+        return [self.fingerprint_token, self.display_form, self.op] + [
+            ai.fingerprint() for ai in self.args
+        ]
+
+    def fingerprint_is_stable(self):
+        return False
+
     def to_python(self, *, want_inline_parens=False):
         return Name(self.display_form)
 
@@ -786,6 +834,12 @@ class ListTerm(Term):
         new_list = [ai.replace_view(view) for ai in self.value]
         return ListTerm(new_list)
 
+    def _fingerprint_parts(self):
+        return [ai.fingerprint() for ai in self.value]
+
+    def fingerprint_is_stable(self):
+        return all([ai.fingerprint_is_stable() for ai in self.value])
+
     def to_python(self, *, want_inline_parens=False):
         return (
             "["
@@ -844,6 +898,9 @@ class ColumnReference(Term):
     def replace_view(self, view):
         return ColumnReference(view=view, column_name=self.column_name)
 
+    def _fingerprint_parts(self):
+        return [self.column_name]
+
     def to_python(self, want_inline_parens=False):
         return self.column_name
 
@@ -886,6 +943,17 @@ class Expression(Term):
         for a in self.args:
             a.get_column_names(columns_seen)
 
+    def _fingerprint_parts(self):
+        params = None
+        if self.params is not None:
+            params = sorted([(k, repr(v)) for (k, v) in self.params.items()])
+        return [self.op, self.inline, self.method, params] + [
+            ai.fingerprint() for ai in self.args
+        ]
+
+    def fingerprint_is_stable(self):
+        return all([ai.fingerprint_is_stable() for ai in self.args])
+
     def to_python(self, *, want_inline_parens=False):
         if self.op in py_formatters.keys():
             return py_formatters[self.op](self)
@@ -0,0 +1,218 @@
+"""
+Memory accounting, and an optional memory budget, for in-memory evaluation.
+
+Pass a MemoryTracker as the memory_tracker argument of ViewRepresentation.eval()
+(or transform()) to record the size of each intermediate result
+(DataFrame.memory_usage(deep=True)), the bytes held by the evaluation when it was
+produced, and the running peak.  With trace_allocations=True the peak of
+tracemalloc traced memory during each node is recorded as well (tracing slows
+evaluation down considerably).
+
+With a budget, evaluation stops as soon as the results held would exceed it:
+natural joins estimate their output size from key counts before merging, and
+every other node is checked once calculated.  The raised MemoryBudgetExceeded
+carries a per node diagnosis.  With on_exceeded="spill", eval() instead re-runs
+the pipeline with data_algebra.out_of_core.OutOfCoreEvaluator, which spills to
+disk to stay within the budget.
+"""
+
+import threading
+import tracemalloc
+
+
+def result_size(res):
+    """
+    :param res: data frame
+    :return: approximate number of bytes used by res
+    """
+    try:
+        return int(res.memory_usage(index=True, deep=True).sum())
+    except AttributeError:
+        return 0
+
+
+def reset_traced_peak():
+    """
+    Start a new tracemalloc peak from the current traced size.  Before Python 3.9
+    (no tracemalloc.reset_peak()) tracing is restarted, which also drops the traces.
+
+    :return: None
+    """
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    else:
+        # reset_peak() is new in Python 3.9, restarting also resets the peak
+        tracemalloc.stop()
+        tracemalloc.start()
+
+
+class MemoryBudgetExceeded(MemoryError):
+    """Raised when an evaluation would exceed a MemoryTracker budget."""
+
+    def __init__(self, message, *, op, needed_bytes, budget, records):
+        """
+        :param message: description
+        :param op: data_algebra.data_ops.ViewRepresentation that would exceed the budget
+        :param needed_bytes: bytes that would be held with op's result
+        :param budget: the budget
+        :param records: per node records of the evaluation so far
+        """
+        MemoryError.__init__(self, message)
+        self.op = op
+        self.needed_bytes = needed_bytes
+        self.budget = budget
+        self.records = records
+
+
+class MemoryTracker:
+    """Track per node result sizes and peak memory, optionally enforcing a budget."""
+
+    def __init__(self, budget=None, *, trace_allocations=False, on_exceeded="raise"):
+        """
+        :param budget: maximum number of bytes of results to hold at once, None for no limit
+        :param trace_allocations: if True also record tracemalloc peaks per node
+        :param on_exceeded: "raise" to raise MemoryBudgetExceeded, "spill" to re-run out of core
+        """
+        if (budget is not None) and (budget < 1):
+            raise ValueError("budget must be positive")
+        if on_exceeded not in {"raise", "spill"}:
+            raise ValueError("on_exceeded must be 'raise' or 'spill'")
+        self.budget = budget
+        self.trace_allocations = trace_allocations
+        self.on_exceeded = on_exceeded
+        self.records = []
+        self.sizes = dict()  # node key to result size, of the current evaluation
+        self.peak_bytes = 0
+        self.spilled = False  # True if the last evaluation fell back to spilling
+        self.lock = threading.Lock()
+        self._started_tracing = False
+
+    def begin(self):
+        """Start of an evaluation (clears records), called by DataModel.eval_dag()."""
+        with self.lock:
+            self.records = []
+            self.sizes = dict()
+            self.peak_bytes = 0
+        self.spilled = False
+        if self.trace_allocations and (not tracemalloc.is_tracing()):
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def end(self):
+        """End of an evaluation, called by DataModel.eval_dag()."""
+        self.sizes = dict()
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _held_bytes(self, plan):
+        # results the plan is keeping for later consumers
+        with plan.lock:
+            keys = [k for k in plan.results.keys()]
+        with self.lock:
+            return sum([self.sizes.get(k, 0) for k in keys])
+
+    def _exceeded(self, op, needed_bytes, what):
+        records = self.report()
+        msg = (
+            "memory budget of "
+            + str(self.budget)
+            + " bytes exceeded at "
+            + op.node_name
+            + " ("
+            + what
+            + " "
+            + str(needed_bytes)
+            + " bytes held):\n"
+            + op.to_python_implementation(print_sources=False).strip()
+            + "\n"
+            + self.diagnosis()
+        )
+        return MemoryBudgetExceeded(
+            msg, op=op, needed_bytes=needed_bytes, budget=self.budget, records=records
+        )
+
+    def check_estimate(self, op, estimated_bytes, *, plan):
+        """
+        Fail before calculating op if its estimated result would exceed the budget.
+
+        :param op: data_algebra.data_ops.ViewRepresentation about to be calculated
+        :param estimated_bytes: estimated size of op's result
+        :param plan: data_algebra.eval_plan.EvalPlan of the evaluation
+        :return: None
+        """
+        if self.budget is None:
+            return
+        needed = self._held_bytes(plan) + estimated_bytes
+        if needed > self.budget:
+            raise self._exceeded(op, needed, "estimated")
+
+    def wrap(self, compute, plan):
+        """
+        :param compute: function taking a node and returning its result
+        :param plan: data_algebra.eval_plan.EvalPlan of the evaluation
+        :return: function taking a node and returning its result, recording sizes
+        """
+
+        def tracked_compute(node):
+            traced_start = None
+            if self.trace_allocations:
+                reset_traced_peak()
+                traced_start = tracemalloc.get_traced_memory()[0]
+            res = compute(node)
+            traced_peak = None
+            if traced_start is not None:
+                traced_peak = max(0, tracemalloc.get_traced_memory()[1] - traced_start)
+            n_bytes = result_size(res)
+            held = self._held_bytes(plan)
+            with self.lock:
+                self.sizes[plan.key(node)] = n_bytes
+                self.peak_bytes = max(self.peak_bytes, held + n_bytes)
+                self.records.append(
+                    {
+                        "op": node.to_python_implementation(
+                            print_sources=False
+                        ).strip(),
+                        "node_name": node.node_name,
+                        "result_bytes": n_bytes,
+                        "held_bytes": held + n_bytes,
+                        "traced_peak_bytes": traced_peak,
+                    }
+                )
+            if (self.budget is not None) and (held + n_bytes > self.budget):
+                raise self._exceeded(node, held + n_bytes, "calculated")
+            return res
+
+        return tracked_compute
+
+    def report(self):
+        """
+        :return: list of dictionaries, one per calculated node, in order of completion
+        """
+        with self.lock:
+            return [r.copy() for r in self.records]
+
+    def diagnosis(self):
+        """
+        :return: text table of the per node records, largest results marked
+        """
+        records = self.report()
+        if len(records) < 1:
+            return "(no nodes calculated)"
+        largest = max([r["result_bytes"] for r in records])
+        lines = []
+        for r in records:
+            line = (
+                r["node_name"]
+                + ": result "
+                + str(r["result_bytes"])
+                + " bytes, held "
+                + str(r["held_bytes"])
+                + " bytes"
+            )
+            if r["traced_peak_bytes"] is not None:
+                line = line + ", traced peak " + str(r["traced_peak_bytes"]) + " bytes"
+            if r["result_bytes"] == largest:
+                line = line + " <- largest"
+            lines.append(line)
+        return "\n".join(lines)
@@ -0,0 +1,406 @@
+"""
+Rule based rewriting of operator DAGs into equivalent, cheaper, operator DAGs.
+
+Each rule looks at a single node (whose sources are already optimized) and either
+returns None (rule does not apply) or a replacement node.  Rules currently are:
+
+ * remove_identity_renames: drop rename_columns() entries that map a column to itself.
+ * merge_select_rows: combine adjacent select_rows() into one.
+ * push_select_below_rename: filter before renaming.
+ * push_select_below_extend: filter before calculating, when the condition does not
+   use the calculated columns (and the filter can not change the calculation).
+ * push_select_into_join: filter join inputs instead of join results, where that is
+   safe for the join type.
+ * prune_unused_calculations: don't calculate extend()/project() columns that are
+   removed by a following select_columns() or drop_columns().
+
+Nodes shared by more than one consumer are not rewritten from above (that would
+duplicate their work), and TableDescriptions are kept as the same objects.
+"""
+
+import data_algebra.expr_rep
+import data_algebra.expr_compile
+import data_algebra.data_ops
+
+
+# row by row operators, safe to move row filters across
+_row_wise_ops = {
+    "+",
+    "-",
+    "*",
+    "/",
+    "//",
+    "%",
+    "pow",
+    "**",
+    "==",
+    "!=",
+    "<",
+    "<=",
+    ">",
+    ">=",
+    "and",
+    "or",
+    "xor",
+    "is_bad",
+    "is_null",
+    "if_else",
+    "neg",
+}
+
+
+def _is_row_wise(term):
+    """True if term only combines values from the same row."""
+    if isinstance(
+        term, (data_algebra.expr_rep.Value, data_algebra.expr_rep.ColumnReference)
+    ):
+        return True
+    if isinstance(term, data_algebra.expr_rep.ListTerm):
+        return all([_is_row_wise(ti) for ti in term.value])
+    if isinstance(term, data_algebra.expr_rep.Expression):
+        if term.op in data_algebra.expr_rep.fn_names_that_imply_windowed_situation:
+            return False
+        if (term.op not in _row_wise_ops) and (
+            not data_algebra.expr_compile.is_numpy_ufunc_name(term.op)
+        ):
+            return False
+        return all([_is_row_wise(ai) for ai in term.args])
+    return False
+
+
+def _conjuncts(term):
+    """Split a term into a list of terms that are and-ed together."""
+    if (
+        isinstance(term, data_algebra.expr_rep.Expression)
+        and term.inline
+        and (term.op == "and")
+    ):
+        return _conjuncts(term.args[0]) + _conjuncts(term.args[1])
+    return [term]
+
+
+def _and_all(terms):
+    res = terms[0]
+    for ti in terms[1:]:
+        res = data_algebra.expr_rep.Expression(op="and", args=[res, ti], inline=True)
+    return res
+
+
+def _columns_in(term):
+    cols = set()
+    term.get_column_names(cols)
+    return cols
+
+
+def _rename_term(term, mapping):
+    """Copy of term with column references renamed by mapping (old name to new)."""
+    if isinstance(term, data_algebra.expr_rep.ColumnReference):
+        return data_algebra.expr_rep.ColumnReference(
+            view=None, column_name=mapping.get(term.column_name, term.column_name)
+        )
+    if isinstance(term, data_algebra.expr_rep.Value):
+        return term
+    if isinstance(term, data_algebra.expr_rep.ListTerm):
+        return data_algebra.expr_rep.ListTerm(
+            [_rename_term(ti, mapping) for ti in term.value]
+        )
+    if isinstance(term, data_algebra.expr_rep.Expression):
+        return data_algebra.expr_rep.Expression(
+            op=term.op,
+            args=[_rename_term(ai, mapping) for ai in term.args],
+            params=term.params,
+            inline=term.inline,
+            method=term.method,
+        )
+    if isinstance(term, data_algebra.expr_rep.FnTerm):
+        fn_arg = None
+        if len(term.args) > 0:
+            fn_arg = _rename_term(term.args[0], mapping)
+        return data_algebra.expr_rep.FnTerm(
+            term.value, fn_arg=fn_arg, display_form=term.display_form, op=term.op
+        )
+    raise TypeError("unexpected term type: " + str(type(term)))
+
+
+def _select(source, terms):
+    if len(terms) < 1:
+        return source
+    return data_algebra.data_ops.SelectRowsNode(
+        source=source, ops={"expr": _and_all(terms)}
+    )
+
+
+# rules: return None if rule does not apply, else a replacement node
+
+
+# noinspection PyUnusedLocal
+def remove_identity_renames(op, *, is_shared):
+    if not isinstance(op, data_algebra.data_ops.RenameColumnsNode):
+        return None
+    identities = [k for (k, v) in op.column_remapping.items() if k == v]
+    if len(identities) < 1:
+        return None
+    remaining = {k: v for (k, v) in op.column_remapping.items() if k != v}
+    if len(remaining) < 1:
+        return op.sources[0]
+    return data_algebra.data_ops.RenameColumnsNode(
+        source=op.sources[0], column_remapping=remaining
+    )
+
+
+def merge_select_rows(op, *, is_shared):
+    if not isinstance(op, data_algebra.data_ops.SelectRowsNode):
+        return None
+    inner = op.sources[0]
+    if (not isinstance(inner, data_algebra.data_ops.SelectRowsNode)) or is_shared(
+        inner
+    ):
+        return None
+    return _select(inner.sources[0], _conjuncts(inner.expr) + _conjuncts(op.expr))
+
+
+def push_select_below_rename(op, *, is_shared):
+    if not isinstance(op, data_algebra.data_ops.SelectRowsNode):
+        return None
+    rename = op.sources[0]
+    if (not isinstance(rename, data_algebra.data_ops.RenameColumnsNode)) or is_shared(
+        rename
+    ):
+        return None
+    # column_remapping maps new names to old names
+    new_expr = _rename_term(op.expr, rename.column_remapping)
+    return rename.replace_sources([_select(rename.sources[0], [new_expr])])
+
+
+def push_select_below_extend(op, *, is_shared):
+    if not isinstance(op, data_algebra.data_ops.SelectRowsNode):
+        return None
+    extend = op.sources[0]
+    if (not isinstance(extend, data_algebra.data_ops.ExtendNode)) or is_shared(
+        extend
+    ):
+        return None
+    produced = set(extend.cols_produced_in_calc)
+    if extend.windowed_situation:
+        # removing whole partitions does not change the other partitions
+        if len(extend.partition_by) < 1:
+            return None
+        if any([opk.op == "ngroup" for opk in extend.ops.values()]):
+            return None
+        allowed = set(extend.partition_by)
+    else:
+        if not all([_is_row_wise(opk) for opk in extend.ops.values()]):
+            return None
+        allowed = extend.sources[0].column_set
+    below = []
+    above = []
+    for ti in _conjuncts(op.expr):
+        cols = _columns_in(ti)
+        if (len(cols.intersection(produced)) < 1) and cols.issubset(allowed):
+            below.append(ti)
+        else:
+            above.append(ti)
+    if len(below) < 1:
+        return None
+    new_extend = extend.replace_sources([_select(extend.sources[0], below)])
+    return _select(new_extend, above)
+
+
+def push_select_into_join(op, *, is_shared):
+    if not isinstance(op, data_algebra.data_ops.SelectRowsNode):
+        return None
+    join = op.sources[0]
+    if (not isinstance(join, data_algebra.data_ops.NaturalJoinNode)) or is_shared(
+        join
+    ):
+        return None
+    a = join.sources[0]
+    b = join.sources[1]
+    by = set(join.by)
+    # values of shared non-key columns come from both sides, so only exclusive
+    # columns and keys say which side a row came from
+    a_cols = (a.column_set - b.column_set).union(by)
+    b_cols = (b.column_set - a.column_set).union(by)
+    if join.jointype == "INNER":
+        sides = [a_cols, b_cols]
+    elif join.jointype == "LEFT":
+        sides = [a_cols, set()]
+    elif join.jointype == "RIGHT":
+        sides = [set(), b_cols]
+    else:
+        return None
+    pushed = [[], []]
+    above = []
+    for ti in _conjuncts(op.expr):
+        cols = _columns_in(ti)
+        if (len(cols) > 0) and cols.issubset(sides[0]):
+            pushed[0].append(ti)
+        elif (len(cols) > 0) and cols.issubset(sides[1]):
+            pushed[1].append(ti)
+        else:
+            above.append(ti)
+    if (len(pushed[0]) + len(pushed[1])) < 1:
+        return None
+    new_join = join.replace_sources([_select(a, pushed[0]), _select(b, pushed[1])])
+    return _select(new_join, above)
+
+
+def prune_unused_calculations(op, *, is_shared):
+    if isinstance(op, data_algebra.data_ops.SelectColumnsNode):
+        keep = set(op.column_selection)
+    elif isinstance(op, data_algebra.data_ops.DropColumnsNode):
+        keep = op.sources[0].column_set - set(op.column_deletions)
+    else:
+        return None
+    calc = op.sources[0]
+    if is_shared(calc):
+        return None
+    if isinstance(calc, data_algebra.data_ops.ExtendNode):
+        new_ops = {k: v for (k, v) in calc.ops.items() if k in keep}
+        if len(new_ops) == len(calc.ops):
+            return None
+        if len(new_ops) < 1:
+            new_calc = calc.sources[0]
+        else:
+            partition_by = calc.partition_by
+            if calc.windowed_situation and (len(partition_by) < 1):
+                partition_by = 1  # keep windowed situation
+            new_calc = data_algebra.data_ops.ExtendNode(
+                source=calc.sources[0],
+                parsed_ops=new_ops,
+                partition_by=partition_by,
+                order_by=calc.order_by,
+                reverse=calc.reverse,
+            )
+    elif isinstance(calc, data_algebra.data_ops.ProjectNode):
+        new_ops = {k: v for (k, v) in calc.ops.items() if k in keep}
+        if len(new_ops) == len(calc.ops):
+            return None
+        if (len(new_ops) < 1) and (len(calc.group_by) < 1):
+            return None
+        new_calc = data_algebra.data_ops.ProjectNode(
+            source=calc.sources[0], parsed_ops=new_ops, group_by=calc.group_by
+        )
+    else:
+        return None
+    if isinstance(op, data_algebra.data_ops.SelectColumnsNode):
+        return data_algebra.data_ops.SelectColumnsNode(
+            source=new_calc, columns=op.column_selection
+        )
+    deletions = [c for c in op.column_deletions if c in new_calc.column_set]
+    if len(deletions) < 1:
+        return new_calc
+    return data_algebra.data_ops.DropColumnsNode(
+        source=new_calc, column_deletions=deletions
+    )
+
+
+default_rules = [
+    remove_identity_renames,
+    merge_select_rows,
+    push_select_below_rename,
+    push_select_below_extend,
+    push_select_into_join,
+    prune_unused_calculations,
+]
+
+
+def _consumer_counts(ops):
+    counts = dict()
+    seen = set()
+    stack = [ops]
+    while len(stack) > 0:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        for s in node.sources:
+            counts[id(s)] = counts.get(id(s), 0) + 1
+            stack.append(s)
+    return counts
+
+
+def optimize(ops, *, rules=None, rules_applied=None):
+    """
+    Return an equivalent operator DAG, rewritten by the optimization rules.
+
+    :param ops: data_algebra.data_ops.ViewRepresentation
+    :param rules: list of rules, None means default_rules
+    :param rules_applied: if not None, a list to append names of rules applied to
+    :return: data_algebra.data_ops.ViewRepresentation
+    """
+    if not isinstance(ops, data_algebra.data_ops.ViewRepresentation):
+        raise TypeError("expected ops to be a data_algebra.data_ops.ViewRepresentation")
+    if rules is None:
+        rules = default_rules
+    counts = _consumer_counts(ops)
+
+    def is_shared(node):
+        return counts.get(id(node), 0) > 1
+
+    memo = dict()  # id of original node to (original node, rewritten node)
+    replacements = dict()  # id of node to the replacement a rule gave, to be rewritten
+
+    def done(node, res):
+        memo[id(node)] = (node, res)
+        if is_shared(node):
+            counts[id(res)] = counts[id(node)]  # replacement is just as shared
+
+    # post-order walk without recursion, so long pipelines do not exhaust the stack
+    stack = [ops]
+    while len(stack) > 0:
+        node = stack[-1]
+        key = id(node)
+        if key in memo.keys():
+            stack.pop()
+            continue
+        if key in replacements.keys():
+            # node's result is that of its replacement, once rewritten
+            replacement = replacements[key]
+            if id(replacement) in memo.keys():
+                stack.pop()
+                done(node, memo[id(replacement)][1])
+            else:
+                stack.append(replacement)
+            continue
+        pending = [s for s in node.sources if id(s) not in memo.keys()]
+        if len(pending) > 0:
+            stack.extend(reversed(pending))
+            continue
+        new_sources = [memo[id(s)][1] for s in node.sources]
+        res = node
+        if any([ns is not s for (ns, s) in zip(new_sources, node.sources)]):
+            res = node.replace_sources(new_sources)
+        for rule in rules:
+            replacement = rule(res, is_shared=is_shared)
+            if replacement is not None:
+                if rules_applied is not None:
+                    rules_applied.append(rule.__name__)
+                replacements[key] = replacement
+                break
+        if key in replacements.keys():
+            continue
+        stack.pop()
+        done(node, res)
+    return memo[id(ops)][1]
+
+
+def explain(ops, *, rules=None):
+    """
+    Describe the plan before and after optimization.
+
+    :param ops: data_algebra.data_ops.ViewRepresentation
+    :param rules: list of rules, None means default_rules
+    :return: string
+    """
+    rules_applied = []
+    optimized = optimize(ops, rules=rules, rules_applied=rules_applied)
+    return (
+        "# original plan\n"
+        + ops.to_python(pretty=True)
+        + "\n# optimized plan\n"
+        + optimized.to_python(pretty=True)
+        + "\n# rules applied: "
+        + (", ".join(rules_applied) if len(rules_applied) > 0 else "none")
+        + "\n"
+    )
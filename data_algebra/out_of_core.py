@@ -0,0 +1,434 @@
+"""
+Out of core evaluation: operator DAGs over chunked inputs larger than memory.
+
+Extends data_algebra.streaming with operators that need more than one chunk
+at a time, working within a memory budget by spilling to local disk:
+
+ * project() with group_by, windowed extend() with partition_by, natural_join(), and
+   convert_records() with blocks_in record keys: grace hash partitioning.  Input
+   rows are hash partitioned on the grouping (or join) columns into spill files, and
+   each partition is evaluated in memory by the data model.  Partitions still over
+   budget are re-partitioned with a different hash.
+ * order_rows(): external merge sort.  Sorted runs of at most the budget are spilled,
+   and then merged a block of each run at a time.
+ * project() without group_by, windows without partition_by, and joins without by
+   columns need all rows at once, and are evaluated in memory if they fit the budget.
+
+Each partition or run is evaluated by the regular data model steps, so results
+match in memory eval() (up to row order).
+"""
+
+import itertools
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy
+
+import data_algebra
+import data_algebra.data_ops
+import data_algebra.pandas_model
+import data_algebra.streaming
+
+
+class _SpillStore:
+    """Data frames written to, and read back from, files in a temporary directory."""
+
+    def __init__(self, spill_dir=None):
+        self.dir = tempfile.mkdtemp(prefix="data_algebra_spill_", dir=spill_dir)
+        self.n_files = 0
+        self.n_bytes = 0
+
+    def write(self, df):
+        path = os.path.join(self.dir, str(self.n_files) + ".pkl")
+        self.n_files = self.n_files + 1
+        with open(path, "wb") as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        size = os.path.getsize(path)
+        self.n_bytes = self.n_bytes + size
+        return path, size
+
+    # noinspection PyMethodMayBeStatic
+    def read(self, path, *, remove=True):
+        with open(path, "rb") as f:
+            df = pickle.load(f)
+        if remove:
+            os.remove(path)
+        return df
+
+    def close(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+def _frame_bytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class _OutOfCoreStreamBuilder(data_algebra.streaming._StreamBuilder):
+    def __init__(
+        self,
+        ops,
+        data_map,
+        *,
+        eval_env,
+        data_model,
+        narrow,
+        store,
+        memory_budget,
+        n_partitions,
+        block_rows,
+        max_depth,
+    ):
+        data_algebra.streaming._StreamBuilder.__init__(
+            self,
+            ops,
+            data_map,
+            eval_env=eval_env,
+            data_model=data_model,
+            narrow=narrow,
+        )
+        self.store = store
+        self.memory_budget = memory_budget
+        self.n_partitions = n_partitions
+        self.block_rows = block_rows
+        self.max_depth = max_depth
+
+    # helpers
+
+    def _empty_like(self, op, i, empties):
+        if empties[i] is not None:
+            return empties[i]
+        return self.data_model.data_frame({c: [] for c in op.sources[i].column_names})
+
+    def _partition_ids(self, df, columns, depth):
+        types = self.data_model.pd.api.types
+        keys = dict()
+        for c in columns:
+            keys[c] = df[c]
+            if types.is_numeric_dtype(keys[c]) and not types.is_bool_dtype(keys[c]):
+                # equal numbers of different types must hash the same (they join)
+                keys[c] = keys[c].astype(float)
+        hash_key = "data_algebra" + str(depth).zfill(4)
+        h = self.data_model.pd.util.hash_pandas_object(
+            self.data_model.pd.DataFrame(keys), index=False, hash_key=hash_key
+        )
+        return h.values % numpy.uint64(self.n_partitions)
+
+    # grace hash partitioning
+
+    def _partitioned(self, op, gens, key_columns, depth=0):
+        """
+        Hash partition all sources on key_columns (one list per source), evaluate op
+        on each partition in memory.
+        """
+        n_sources = len(gens)
+        files = [[[] for _ in range(self.n_partitions)] for _ in range(n_sources)]
+        sizes = [0] * self.n_partitions
+        empties = [None] * n_sources
+        # consume sources in step, so tee()ed inputs are not buffered
+        for chunks in itertools.zip_longest(*gens):
+            for i in range(n_sources):
+                chunk = chunks[i]
+                if chunk is None:
+                    continue
+                empties[i] = chunk.iloc[0:0, :]
+                if chunk.shape[0] < 1:
+                    continue
+                pids = self._partition_ids(chunk, key_columns[i], depth)
+                for p in numpy.unique(pids):
+                    piece = chunk.loc[pids == p, :].reset_index(drop=True)
+                    path, size = self.store.write(piece)
+                    files[i][p].append(path)
+                    sizes[p] = sizes[p] + size
+        for p in range(self.n_partitions):
+            if all([len(files[i][p]) < 1 for i in range(n_sources)]):
+                continue
+            if (sizes[p] > self.memory_budget) and (depth < self.max_depth):
+                part_gens = [
+                    (self.store.read(path) for path in files[i][p])
+                    for i in range(n_sources)
+                ]
+                for res in self._partitioned(op, part_gens, key_columns, depth + 1):
+                    yield res
+                continue
+            frames = []
+            for i in range(n_sources):
+                pieces = [self.store.read(path) for path in files[i][p]]
+                if len(pieces) < 1:
+                    frames.append(self._empty_like(op, i, empties))
+                elif len(pieces) == 1:
+                    frames.append(pieces[0])
+                else:
+                    frames.append(
+                        self.data_model.pd.concat(pieces, axis=0, ignore_index=True)
+                    )
+            yield self._eval_chunks(op, frames)
+
+    def _materialized(self, op, gens):
+        """Evaluate op on all rows at once, if they fit in the memory budget."""
+        n_sources = len(gens)
+        pieces = [[] for _ in range(n_sources)]
+        empties = [None] * n_sources
+        total = 0
+        for chunks in itertools.zip_longest(*gens):
+            for i in range(n_sources):
+                if chunks[i] is None:
+                    continue
+                empties[i] = chunks[i].iloc[0:0, :]
+                pieces[i].append(chunks[i])
+                total = total + _frame_bytes(chunks[i])
+                if total > self.memory_budget:
+                    raise ValueError(
+                        op.node_name
+                        + " without grouping columns needs all rows at once, "
+                        + "and they do not fit in memory_budget"
+                    )
+        frames = []
+        for i in range(n_sources):
+            if len(pieces[i]) < 1:
+                frames.append(self._empty_like(op, i, empties))
+            else:
+                frames.append(
+                    self.data_model.pd.concat(pieces[i], axis=0, ignore_index=True)
+                )
+        yield self._eval_chunks(op, frames)
+
+    # external merge sort
+
+    def _order_rows(self, op, source):
+        columns = op.order_columns
+        ascending = [False if ci in set(op.reverse) else True for ci in columns]
+        runs = []  # lists of block file paths, each run sorted
+        pending = []
+        pending_bytes = 0
+        empty = None
+
+        def spill_run(frames):
+            run = self._eval_chunks(
+                op, [self.data_model.pd.concat(frames, axis=0, ignore_index=True)]
+            )
+            paths = []
+            for start in range(0, run.shape[0], self.block_rows):
+                block = run.iloc[start : (start + self.block_rows), :]
+                paths.append(self.store.write(block.reset_index(drop=True))[0])
+            runs.append(paths)
+
+        for chunk in source:
+            empty = chunk.iloc[0:0, :]
+            pending.append(chunk)
+            pending_bytes = pending_bytes + _frame_bytes(chunk)
+            if pending_bytes > self.memory_budget // 2:
+                spill_run(pending)
+                pending = []
+                pending_bytes = 0
+        if len(runs) < 1:
+            # fits in memory
+            if len(pending) < 1:
+                pending = [self._empty_like(op, 0, [empty])]
+            yield self._eval_chunks(
+                op, [self.data_model.pd.concat(pending, axis=0, ignore_index=True)]
+            )
+            return
+        if len(pending) > 0:
+            spill_run(pending)
+        merged = self._merge_runs(runs, columns, ascending)
+        if op.limit is not None:
+            merged = self._limited(merged, op.limit)
+        for block in merged:
+            for start in range(0, block.shape[0], self.block_rows):
+                yield block.iloc[start : (start + self.block_rows), :].reset_index(
+                    drop=True
+                )
+
+    def _merge_runs(self, runs, columns, ascending):
+        """
+        Merge sorted runs a block of each at a time.  The blocks are sorted together,
+        and the rows up to the first run's last row (in that order) are emitted: any
+        row not yet read sorts after those.  Ties keep run order, then row order.
+
+        :param runs: list of lists of block file paths, each run sorted
+        :param columns: sort columns
+        :param ascending: list of logicals, one per sort column
+        :return: iterator of sorted data frames
+        """
+        paths = [iter(run) for run in runs]
+        buffers = [None] * len(runs)  # rows read from each run and not yet emitted
+        while True:
+            for i in range(len(runs)):
+                if (paths[i] is not None) and (
+                    (buffers[i] is None) or (buffers[i].shape[0] < 1)
+                ):
+                    path = next(paths[i], None)
+                    if path is None:
+                        paths[i] = None
+                        buffers[i] = None
+                    else:
+                        buffers[i] = self.store.read(path)
+            live = [i for i in range(len(runs)) if buffers[i] is not None]
+            if len(live) < 1:
+                return
+            if len(live) == 1:
+                i = live[0]
+                yield buffers[i]
+                for path in paths[i]:
+                    yield self.store.read(path)
+                return
+            blocks = [buffers[i] for i in live]
+            combined = self.data_model.pd.concat(blocks, axis=0, ignore_index=True)
+            order = combined.sort_values(
+                by=columns, ascending=ascending, kind="mergesort", na_position="last"
+            ).index.values
+            sorted_position = numpy.empty(len(order), dtype=numpy.int64)
+            sorted_position[order] = numpy.arange(len(order))
+            sizes = numpy.array([b.shape[0] for b in blocks], dtype=numpy.int64)
+            ends = numpy.cumsum(sizes)
+            cut = numpy.min(sorted_position[ends - 1]) + 1
+            yield combined.iloc[order[:cut], :].reset_index(drop=True)
+            # the emitted rows of each block are a prefix of it
+            for (j, i) in enumerate(live):
+                emitted = sorted_position[(ends[j] - sizes[j]) : ends[j]] < cut
+                buffers[i] = buffers[i].iloc[int(numpy.sum(emitted)) :, :]
+
+    # noinspection PyMethodMayBeStatic
+    def _limited(self, blocks, limit):
+        n_out = 0
+        for block in blocks:
+            if n_out >= limit:
+                return
+            block = block.iloc[0 : (limit - n_out), :]
+            n_out = n_out + block.shape[0]
+            yield block
+
+    # dispatch
+
+    def _use_partial_aggregates(self, op):
+        # grouped partial aggregates can outgrow memory, partition those instead
+        return (len(op.group_by) < 1) and (
+            data_algebra.streaming._StreamBuilder._use_partial_aggregates(self, op)
+        )
+
+    def _build_blocking(self, op, gens):
+        if op.node_name == "OrderRowsNode":
+            return self._order_rows(op, gens[0]), False
+        if (op.node_name == "ProjectNode") and (len(op.group_by) > 0):
+            return self._partitioned(op, gens, [op.group_by]), False
+        if (op.node_name == "ExtendNode") and (len(op.partition_by) > 0):
+            return self._partitioned(op, gens, [op.partition_by]), False
+        if (op.node_name == "NaturalJoinNode") and (len(op.by) > 0):
+            return self._partitioned(op, gens, [op.by, op.by]), False
+        if op.node_name == "ConvertRecordsNode":
+            blocks_in = op.record_map.blocks_in
+            if blocks_in is None:
+                return self._row_wise(op, gens[0]), False
+            if len(blocks_in.record_keys) > 0:
+                return self._partitioned(op, gens, [blocks_in.record_keys]), False
+        if op.node_name in {
+            "ProjectNode",
+            "ExtendNode",
+            "NaturalJoinNode",
+            "ConvertRecordsNode",
+        }:
+            return self._materialized(op, gens), True
+        return data_algebra.streaming._StreamBuilder._build_blocking(self, op, gens)
+
+
+class OutOfCoreEvaluator:
+    """Evaluate operator DAGs over chunked inputs, spilling to disk to stay within a memory budget."""
+
+    def __init__(
+        self,
+        *,
+        memory_budget=2 ** 30,
+        spill_dir=None,
+        n_partitions=None,
+        block_rows=100000,
+        max_depth=3,
+        data_model=None,
+    ):
+        """
+        :param memory_budget: approximate number of bytes of data to hold in memory at once
+        :param spill_dir: directory to create temporary spill directories in, None for system default
+        :param n_partitions: hash partitions per level, default from the budget
+        :param block_rows: rows per block read back from sorted runs, and per sorted result chunk
+        :param max_depth: maximum number of times to re-partition an over budget partition
+        :param data_model: adaptor to data dialect (Pandas for now)
+        """
+        if memory_budget < 1:
+            raise ValueError("memory_budget must be positive")
+        if n_partitions is None:
+            n_partitions = 16
+        if n_partitions < 2:
+            raise ValueError("n_partitions must be at least 2")
+        if block_rows < 1:
+            raise ValueError("block_rows must be positive")
+        if data_model is None:
+            data_model = data_algebra.pandas_model.PandasModel()
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.n_partitions = n_partitions
+        self.block_rows = block_rows
+        self.max_depth = max_depth
+        self.data_model = data_model
+        self.spilled_files = 0  # totals over all evaluations
+        self.spilled_bytes = 0
+
+    def eval_stream(self, ops, data_map, *, eval_env=None, narrow=True):
+        """
+        Evaluate ops, spill files are removed when the result is exhausted or closed.
+
+        :param ops: data_algebra.data_ops.ViewRepresentation
+        :param data_map: map from table names to iterables of data frames (a data frame is one chunk)
+        :param eval_env: environment to evaluate in
+        :param narrow: logical, if True don't copy unexpected columns
+        :return: iterator of result data frames
+        """
+        if not isinstance(data_map, dict):
+            raise TypeError("data_map should be a dictionary")
+        store = _SpillStore(self.spill_dir)
+        try:
+            builder = _OutOfCoreStreamBuilder(
+                ops,
+                data_map,
+                eval_env=eval_env,
+                data_model=self.data_model,
+                narrow=narrow,
+                store=store,
+                memory_budget=self.memory_budget,
+                n_partitions=self.n_partitions,
+                block_rows=self.block_rows,
+                max_depth=self.max_depth,
+            )
+            res = builder.build(ops)
+        except Exception:
+            store.close()
+            raise
+        return self._with_cleanup(res, store)
+
+    def _with_cleanup(self, res, store):
+        try:
+            for chunk in res:
+                yield chunk
+        finally:
+            self.spilled_files = self.spilled_files + store.n_files
+            self.spilled_bytes = self.spilled_bytes + store.n_bytes
+            store.close()
+
+    def eval(self, ops, data_map, *, eval_env=None, narrow=True):
+        """
+        Evaluate ops, and collect the result into one data frame (the result must fit in memory).
+
+        :param ops: data_algebra.data_ops.ViewRepresentation
+        :param data_map: map from table names to iterables of data frames (a data frame is one chunk)
+        :param eval_env: environment to evaluate in
+        :param narrow: logical, if True don't copy unexpected columns
+        :return: data frame
+        """
+        chunks = [
+            c for c in self.eval_stream(ops, data_map, eval_env=eval_env, narrow=narrow)
+        ]
+        if len(chunks) < 1:
+            return self.data_model.data_frame({c: [] for c in ops.column_names})
+        if len(chunks) == 1:
+            return chunks[0]
+        return self.data_model.pd.concat(chunks, axis=0, ignore_index=True)
@@ -1,3 +1,4 @@
+import hashlib
 import types
 import importlib
 import numbers
@@ -10,6 +11,7 @@ import data_algebra.expr_rep
 import data_algebra.data_ops_types
 import data_algebra.connected_components
 import data_algebra.custom_functions
+import data_algebra.expr_compile
 
 
 # TODO: possibly import dask, Nvidia Rapids, or modin instead
@@ -20,6 +22,25 @@ import data_algebra.custom_functions
 # pd = importlib.import_module("modin.pandas")  # https://github.com/modin-project/modin
 
 
+# name of the column of ones zero argument aggregates (other than size, count) apply to
+_ones_column = "_data_table_temp_col"
+
+# window operations whose results do not depend on the row order within a partition
+_order_free_window_ops = {
+    "sum",
+    "mean",
+    "max",
+    "min",
+    "size",
+    "count",
+    "median",
+    "std",
+    "var",
+    "nunique",
+    "ngroup",
+}
+
+
 class PandasModel(data_algebra.data_model.DataModel):
     def __init__(self, *, pd=None, presentation_model_name=None):
         if pd is None:
@@ -50,6 +71,22 @@ class PandasModel(data_algebra.data_model.DataModel):
         # noinspection PyUnresolvedReferences
         return isinstance(df, self.pd.DataFrame)
 
+    def table_version(self, df):
+        try:
+            row_hashes = self.pd.util.hash_pandas_object(df, index=False).values
+        except TypeError as ex:
+            raise ValueError(
+                "can not hash data frame contents, supply table_versions instead: "
+                + str(ex)
+            )
+        return data_algebra.util.stable_fingerprint(
+            [
+                [c for c in df.columns],
+                [str(t) for t in df.dtypes],
+                hashlib.sha256(row_hashes.tobytes()).hexdigest(),
+            ]
+        )
+
     def can_convert_col_to_numeric(self, x):
         if isinstance(x, numbers.Number):
             return True
@@ -110,63 +147,200 @@ class PandasModel(data_algebra.data_model.DataModel):
         )
         if window_situation:
             op.check_extend_window_fns()
-        res = op.sources[0].eval_implementation(
-            data_map=data_map, eval_env=eval_env, data_model=self, narrow=narrow
+        res = self.eval_source(
+            op.sources[0], data_map=data_map, eval_env=eval_env, narrow=narrow
         )
-        standin_name = "_data_algebra_temp_g"  # name of an arbitrary input variable
+        return self._extend_frame(op, res, eval_env=eval_env)
+
+    def _extend_frame(self, op, res, *, eval_env):
+        """
+        Add the columns of an ExtendNode to a data frame.
+
+        :param op: data_algebra.data_ops.ExtendNode
+        :param res: data frame holding the source rows, altered
+        :param eval_env: environment to evaluate in
+        :return: data frame
+        """
+        window_situation = (
+            op.windowed_situation
+            or (len(op.partition_by) > 0)
+            or (len(op.order_by) > 0)
+        )
+        ops = self._ops_used(op)
         if not window_situation:
-            for (k, opk) in op.ops.items():
-                op_src = opk.to_pandas()
-                res[k] = res.eval(
-                    op_src, local_dict=self.pandas_eval_env, global_dict=eval_env
+            for (k, opk) in ops.items():
+                res[k] = self._eval_term(res, opk, eval_env=eval_env)
+        elif len(ops) > 0:
+            res = self._extend_windowed(op, res, ops)
+        return res
+
+    # noinspection PyMethodMayBeStatic
+    def _ops_used(self, op):
+        """
+        Operations of an ExtendNode or ProjectNode producing columns later steps use
+        (columns no later step uses are not calculated).
+
+        :param op: data_algebra.data_ops.ExtendNode or data_algebra.data_ops.ProjectNode
+        :return: dictionary, a subset of op.ops
+        """
+        if (op.columns_currently_used is None) or (
+            len(op.columns_currently_used) < 1
+        ):
+            return op.ops
+        return {k: opk for (k, opk) in op.ops.items() if k in op.columns_currently_used}
+
+    def _narrow_sources(self, op, frames):
+        """
+        Restrict source frames to the columns op uses from them.
+
+        :param op: data_algebra.data_ops.ViewRepresentation
+        :param frames: list of data frames, one per op.sources
+        :return: list of data frames
+        """
+        if (op.columns_currently_used is None) or (
+            len(op.columns_currently_used) < 1
+        ):
+            return frames
+        needed = op.columns_used_from_sources(op.columns_currently_used.copy())
+        res = []
+        for (frame, needed_i) in zip(frames, needed):
+            cols = [c for c in frame.columns if c in needed_i]
+            if len(cols) < frame.shape[1]:
+                frame = frame.loc[:, cols]
+            res.append(frame)
+        return res
+
+    def _eval_term(self, res, term, *, eval_env, query=False):
+        """
+        Evaluate a row-wise expression against a data frame.
+
+        Uses the compiled NumPy form of the expression when we have one, else the
+        pandas eval()/query() string path.
+
+        :param res: data frame to evaluate against
+        :param term: data_algebra.expr_rep.Term
+        :param eval_env: environment for the pandas eval path
+        :param query: if True return a row selection (boolean) vector
+        :return: column of values
+        """
+        v = None
+        fn = data_algebra.expr_compile.compile_term(term)
+        if fn is not None:
+            try:
+                with numpy.errstate(all="ignore"):
+                    v = fn(res, self.pandas_eval_env)
+            except TypeError:
+                # NumPy does not support the operation on these column types, let
+                # the pandas path produce the value or the error
+                v = None
+        if v is None:
+            v = res.eval(
+                term.to_pandas(), local_dict=self.pandas_eval_env, global_dict=eval_env
+            )
+        if query:
+            if numpy.ndim(v) == 0:
+                v = numpy.full(res.shape[0], bool(v))
+            else:
+                v = numpy.asarray(v, dtype=bool)
+        return v
+
+    def _extend_windowed(self, op, res, ops):
+        """
+        Evaluate window operations of an ExtendNode.
+
+        Each op is calculated over the rows sorted by partition_by, order_by, then its
+        value column (honoring reverse, ties kept in input order), as the per op
+        calculation always has.  Ops needing the same sort share one sort and one
+        groupby object, and results move back to the original row order with one
+        inverse permutation.  Ops that do not depend on row order are not sorted.
+        Columns are added in the order of ops.
+
+        :param op: data_algebra.data_ops.ExtendNode
+        :param res: data frame to extend
+        :param ops: dictionary of the operations to calculate, a subset of op.ops
+        :return: extended data frame
+        """
+        standin_name = "_data_algebra_temp_g"  # name of an arbitrary input variable
+        n_row = res.shape[0]
+        reverse = set(op.reverse)
+        # ops are calculated over rows sorted by partition, order, then their value
+        # column (ties kept in input order); ops sharing sort columns share a sort
+        by_sort = dict()
+        values = dict()
+        for (k, opk) in ops.items():
+            sort_cols = [c for c in op.partition_by]
+            for c in op.order_by:
+                if c not in sort_cols:
+                    sort_cols.append(c)
+            if len(opk.args) > 0:
+                # assumes all args are column names, enforced earlier
+                value_name = opk.args[0].to_pandas()
+                if value_name not in sort_cols:
+                    sort_cols.append(value_name)
+            if opk.op in _order_free_window_ops:
+                sort_cols = None
+            key = None if sort_cols is None else tuple(sort_cols)
+            by_sort.setdefault(key, []).append(k)
+        for (key, names) in by_sort.items():
+            col_list = [c for c in op.partition_by]
+            for k in names:
+                if len(ops[k].args) > 0:
+                    value_name = ops[k].args[0].to_pandas()
+                    if value_name not in col_list:
+                        col_list.append(value_name)
+            if key is not None:
+                col_list = col_list + [c for c in key if c not in set(col_list)]
+            subframe = res[col_list].reset_index(drop=True)
+            inverse = None
+            if (key is not None) and (n_row > 1):
+                sort_cols = [c for c in key]
+                perm = (
+                    subframe[sort_cols]
+                    .sort_values(
+                        by=sort_cols,
+                        ascending=[c not in reverse for c in sort_cols],
+                        kind="mergesort",
+                    )
+                    .index.values
                 )
-        else:
-            for (k, opk) in op.ops.items():
-                # work on a slice of the data frame
-                col_list = [c for c in set(op.partition_by)]
-                for c in op.order_by:
-                    if c not in col_list:
-                        col_list = col_list + [c]
-                value_name = None
-                # assumes all args are column names, enforce this earlier
-                if len(opk.args) > 0:
-                    value_name = opk.args[0].to_pandas()
-                    if value_name not in set(col_list):
-                        col_list = col_list + [value_name]
-                ascending = [c not in set(op.reverse) for c in col_list]
-                subframe = res[col_list].reset_index(drop=True)
-                subframe["_data_algebra_orig_index"] = subframe.index
-                subframe = subframe.sort_values(
-                    by=col_list, ascending=ascending
-                ).reset_index(drop=True)
-                subframe[standin_name] = 1
-                if len(op.partition_by) > 0:
-                    opframe = subframe.groupby(op.partition_by)
-                    #  Groupby preserves the order of rows within each group.
-                    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.DataFrame.groupby.html
-                else:
-                    opframe = subframe.groupby([standin_name])
-                # TODO: document exactly which of these are available
+                subframe = subframe.take(perm).reset_index(drop=True)
+                inverse = numpy.empty(n_row, dtype=numpy.int64)
+                inverse[perm] = numpy.arange(n_row, dtype=numpy.int64)
+            subframe[standin_name] = 1
+            if len(op.partition_by) > 0:
+                opframe = subframe.groupby(op.partition_by)
+                #  Groupby preserves the order of rows within each group.
+                # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.DataFrame.groupby.html
+            else:
+                opframe = subframe.groupby([standin_name])
+            # TODO: document exactly which of these are available
+            for k in names:
+                opk = ops[k]
                 if len(opk.args) == 0:
                     if opk.op == "row_number":
-                        subframe[k] = opframe.cumcount() + 1
+                        vk = opframe.cumcount() + 1
                     elif opk.op == "ngroup":
-                        subframe[k] = opframe.ngroup()
+                        vk = opframe.ngroup()
                     elif opk.op == "size":
-                        subframe[k] = opframe[standin_name].transform(
+                        vk = opframe[standin_name].transform(
                             opk.op
                         )  # Pandas transform, not data_algegra
                     else:
                         raise KeyError("not implemented: " + str(k) + ": " + str(opk))
                 else:
                     # len(opk.args) == 1
-                    subframe[k] = opframe[value_name].transform(
+                    value_name = opk.args[0].to_pandas()
+                    vk = opframe[value_name].transform(
                         opk.op
                     )  # Pandas transform, not data_algegra
-                subframe = subframe.reset_index(drop=True)
-                subframe = subframe.sort_values(by=["_data_algebra_orig_index"])
-                subframe = subframe.reset_index(drop=True)
-                res[k] = subframe[k]
+                if len(vk) != n_row:
+                    # rows with null partition keys may have been dropped by groupby
+                    vk = vk.reindex(subframe.index)
+                if inverse is not None:
+                    vk = vk.take(inverse)
+                values[k] = vk.values
+        for k in ops.keys():
+            res[k] = values[k]
         return res
 
     def columns_to_frame(self, cols):
@@ -199,44 +373,84 @@ class PandasModel(data_algebra.data_model.DataModel):
                         + ": "
                         + str(opk)
                     )
-        res = op.sources[0].eval_implementation(
-            data_map=data_map, eval_env=eval_env, data_model=self, narrow=narrow
+        res = self.eval_source(
+            op.sources[0], data_map=data_map, eval_env=eval_env, narrow=narrow
         )
-        res["_data_table_temp_col"] = 1
-        if len(op.group_by) > 0:
-            res = res.groupby(op.group_by)
-        if len(op.ops) > 0:
-            cols = {}
-            for k, opk in op.ops.items():
-                if isinstance(opk, data_algebra.expr_rep.FnTerm):
-                    fn = opk.value
-                    vk = res[str(opk.args[0])].agg(fn)
-                else:
-                    if len(opk.args) > 0:
-                        vk = res[str(opk.args[0])].agg(opk.op)
-                    else:
-                        vk = res["_data_table_temp_col"].agg(opk.op)
-                cols[k] = vk
+        return self._project_frame(op, res)
+
+    def _project_frame(self, op, res):
+        """
+        Aggregate a data frame as specified by a ProjectNode.
+
+        :param op: data_algebra.data_ops.ProjectNode
+        :param res: data frame holding the source rows
+        :return: data frame
+        """
+        if len(op.group_by) < 1:
+            return self._project_ungrouped(op, res)
+        ops = self._ops_used(op)
+        # one pass: all aggregations off of a single groupby().agg() call
+        named_aggs = {}
+        size_cols = []
+        for k, opk in ops.items():
+            if isinstance(opk, data_algebra.expr_rep.FnTerm):
+                named_aggs[k] = (str(opk.args[0]), opk.value)
+            elif len(opk.args) > 0:
+                named_aggs[k] = (str(opk.args[0]), opk.op)
+            elif opk.op in {"size", "count"}:
+                size_cols.append(k)
+            else:
+                # other zero argument aggregates apply to a column of ones
+                named_aggs[k] = (_ones_column, opk.op)
+        if _ones_column in [v[0] for v in named_aggs.values()]:
+            res = res.assign(**{_ones_column: 1})
+        grouped = res.groupby(op.group_by, observed=True)
+        if len(named_aggs) > 0:
+            res = grouped.agg(**named_aggs)
+            if len(size_cols) > 0:
+                sizes = grouped.size()
+                for k in size_cols:
+                    res[k] = sizes
         else:
-            cols = {"_data_table_temp_col": res["_data_table_temp_col"].agg("sum")}
+            sizes = grouped.size()
+            res = self.columns_to_frame({k: sizes for k in size_cols})
+            res.index = sizes.index
+        # grouping variables are in the index, and keyed by construction
+        res = res.reset_index(drop=False)
+        return res.loc[:, [c for c in op.group_by] + [k for k in ops.keys()]]
+
+    def _project_ungrouped(self, op, res):
+        """
+        Whole table aggregation, each op returns a single value.
 
-        # agg can return scalars, which then can't be made into a self.pd.DataFrame
-        def promote_scalar(v):
+        :param op: data_algebra.data_ops.ProjectNode
+        :param res: data frame to aggregate
+        :return: single row data frame
+        """
+        n_row = res.shape[0]
+        cols = {}
+        for k, opk in self._ops_used(op).items():
+            if isinstance(opk, data_algebra.expr_rep.FnTerm):
+                vk = res[str(opk.args[0])].agg(opk.value)
+            elif len(opk.args) > 0:
+                vk = res[str(opk.args[0])].agg(opk.op)
+            elif opk.op in {"size", "count"}:
+                vk = n_row
+            else:
+                # other zero argument aggregates apply to a column of ones
+                vk = self.pd.Series(numpy.ones(n_row, dtype=numpy.int64)).agg(opk.op)
+            # agg can return scalars, which then can't be made into a self.pd.DataFrame
             # noinspection PyBroadException
             try:
-                len(v)
+                len(vk)
             except Exception:
-                return [v]
-            return v
-
-        cols = {k: promote_scalar(v) for (k, v) in cols.items()}
-        res = self.columns_to_frame(cols).reset_index(
-            drop=len(op.group_by) < 1
-        )  # grouping variables in the index
-        if "_data_table_temp_col" in res.columns:
-            res = res.drop("_data_table_temp_col", 1)
-        # double check shape is what we expect
-        if not data_algebra.util.table_is_keyed_by_columns(res, op.group_by):
+                vk = [vk]
+            cols[k] = vk
+        if len(cols) < 1:
+            # noinspection PyUnresolvedReferences
+            return self.pd.DataFrame(index=range(1))
+        res = self.columns_to_frame(cols).reset_index(drop=True)
+        if res.shape[0] > 1:
             raise ValueError("result wasn't keyed by group_by columns")
         return res
 
@@ -245,11 +459,11 @@ class PandasModel(data_algebra.data_model.DataModel):
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.SelectRowsNode"
             )
-        res = op.sources[0].eval_implementation(
-            data_map=data_map, eval_env=eval_env, data_model=self, narrow=narrow
+        res = self.eval_source(
+            op.sources[0], data_map=data_map, eval_env=eval_env, narrow=narrow
         )
-        q = op.expr.to_pandas()
-        res = res.query(q).reset_index(drop=True)
+        selection = self._eval_term(res, op.expr, eval_env=eval_env, query=True)
+        res = res.loc[selection, :].reset_index(drop=True)
         return res
 
     def select_columns_step(self, op, *, data_map, eval_env, narrow):
@@ -257,8 +471,8 @@ class PandasModel(data_algebra.data_model.DataModel):
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.SelectColumnsNode"
             )
-        res = op.sources[0].eval_implementation(
-            data_map=data_map, eval_env=eval_env, data_model=self, narrow=narrow
+        res = self.eval_source(
+            op.sources[0], data_map=data_map, eval_env=eval_env, narrow=narrow
         )
         return res[op.column_selection]
 
@@ -267,8 +481,8 @@ class PandasModel(data_algebra.data_model.DataModel):
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.DropColumnsNode"
             )
-        res = op.sources[0].eval_implementation(
-            data_map=data_map, eval_env=eval_env, data_model=self, narrow=narrow
+        res = self.eval_source(
+            op.sources[0], data_map=data_map, eval_env=eval_env, narrow=narrow
         )
         column_selection = [c for c in res.columns if c not in op.column_deletions]
         return res[column_selection]
@@ -278,24 +492,55 @@ class PandasModel(data_algebra.data_model.DataModel):
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.OrderRowsNode"
             )
-        res = op.sources[0].eval_implementation(
-            data_map=data_map, eval_env=eval_env, data_model=self, narrow=narrow
+        res = self.eval_source(
+            op.sources[0], data_map=data_map, eval_env=eval_env, narrow=narrow
         )
         ascending = [
             False if ci in set(op.reverse) else True for ci in op.order_columns
         ]
-        res = res.sort_values(by=op.order_columns, ascending=ascending).reset_index(
-            drop=True
-        )
-        return res
+        if (op.limit is not None) and (op.limit < res.shape[0]):
+            return self._top_k(
+                res, columns=op.order_columns, ascending=ascending, limit=op.limit
+            )
+        if len(op.order_columns) > 0:
+            res = res.sort_values(by=op.order_columns, ascending=ascending)
+        return res.reset_index(drop=True)
+
+    def _top_k(self, res, *, columns, ascending, limit):
+        """
+        First limit rows of res sorted by columns, without sorting all of res.
+
+        If the first sort column is numeric we use numpy.partition() to find the
+        limit-th value, keep only rows at or before it (ties included), and sort
+        just those.  Otherwise we sort everything.
+
+        :param res: data frame
+        :param columns: list of columns to sort by
+        :param ascending: list of booleans, one per column
+        :param limit: number of rows to return
+        :return: data frame of at most limit rows
+        """
+        limit = max(int(limit), 0)
+        if (limit < 1) or (len(columns) < 1):
+            return res.head(limit).reset_index(drop=True)
+        key = res[columns[0]]
+        if self.can_convert_col_to_numeric(key):
+            v = key.to_numpy(dtype=float, na_value=numpy.nan)
+            if not ascending[0]:
+                v = -v
+            v[numpy.isnan(v)] = numpy.inf  # missing values sort last in either direction
+            kth = numpy.partition(v, limit - 1)[limit - 1]
+            res = res.take(numpy.flatnonzero(v <= kth))
+        res = res.sort_values(by=columns, ascending=ascending, kind="mergesort")
+        return res.head(limit).reset_index(drop=True)
 
     def rename_columns_step(self, op, *, data_map, eval_env, narrow):
         if op.node_name != "RenameColumnsNode":
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.RenameColumnsNode"
             )
-        res = op.sources[0].eval_implementation(
-            data_map=data_map, eval_env=eval_env, data_model=self, narrow=narrow
+        res = self.eval_source(
+            op.sources[0], data_map=data_map, eval_env=eval_env, narrow=narrow
         )
         return res.rename(columns=op.reverse_mapping)
 
@@ -311,17 +556,63 @@ class PandasModel(data_algebra.data_model.DataModel):
             pass
         return jointype
 
+    def _estimate_join_bytes(self, left, right, by, jointype):
+        """
+        Estimate the memory a natural join needs (its inputs, and its result as
+        estimated from key counts), without merging.
+
+        :return: estimated number of bytes
+        """
+        how = self.standardize_join_code(jointype)
+        n_col = "_data_algebra_n"
+        if len(by) > 0:
+            left_counts = left.groupby(by, dropna=False).size().reset_index(name=n_col)
+            right_counts = right.groupby(by, dropna=False).size().reset_index(
+                name=n_col
+            )
+            # noinspection PyUnresolvedReferences
+            matched = self.pd.merge(
+                left_counts, right_counts, on=by, how="inner", suffixes=("_l", "_r")
+            )
+            n_left = matched[n_col + "_l"].values.astype(numpy.float64)
+            n_right = matched[n_col + "_r"].values.astype(numpy.float64)
+            n_rows = float(numpy.sum(n_left * n_right))
+            if how in {"left", "outer"}:
+                n_rows = n_rows + left.shape[0] - float(numpy.sum(n_left))
+            if how in {"right", "outer"}:
+                n_rows = n_rows + right.shape[0] - float(numpy.sum(n_right))
+        else:
+            n_rows = float(left.shape[0]) * float(right.shape[0])
+        input_bytes = 0.0
+        row_bytes = 0.0
+        for d in [left, right]:
+            d_bytes = float(d.memory_usage(index=True, deep=True).sum())
+            input_bytes = input_bytes + d_bytes
+            if d.shape[0] > 0:
+                row_bytes = row_bytes + d_bytes / d.shape[0]
+        return int(input_bytes + n_rows * row_bytes)
+
     def natural_join_step(self, op, *, data_map, eval_env, narrow):
         if op.node_name != "NaturalJoinNode":
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.NaturalJoinNode"
             )
-        left = op.sources[0].eval_implementation(
-            data_map=data_map, eval_env=eval_env, data_model=self, narrow=narrow
+        left = self.eval_source(
+            op.sources[0], data_map=data_map, eval_env=eval_env, narrow=narrow
         )
-        right = op.sources[1].eval_implementation(
-            data_map=data_map, eval_env=eval_env, data_model=self, narrow=narrow
+        right = self.eval_source(
+            op.sources[1], data_map=data_map, eval_env=eval_env, narrow=narrow
         )
+        if narrow:
+            left, right = self._narrow_sources(op, [left, right])
+        tracker = self.memory_tracker
+        if (tracker is not None) and (tracker.budget is not None):
+            # fan-out joins can balloon, so check before merging
+            tracker.check_estimate(
+                op,
+                self._estimate_join_bytes(left, right, op.by, op.jointype),
+                plan=self.eval_plan,
+            )
         common_cols = set([c for c in left.columns]).intersection(
             [c for c in right.columns]
         )
@@ -335,12 +626,27 @@ class PandasModel(data_algebra.data_model.DataModel):
             suffixes=("", "_tmp_right_col"),
         )
         res = res.reset_index(drop=True)
-        for c in common_cols:
-            if c not in op.by:
-                is_null = res[c].isnull()
-                res.loc[is_null, c] = res.loc[is_null, c + "_tmp_right_col"]
-                res = res.drop(c + "_tmp_right_col", axis=1)
-        res = res.reset_index(drop=True)
+        # coalesce all shared non-key columns as one block: take left values, and
+        # fill in missing values from the right
+        by_set = set(op.by)
+        coalesce_cols = [
+            c for c in left.columns if (c in common_cols) and (c not in by_set)
+        ]
+        if len(coalesce_cols) > 0:
+            right_cols = [c + "_tmp_right_col" for c in coalesce_cols]
+            left_block = res[coalesce_cols]
+            right_block = res[right_cols].rename(
+                columns={rc: c for (rc, c) in zip(right_cols, coalesce_cols)}
+            )
+            filled = left_block.where(left_block.notnull(), right_block)
+            # re-assemble in one step (column at a time assignment re-copies blocks)
+            right_set = set(right_cols)
+            drop_set = right_set.union(coalesce_cols)
+            result_cols = [c for c in res.columns if c not in right_set]
+            # noinspection PyUnresolvedReferences
+            res = self.pd.concat(
+                [res[[c for c in res.columns if c not in drop_set]], filled], axis=1
+            )[result_cols]
         return res
 
     def concat_rows_step(self, op, *, data_map, eval_env, narrow):
@@ -348,12 +654,14 @@ class PandasModel(data_algebra.data_model.DataModel):
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.ConcatRowsNode"
             )
-        left = op.sources[0].eval_implementation(
-            data_map=data_map, eval_env=eval_env, data_model=self, narrow=narrow
+        left = self.eval_source(
+            op.sources[0], data_map=data_map, eval_env=eval_env, narrow=narrow
         )
-        right = op.sources[1].eval_implementation(
-            data_map=data_map, eval_env=eval_env, data_model=self, narrow=narrow
+        right = self.eval_source(
+            op.sources[1], data_map=data_map, eval_env=eval_env, narrow=narrow
         )
+        if narrow:
+            left, right = self._narrow_sources(op, [left, right])
         if op.id_column is not None:
             left[op.id_column] = op.a_name
             right[op.id_column] = op.b_name
@@ -367,8 +675,8 @@ class PandasModel(data_algebra.data_model.DataModel):
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.ConvertRecordsNode"
             )
-        res = op.sources[0].eval_implementation(
-            data_map=data_map, eval_env=eval_env, data_model=self, narrow=narrow
+        res = self.eval_source(
+            op.sources[0], data_map=data_map, eval_env=eval_env, narrow=narrow
         )
         return op.record_map.transform(res, local_data_model=self)
 
@@ -0,0 +1,166 @@
+"""
+Pandas data model that runs keyed steps on several processes.
+
+Windowed extend() with partition_by, and project() with group_by, only combine
+rows with the same key values.  ParallelPandasModel hash partitions the input of
+such steps on those columns into shards, runs the regular PandasModel logic on
+each shard in a concurrent.futures.ProcessPoolExecutor, and re-assembles the
+results in the row order the serial step would produce.  All other steps (and
+inputs too small to split) run in the calling process.
+"""
+
+import concurrent.futures
+import pickle
+
+import numpy
+
+import data_algebra.data_ops
+import data_algebra.pandas_model
+
+
+_shard_table_name = "_data_algebra_shard"
+
+
+def _run_shard(method_name, op, shard):
+    """
+    Worker: run a PandasModel frame method on one shard.
+
+    :param method_name: "_extend_frame" or "_project_frame"
+    :param op: node to apply
+    :param shard: data frame
+    :return: result
+    """
+    model = data_algebra.pandas_model.PandasModel()
+    if method_name == "_extend_frame":
+        res = model._extend_frame(op, shard, eval_env=None)
+    else:
+        res = model._project_frame(op, shard)
+    return res
+
+
+class ParallelPandasModel(data_algebra.pandas_model.PandasModel):
+    def __init__(
+        self,
+        *,
+        max_workers=None,
+        shard_rows=100000,
+        pd=None,
+        presentation_model_name=None,
+    ):
+        """
+        :param max_workers: number of worker processes, None for the number of processors
+        :param shard_rows: target number of rows per shard, smaller inputs are not split
+        :param pd: pandas module
+        :param presentation_model_name: name of model
+        """
+        if (max_workers is not None) and (max_workers < 1):
+            raise ValueError("max_workers must be positive")
+        if shard_rows < 1:
+            raise ValueError("shard_rows must be positive")
+        data_algebra.pandas_model.PandasModel.__init__(
+            self, pd=pd, presentation_model_name=presentation_model_name
+        )
+        self.max_workers = max_workers
+        self.shard_rows = shard_rows
+        self.executor = None  # created on first use
+        self.n_parallel_steps = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def shutdown(self):
+        """Stop the worker processes (they are re-started if needed)."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def _shard_positions(self, res, columns):
+        """
+        Split row positions of res into shards by hash of columns.
+
+        :return: list of arrays of row positions, each in increasing order
+        """
+        n_shards = res.shape[0] // self.shard_rows
+        if self.max_workers is not None:
+            n_shards = min(n_shards, 4 * self.max_workers)
+        if n_shards < 2:
+            return None
+        h = self.pd.util.hash_pandas_object(res.loc[:, columns], index=False).values
+        ids = h % numpy.uint64(n_shards)
+        order = numpy.argsort(ids, kind="stable")
+        counts = numpy.bincount(ids.astype(numpy.int64), minlength=n_shards)
+        shards = numpy.split(order, numpy.cumsum(counts)[:-1])
+        return [s for s in shards if len(s) > 0]
+
+    def _run_sharded(self, method_name, op, res, *, columns):
+        """
+        Run a frame method on shards of res in worker processes.
+
+        :return: list of (shard positions, shard result), or None if not run
+        """
+        if self.max_workers == 1:
+            return None
+        shards = self._shard_positions(res, columns)
+        if shards is None:
+            return None
+        # ship just this node, not the whole operator DAG above it
+        table = data_algebra.data_ops.TableDescription(
+            _shard_table_name, op.sources[0].column_names
+        )
+        shard_op = op.replace_sources([table])
+        shard_op.columns_currently_used = op.columns_currently_used.copy()
+        # noinspection PyBroadException
+        try:
+            pickle.dumps(shard_op)
+        except Exception:
+            return None  # for instance user functions that are lambdas
+        if self.executor is None:
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.max_workers
+            )
+        futures = [
+            self.executor.submit(
+                _run_shard,
+                method_name,
+                shard_op,
+                res.iloc[positions, :].reset_index(drop=True),
+            )
+            for positions in shards
+        ]
+        self.n_parallel_steps = self.n_parallel_steps + 1
+        return [(shards[i], futures[i].result()) for i in range(len(shards))]
+
+    def _extend_frame(self, op, res, *, eval_env):
+        results = None
+        if (len(op.partition_by) > 0) and (eval_env is None):
+            # (environments are not shipped to workers)
+            results = self._run_sharded(
+                "_extend_frame", op, res, columns=op.partition_by
+            )
+        if results is None:
+            return data_algebra.pandas_model.PandasModel._extend_frame(
+                self, op, res, eval_env=eval_env
+            )
+        positions = numpy.concatenate([r[0] for r in results])
+        combined = self.pd.concat([r[1] for r in results], axis=0, ignore_index=True)
+        # back to the original row order
+        inverse = numpy.empty(len(positions), dtype=numpy.int64)
+        inverse[positions] = numpy.arange(len(positions))
+        return combined.iloc[inverse, :].reset_index(drop=True)
+
+    def _project_frame(self, op, res):
+        results = None
+        if len(op.group_by) > 0:
+            results = self._run_sharded(
+                "_project_frame", op, res, columns=op.group_by
+            )
+        if results is None:
+            return data_algebra.pandas_model.PandasModel._project_frame(self, op, res)
+        # each group is in exactly one shard, sort them as the serial groupby() does
+        combined = self.pd.concat([r[1] for r in results], axis=0, ignore_index=True)
+        return combined.sort_values(by=op.group_by, kind="mergesort").reset_index(
+            drop=True
+        )
@@ -0,0 +1,322 @@
+"""
+Evaluate operator DAGs over streams of data frame chunks, for data larger than memory.
+
+Each table is supplied as an iterable of data frames (chunks).  Row by row
+operations (extend() without windows, select_rows(), select_columns(),
+drop_columns(), rename_columns(), concat_rows()) are applied chunk by chunk.
+project() is evaluated by combining per chunk partial aggregates, which works for
+sum(), count(), size(), min(), max() and mean().  Its result is a single chunk, and
+any operation is allowed on such single chunk results.  convert_records() is
+applied with RecordMap.transform_stream(), so incoming block records must be
+sorted by their record keys (a record may span chunks).  Other operations over
+chunked data raise a ValueError.
+
+Rows of concat_rows() results are interleaved by chunk, not all of a then all of b.
+"""
+
+import itertools
+
+import data_algebra
+import data_algebra.expr_rep
+import data_algebra.data_ops
+import data_algebra.pandas_model
+
+
+_row_wise_nodes = {
+    "SelectRowsNode",
+    "SelectColumnsNode",
+    "DropColumnsNode",
+    "RenameColumnsNode",
+}
+
+# aggregate to chunk partial results, and how to combine the partial results
+_mergeable_aggregates = {
+    "sum": [("sum", "sum")],
+    "min": [("min", "min")],
+    "max": [("max", "max")],
+    "count": [("count", "sum")],
+    "size": [("size", "sum")],
+    "mean": [("sum", "sum"), ("count", "sum")],
+}
+
+
+def _non_mergeable(op):
+    """
+    Find a ProjectNode aggregate that can not be combined from per chunk partial results.
+
+    :param op: data_algebra.data_ops.ProjectNode
+    :return: (column name, expression) of first such aggregate, or None
+    """
+    for (k, opk) in op.ops.items():
+        if (
+            isinstance(opk, data_algebra.expr_rep.FnTerm)
+            or (opk.op not in _mergeable_aggregates.keys())
+            or (len(opk.args) > 1)
+            or (
+                (len(opk.args) == 1)
+                and not isinstance(opk.args[0], data_algebra.expr_rep.ColumnReference)
+            )
+        ):
+            return k, opk
+    return None
+
+
+def _as_chunks(v):
+    if data_algebra.default_data_model.is_appropriate_data_instance(v):
+        return iter([v])
+    return iter(v)
+
+
+def _stand_in_sources(op, prefix="_stream_source_"):
+    """Copy of op reading from new tables named prefix + position, with the source columns."""
+    names = [prefix + str(i) for i in range(len(op.sources))]
+    tables = [
+        data_algebra.data_ops.TableDescription(names[i], op.sources[i].column_names)
+        for i in range(len(op.sources))
+    ]
+    return op.replace_sources(tables), names
+
+
+class _ProjectPartials:
+    """Combine per chunk partial aggregates of a ProjectNode."""
+
+    def __init__(self, op, *, data_model):
+        self.op = op
+        self.data_model = data_model
+        self.key_col = "_stream_group_"
+        while self.key_col in op.sources[0].column_set:
+            self.key_col = self.key_col + "_"
+        self.group_by = [c for c in op.group_by]
+        if len(self.group_by) < 1:
+            self.group_by = [self.key_col]
+        self.partial_aggs = dict()  # partial column name to (source column, aggregate)
+        self.merge_aggs = dict()  # partial column name to merging aggregate
+        self.size_cols = []
+        for (k, opk) in op.ops.items():
+            for (agg, merge) in _mergeable_aggregates[opk.op]:
+                name = k + "_" + agg + "_partial"
+                if (len(opk.args) < 1) or (agg == "size"):
+                    self.size_cols.append(name)
+                else:
+                    self.partial_aggs[name] = (str(opk.args[0]), agg)
+                self.merge_aggs[name] = merge
+        self.acc = None
+
+    def add(self, chunk):
+        if self.group_by[0] == self.key_col:
+            chunk = chunk.assign(**{self.key_col: 0})
+        grouped = chunk.groupby(self.group_by, sort=False, observed=True)
+        if len(self.partial_aggs) > 0:
+            partial = grouped.agg(**self.partial_aggs)
+        else:
+            partial = self.data_model.pd.DataFrame(index=grouped.size().index)
+        if len(self.size_cols) > 0:
+            sizes = grouped.size()
+            for k in self.size_cols:
+                partial[k] = sizes
+        partial = partial.reset_index(drop=False)
+        if self.acc is not None:
+            partial = self.data_model.pd.concat(
+                [self.acc, partial], axis=0, ignore_index=True
+            )
+            partial = (
+                partial.groupby(self.group_by, sort=False, observed=True)
+                .agg(self.merge_aggs)
+                .reset_index(drop=False)
+            )
+        self.acc = partial
+
+    def result(self):
+        acc = self.acc
+        if (acc is None) or (acc.shape[0] < 1):
+            # no rows, let the regular implementation decide the result shape
+            stand_in, names = _stand_in_sources(self.op)
+            empty = self.data_model.data_frame(
+                {c: [] for c in self.op.sources[0].column_names}
+            )
+            return stand_in.eval({names[0]: empty}, data_model=self.data_model)
+        cols = {c: acc[c] for c in self.op.group_by}
+        for (k, opk) in self.op.ops.items():
+            if opk.op == "mean":
+                cols[k] = acc[k + "_sum_partial"] / acc[k + "_count_partial"]
+            else:
+                agg = _mergeable_aggregates[opk.op][0][0]
+                cols[k] = acc[k + "_" + agg + "_partial"]
+        return self.data_model.columns_to_frame(cols).reset_index(drop=True)
+
+
+class _StreamBuilder:
+    """Build chunk generators for each node of an operator DAG."""
+
+    def __init__(self, ops, data_map, *, eval_env, data_model, narrow):
+        self.eval_env = eval_env
+        self.data_model = data_model
+        self.narrow = narrow
+        self.streams = dict()  # id(node) to list of (generator, single) for consumers
+        self.table_streams = dict()  # table name to list of raw chunk iterators
+        consumers = dict()
+        table_uses = dict()
+        seen = set()
+        stack = [ops]
+        while len(stack) > 0:
+            node = stack.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            if node.node_name == "TableDescription":
+                table_uses[node.table_name] = table_uses.get(node.table_name, 0) + 1
+            for s in node.sources:
+                consumers[id(s)] = consumers.get(id(s), 0) + 1
+                stack.append(s)
+        self.consumers = consumers
+        for (k, n) in table_uses.items():
+            if k not in data_map.keys():
+                raise ValueError("Required table " + k + " not in data_map")
+            self.table_streams[k] = list(itertools.tee(_as_chunks(data_map[k]), n))
+
+    def _eval_chunks(self, op, chunks):
+        stand_in, names = _stand_in_sources(op)
+        return stand_in.eval(
+            {names[i]: chunks[i] for i in range(len(names))},
+            eval_env=self.eval_env,
+            data_model=self.data_model,
+            narrow=self.narrow,
+        )
+
+    def _row_wise(self, op, source):
+        for chunk in source:
+            yield self._eval_chunks(op, [chunk])
+
+    def _concat(self, op, a, b):
+        empties = [None, None]
+        for chunks in itertools.zip_longest(a, b):
+            for i in range(2):
+                if chunks[i] is not None:
+                    empties[i] = chunks[i].iloc[0:0, :]
+            pair = [c for c in chunks]
+            for i in range(2):
+                if pair[i] is None:
+                    if empties[i] is None:
+                        empties[i] = self.data_model.data_frame(
+                            {c: [] for c in op.sources[i].column_names}
+                        )
+                    pair[i] = empties[i]
+            yield self._eval_chunks(op, pair)
+
+    def _project(self, op, source):
+        partials = _ProjectPartials(op, data_model=self.data_model)
+        for chunk in source:
+            partials.add(chunk)
+        yield partials.result()
+
+    def _convert_records(self, op, source):
+        return op.record_map.transform_stream(source, local_data_model=self.data_model)
+
+    def _table(self, op):
+        stand_in = data_algebra.data_ops.TableDescription(
+            op.table_name, op.column_names
+        )
+        for chunk in self.table_streams[op.table_name].pop():
+            yield stand_in.eval(
+                {op.table_name: chunk},
+                eval_env=self.eval_env,
+                data_model=self.data_model,
+                narrow=self.narrow,
+            )
+
+    def _build(self, op, sources):
+        """
+        :return: generator of chunks, and True if it yields exactly one chunk
+        """
+        if op.node_name == "TableDescription":
+            return self._table(op), False
+        single = all([s[1] for s in sources])
+        gens = [s[0] for s in sources]
+        if single:
+            # all inputs are already reduced to one chunk each
+            return (self._eval_chunks(op, [next(g) for g in gens]) for _ in [0]), True
+        if (op.node_name in _row_wise_nodes) or (
+            op.node_name == "ExtendNode" and not op.windowed_situation
+        ):
+            return self._row_wise(op, gens[0]), False
+        if op.node_name == "ConcatRowsNode":
+            if any([s[1] for s in sources]):
+                raise ValueError(
+                    "concat_rows() can not combine a chunked stream "
+                    + "with an aggregated result"
+                )
+            return self._concat(op, gens[0], gens[1]), False
+        if (op.node_name == "ProjectNode") and self._use_partial_aggregates(op):
+            return self._project(op, gens[0]), True
+        return self._build_blocking(op, gens)
+
+    # noinspection PyMethodMayBeStatic
+    def _use_partial_aggregates(self, op):
+        return _non_mergeable(op) is None
+
+    def _build_blocking(self, op, gens):
+        """
+        Build the stream for a node that needs more than one chunk at a time.
+
+        :return: generator of chunks, and True if it yields exactly one chunk
+        """
+        if op.node_name == "ConvertRecordsNode":
+            return self._convert_records(op, gens[0]), False
+        if op.node_name == "ProjectNode":
+            k, opk = _non_mergeable(op)
+            raise ValueError(
+                "project() over a stream only supports "
+                + str(sorted(_mergeable_aggregates.keys()))
+                + " of columns, not "
+                + k
+                + ": "
+                + str(opk)
+            )
+        raise ValueError(
+            op.node_name
+            + " can not be evaluated over a stream of chunks (needs all rows at once), "
+            + "aggregate with project() first or use eval()"
+        )
+
+    def build(self, ops):
+        """
+        :return: generator of result chunks
+        """
+        # post-order walk without recursion, so long pipelines do not exhaust the stack
+        stack = [ops]
+        while len(stack) > 0:
+            node = stack[-1]
+            if id(node) in self.streams.keys():
+                stack.pop()
+                continue
+            pending = [s for s in node.sources if id(s) not in self.streams.keys()]
+            if len(pending) > 0:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            sources = [self.streams[id(s)].pop() for s in node.sources]
+            gen, single = self._build(node, sources)
+            n = max(1, self.consumers.get(id(node), 0))
+            self.streams[id(node)] = [(g, single) for g in itertools.tee(gen, n)]
+        return self.streams[id(ops)].pop()[0]
+
+
+def eval_stream(ops, data_map, *, eval_env=None, data_model=None, narrow=True):
+    """
+    Evaluate an operator DAG over streams of data frame chunks.
+
+    :param ops: data_algebra.data_ops.ViewRepresentation
+    :param data_map: map from table names to iterables of data frames (a data frame is one chunk)
+    :param eval_env: environment to evaluate in
+    :param data_model: adaptor to data dialect (Pandas for now)
+    :param narrow: logical, if True don't copy unexpected columns
+    :return: iterator of result data frames
+    """
+    if not isinstance(data_map, dict):
+        raise TypeError("data_map should be a dictionary")
+    if data_model is None:
+        data_model = data_algebra.pandas_model.PandasModel()
+    builder = _StreamBuilder(
+        ops, data_map, eval_env=eval_env, data_model=data_model, narrow=narrow
+    )
+    return builder.build(ops)
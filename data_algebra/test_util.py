@@ -2,6 +2,8 @@
 # noinspection PyUnresolvedReferences
 import pandas
 import numpy
+import time
+import tracemalloc
 
 # noinspection PyUnresolvedReferences
 import data_algebra
@@ -10,6 +12,7 @@ import sqlite3
 
 # noinspection PyUnresolvedReferences
 import data_algebra.SQLite
+import data_algebra.memory_budget
 from data_algebra.data_ops import *
 from data_algebra.yaml import have_yaml, to_pipeline
 
@@ -203,3 +206,190 @@ def check_transform(
         check_row_order=check_row_order,
     ):
         raise ValueError("SQLite result did not match expect")
+
+
+def pandas_engine(data_model=None):
+    """
+    Engine runner for compare_engines(), evaluating with a data_algebra.data_model.DataModel.
+
+    :param data_model: data model to evaluate with, default data_algebra.pandas_model.PandasModel()
+    :return: function taking ops and a data map and returning a dictionary with "result"
+    """
+    if data_model is None:
+        data_model = data_algebra.pandas_model.PandasModel()
+
+    def run(ops, data_map):
+        return {
+            "result": ops.eval(data_map, data_model=data_model),
+            "sql_seconds": None,
+            "load_seconds": None,
+        }
+
+    return run
+
+
+def db_engine(db_model, connect):
+    """
+    Engine runner for compare_engines(), evaluating through SQL on a database.
+
+    :param db_model: data_algebra.db_model.DBModel
+    :param connect: function with no arguments returning a new (empty) database connection
+    :return: function taking ops and a data map and returning a dictionary with "result",
+             "sql_seconds" (SQL generation time) and "load_seconds" (table insert time)
+    """
+
+    def run(ops, data_map):
+        conn = connect()
+        try:
+            db_model.prepare_connection(conn)
+            start = time.perf_counter()
+            for (k, v) in data_map.items():
+                db_model.insert_table(conn, v, table_name=k)
+            load_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            temp_tables = dict()
+            sql = ops.to_sql(db_model, temp_tables=temp_tables)
+            sql_seconds = time.perf_counter() - start
+            for (k, v) in temp_tables.items():
+                db_model.insert_table(conn, v, table_name=k)
+            res = db_model.read_query(conn, sql)
+        finally:
+            conn.close()
+        return {"result": res, "sql_seconds": sql_seconds, "load_seconds": load_seconds}
+
+    return run
+
+
+def available_engines():
+    """
+    :return: dictionary of engine names to runners, for compare_engines()
+    """
+    return {
+        "pandas": pandas_engine(),
+        "sqlite": db_engine(
+            data_algebra.SQLite.SQLiteModel(), lambda: sqlite3.connect(":memory:")
+        ),
+    }
+
+
+def _traced_peak(f):
+    # tracemalloc peak of f(), over what was allocated before
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        data_algebra.memory_budget.reset_traced_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        f()
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+
+def compare_engines(
+    ops,
+    make_data,
+    *,
+    scales=(1000, 10000, 100000),
+    engines=None,
+    reference="pandas",
+    repeat=3,
+    float_tol=1e-8,
+    check_row_order=False,
+):
+    """
+    Run an operator dag on each engine over generated data at several scales,
+    reporting timing, memory and agreement with the reference engine.
+
+    Time per run (the minimum over repeat runs) covers loading the data, generating
+    SQL and evaluating; sql_seconds and load_seconds break out the first two.  The
+    peak memory is the tracemalloc peak of a separate run, so it counts memory
+    allocated through Python and numpy (not memory private to a database engine).
+
+    :param ops: data_algebra.data_ops.ViewRepresentation
+    :param make_data: function taking a scale (number of rows) and returning a pd.DataFrame
+                      (if ops uses one table) or a map of table names to pd.DataFrames
+    :param scales: data sizes to pass to make_data
+    :param engines: dictionary of engine names to runners (see pandas_engine(), db_engine()),
+                    default available_engines()
+    :param reference: name of the engine the others are compared to
+    :param repeat: number of timed runs per engine and scale
+    :param float_tol: passed to equivalent_frames()
+    :param check_row_order: passed to equivalent_frames()
+    :return: list of dictionaries, one per scale and engine
+    """
+    if not isinstance(ops, ViewRepresentation):
+        raise TypeError("expected ops to be a data_algebra.data_ops.ViewRepresentation")
+    if engines is None:
+        engines = available_engines()
+    if reference not in engines.keys():
+        raise ValueError("reference engine " + str(reference) + " not in engines")
+    if repeat < 1:
+        raise ValueError("repeat must be positive")
+    tables = ops.get_tables()
+    # reference first, so the others can be compared to its result
+    names = [reference] + [k for k in engines.keys() if k != reference]
+    report = []
+    for scale in scales:
+        data = make_data(scale)
+        if isinstance(data, dict):
+            data_map = data
+        else:
+            if len(tables) != 1:
+                raise ValueError("more than one table used, but only one table supplied")
+            data_map = {[k for k in tables.keys()][0]: data}
+        expect = None
+        for name in names:
+            run = engines[name]
+            rec = {
+                "scale": scale,
+                "engine": name,
+                "seconds": None,
+                "sql_seconds": None,
+                "load_seconds": None,
+                "peak_bytes": None,
+                "result_rows": None,
+                "equivalent": None,
+                "error": None,
+            }
+            report.append(rec)
+            # noinspection PyBroadException
+            try:
+                times = []
+                for i in range(repeat):
+                    start = time.perf_counter()
+                    out = run(ops, data_map)
+                    times.append(time.perf_counter() - start)
+                rec["peak_bytes"] = _traced_peak(lambda: run(ops, data_map))
+            except Exception as ex:
+                rec["error"] = repr(ex)
+                continue
+            res = out["result"]
+            rec["seconds"] = min(times)
+            rec["sql_seconds"] = out["sql_seconds"]
+            rec["load_seconds"] = out["load_seconds"]
+            rec["result_rows"] = res.shape[0]
+            if name == reference:
+                expect = res
+                rec["equivalent"] = True
+            elif expect is not None:
+                rec["equivalent"] = equivalent_frames(
+                    res, expect, float_tol=float_tol, check_row_order=check_row_order
+                )
+    return report
+
+
+def fastest_engines(report):
+    """
+    :param report: result of compare_engines()
+    :return: dictionary from scale to the name of the fastest engine that matched the reference
+    """
+    best = dict()
+    for rec in report:
+        if (rec["error"] is not None) or (not rec["equivalent"]):
+            continue
+        scale = rec["scale"]
+        if (scale not in best.keys()) or (rec["seconds"] < best[scale]["seconds"]):
+            best[scale] = rec
+    return {scale: rec["engine"] for (scale, rec) in best.items()}
@@ -1,7 +1,32 @@
 
+import hashlib
+import importlib
+
 import data_algebra
 
 
+_optional_modules = dict()
+
+
+def optional_import(name):
+    """
+    Import an optional package on first use.
+
+    :param name: module name
+    :return: the module, or None if it is not installed
+    """
+    try:
+        return _optional_modules[name]
+    except KeyError:
+        pass
+    try:
+        module = importlib.import_module(name)
+    except ImportError:
+        module = None
+    _optional_modules[name] = module
+    return module
+
+
 def pandas_to_example_str(obj, *, local_data_model=None):
     if local_data_model is None:
         local_data_model = data_algebra.default_data_model
@@ -39,3 +64,17 @@ def table_is_keyed_by_columns(table, column_names):
         return False
     counts = table.groupby(column_names).size()
     return max(counts) <= 1
+
+
+def stable_fingerprint(parts):
+    """
+    Summarize a sequence of values as a hex digest that is stable across runs.
+
+    :param parts: iterable of values, each is converted to a string
+    :return: hex string
+    """
+    h = hashlib.sha256()
+    for p in parts:
+        b = str(p).encode("utf-8")
+        h.update(str(len(b)).encode("utf-8") + b":" + b)
+    return h.hexdigest()
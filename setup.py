@@ -24,7 +24,7 @@ setuptools.setup(
     author='John Mount',
     author_email='jmount@win-vector.com',
     url='https://github.com/WinVector/data_algebra',
-    packages=setuptools.find_packages(exclude=['tests', 'Examples']),
+    packages=setuptools.find_packages(exclude=['tests', 'Examples', 'benchmarks']),
     install_requires=[
         "numpy",
         "pandas"
@@ -0,0 +1,37 @@
+import numpy
+import pytest
+
+import data_algebra
+import data_algebra.test_util
+import data_algebra.cdata
+
+
+def test_blocks_to_rowrecs_pivot():
+    pd = data_algebra.default_data_model.pd
+    control_table = pd.DataFrame(
+        {"part": ["a", "a", "b"], "m": ["x", "y", "x"], "v": ["ax", "ay", "bx"]}
+    )
+    record_spec = data_algebra.cdata.RecordSpecification(
+        control_table, control_table_keys=["part", "m"], record_keys=["id"]
+    )
+    d = pd.DataFrame(
+        {
+            "id": [2, 1, 1, 2, numpy.nan, 1],
+            "part": ["a", "b", "a", "a", "a", "c"],
+            "m": ["x", "x", "y", "y", "x", "x"],
+            "v": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+            "other": ["p", "q", "r", "s", "t", "u"],
+        }
+    )
+    res = data_algebra.cdata.blocks_to_rowrecs(d, blocks_in=record_spec)
+    # records in key order, missing cells null, rows with missing keys or
+    # matching no control row are not used
+    expect = pd.DataFrame(
+        {"id": [1.0, 2.0], "ax": [None, 1.0], "ay": [3.0, 4.0], "bx": [2.0, None]}
+    )
+    assert [c for c in res.columns] == ["id", "ax", "ay", "bx"]
+    assert data_algebra.test_util.equivalent_frames(expect, res, check_row_order=True)
+
+    d_dup = pd.concat([d, d.iloc[[0]]], axis=0, ignore_index=True)
+    with pytest.raises(ValueError):
+        data_algebra.cdata.blocks_to_rowrecs(d_dup, blocks_in=record_spec)
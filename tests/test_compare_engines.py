@@ -0,0 +1,54 @@
+import numpy
+
+import data_algebra
+import data_algebra.test_util
+from data_algebra.data_ops import *
+
+
+def test_compare_engines():
+    def make_data(n_row):
+        rng = numpy.random.RandomState(n_row)
+        return data_algebra.default_data_model.pd.DataFrame(
+            {
+                "g": ["a", "b", "c"] * (n_row // 3),
+                "x": rng.normal(size=3 * (n_row // 3)),
+            }
+        )
+
+    ops = (
+        describe_table(make_data(10), "d")
+        .extend({"y": "x * 2"})
+        .project({"s": "y.sum()", "n": "_size()"}, group_by=["g"])
+    )
+    report = data_algebra.test_util.compare_engines(
+        ops, make_data, scales=[12, 120], repeat=2
+    )
+    assert [(r["scale"], r["engine"]) for r in report] == [
+        (12, "pandas"),
+        (12, "sqlite"),
+        (120, "pandas"),
+        (120, "sqlite"),
+    ]
+    for r in report:
+        assert r["error"] is None
+        assert r["equivalent"]
+        assert r["result_rows"] == 3
+        assert r["seconds"] > 0
+        assert r["peak_bytes"] > 0
+        assert (r["sql_seconds"] is None) == (r["engine"] == "pandas")
+    fastest = data_algebra.test_util.fastest_engines(report)
+    assert set(fastest.keys()) == {12, 120}
+    assert set(fastest.values()).issubset({"pandas", "sqlite"})
+
+    # an engine that disagrees is reported, not raised
+    def wrong_engine(ops, data_map):
+        res = ops.eval(data_map)
+        res["s"] = res["s"] + 1
+        return {"result": res, "sql_seconds": None, "load_seconds": None}
+
+    engines = data_algebra.test_util.available_engines()
+    engines["wrong"] = wrong_engine
+    report = data_algebra.test_util.compare_engines(
+        ops, make_data, scales=[10], engines=engines, repeat=1
+    )
+    assert [r["equivalent"] for r in report] == [True, True, False]
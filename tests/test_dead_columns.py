@@ -0,0 +1,90 @@
+import data_algebra
+import data_algebra.test_util
+import data_algebra.pandas_model
+from data_algebra.data_ops import *
+
+
+def test_dead_columns_not_calculated():
+    d = data_algebra.default_data_model.pd.DataFrame(
+        {"g": ["a", "a", "b"], "x": [1, 2, 3], "y": [4, 5, 6]}
+    )
+
+    ops = (
+        describe_table(d, "d")
+        .extend({"f" + str(i): "x + " + str(i) for i in range(10)})
+        .extend(
+            {"w1": "x.cumsum()", "w2": "y.cumsum()"},
+            partition_by=["g"],
+            order_by=["x"],
+        )
+        .select_columns(["g", "f3", "w2"])
+    )
+
+    model = data_algebra.pandas_model.PandasModel()
+    calculated = []
+    eval_term = model._eval_term
+
+    def counting_eval_term(res, term, *, eval_env, query=False):
+        calculated.append(str(term))
+        return eval_term(res, term, eval_env=eval_env, query=query)
+
+    model._eval_term = counting_eval_term
+    res = ops.eval({"d": d}, data_model=model)
+
+    expect = data_algebra.default_data_model.pd.DataFrame(
+        {"g": ["a", "a", "b"], "f3": [4, 5, 6], "w2": [4, 9, 6]}
+    )
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+    assert calculated == ["x + 3"]
+
+
+def test_dead_columns_join_narrowed():
+    d1 = data_algebra.default_data_model.pd.DataFrame(
+        {"k": [1, 2], "a": [1, 2], "junk1": [0, 0]}
+    )
+    d2 = data_algebra.default_data_model.pd.DataFrame(
+        {"k": [1, 2], "b": [3, 4], "junk2": [0, 0]}
+    )
+
+    ops = (
+        describe_table(d1, "d1")
+        .extend({"junk3": "a + 1"})
+        .natural_join(b=describe_table(d2, "d2"), by=["k"], jointype="INNER")
+        .select_columns(["k", "a", "b"])
+    )
+
+    model = data_algebra.pandas_model.PandasModel()
+    narrowed = []
+    narrow_sources = model._narrow_sources
+
+    def recording_narrow_sources(op, frames):
+        res = narrow_sources(op, frames)
+        narrowed.append([set(f.columns) for f in res])
+        return res
+
+    model._narrow_sources = recording_narrow_sources
+    res = ops.eval({"d1": d1, "d2": d2}, data_model=model)
+
+    expect = data_algebra.default_data_model.pd.DataFrame(
+        {"k": [1, 2], "a": [1, 2], "b": [3, 4]}
+    )
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+    assert narrowed == [[{"k", "a"}, {"k", "b"}]]
+
+
+def test_dead_columns_project():
+    d = data_algebra.default_data_model.pd.DataFrame(
+        {"g": ["a", "a", "b"], "x": [1, 2, 3], "y": [4, 5, 6]}
+    )
+    expects = [
+        data_algebra.default_data_model.pd.DataFrame({"g": ["a", "b"], "sx": [3, 3]}),
+        data_algebra.default_data_model.pd.DataFrame({"sx": [6]}),
+    ]
+    for (group_by, expect) in zip([["g"], []], expects):
+        ops = (
+            describe_table(d, "d")
+            .project({"sx": "x.sum()", "my": "y.max()"}, group_by=group_by)
+            .select_columns(group_by + ["sx"])
+        )
+        res = ops.transform(d)
+        assert data_algebra.test_util.equivalent_frames(res, expect)
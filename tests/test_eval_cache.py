@@ -0,0 +1,166 @@
+import concurrent.futures
+
+import data_algebra
+import data_algebra.test_util
+import data_algebra.eval_cache
+import data_algebra.eval_plan
+import data_algebra.pandas_model
+from data_algebra.data_ops import *
+
+
+def test_eval_cache_recomputes_changed_branch():
+    pd = data_algebra.default_data_model.pd
+    d1 = pd.DataFrame({"k": [1, 2, 3], "x": [1.0, 2.0, 3.0]})
+    d2 = pd.DataFrame({"k": [1, 2, 3], "y": [10.0, 20.0, 30.0]})
+
+    ops = (
+        describe_table(d1, "d1")
+        .extend({"x2": "x * 2"})
+        .natural_join(
+            b=describe_table(d2, "d2").extend({"y2": "y + 1"}),
+            by=["k"],
+            jointype="LEFT",
+        )
+    )
+
+    model = data_algebra.pandas_model.PandasModel()
+    extended = []
+    orig_extend_step = model.extend_step
+
+    def counting_extend_step(op, **kwargs):
+        extended.append(op.ops.keys())
+        return orig_extend_step(op, **kwargs)
+
+    model.extend_step = counting_extend_step
+
+    cache = data_algebra.eval_cache.EvalCache()
+    data_map = {"d1": d1, "d2": d2}
+    res1 = ops.eval(data_map, data_model=model, cache=cache)
+    assert len(extended) == 2
+    assert cache.stats()["hits"] == 0
+
+    # same data: the root result comes straight from the cache
+    res2 = ops.eval(data_map, data_model=model, cache=cache)
+    assert len(extended) == 2
+    assert cache.stats()["hits"] == 1
+    assert data_algebra.test_util.equivalent_frames(res1, res2)
+
+    # results handed out are copies, so callers can not damage the cache
+    res2["x"] = 0.0
+    res3 = ops.eval(data_map, data_model=model, cache=cache)
+    assert data_algebra.test_util.equivalent_frames(res1, res3)
+
+    # new contents for d2: only the d2 branch is recalculated
+    d2b = pd.DataFrame({"k": [1, 2, 3], "y": [10.0, 20.0, 31.0]})
+    res4 = ops.eval({"d1": d1, "d2": d2b}, data_model=model, cache=cache)
+    assert len(extended) == 3
+    assert [k for k in extended[-1]] == ["y2"]
+    assert data_algebra.test_util.equivalent_frames(
+        res4, ops.eval({"d1": d1, "d2": d2b})
+    )
+
+    # user supplied versions are trusted instead of hashing contents
+    res5 = ops.eval(
+        {"d1": d1, "d2": d2b},
+        data_model=model,
+        cache=cache,
+        table_versions={"d1": "v1", "d2": "v1"},
+    )
+    assert len(extended) == 5
+    ops.eval(
+        {"d1": d1, "d2": d2},
+        data_model=model,
+        cache=cache,
+        table_versions={"d1": "v1", "d2": "v1"},
+    )
+    assert len(extended) == 5  # same versions, so stale but cached
+    assert data_algebra.test_util.equivalent_frames(res4, res5)
+
+
+def test_eval_cache_eviction():
+    pd = data_algebra.default_data_model.pd
+    cache = data_algebra.eval_cache.EvalCache(max_entries=2)
+    for i in range(3):
+        cache.put(i, pd.DataFrame({"x": [i]}))
+    assert cache.get(0) is None
+    assert cache.get(2) is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["entries"] == 2
+
+    d = pd.DataFrame({"x": range(100)})
+    size = int(d.memory_usage(index=True, deep=True).sum())
+    cache = data_algebra.eval_cache.EvalCache(max_entries=None, max_bytes=2 * size)
+    for i in range(3):
+        cache.put(i, d)
+    assert len(cache) == 2
+    assert cache.stats()["bytes"] <= 2 * size
+
+
+def test_eval_cache_user_fn_rebound():
+    pd = data_algebra.default_data_model.pd
+    d = pd.DataFrame({"g": [1, 1, 2], "x": [1, 2, 3]})
+    cache = data_algebra.eval_cache.EvalCache()
+
+    def f(x):
+        return x.max()
+
+    ops1 = describe_table(d, "d").project({"y": user_fn(f, "x")}, group_by=["g"])
+    res = ops1.eval({"d": d}, cache=cache)
+    assert list(res["y"]) == [2, 3]
+
+    # re-bind the function, pipelines using it are not served from the cache
+    def f(x):
+        return x.min()
+
+    ops2 = describe_table(d, "d").project({"y": user_fn(f, "x")}, group_by=["g"])
+    res = ops2.eval({"d": d}, cache=cache)
+    assert list(res["y"]) == [1, 3]
+    res = ops1.eval({"d": d}, cache=cache)
+    assert list(res["y"]) == [2, 3]
+    assert len(cache) == 0
+
+
+def test_eval_cache_eval_env_key():
+    key = data_algebra.eval_plan.eval_env_key
+    assert key(None) == ()
+    assert key({"a": 1, "b": "x"}) == key({"b": "x", "a": 1})
+    assert key({"a": 1}) != key({"a": 2})
+    assert key({"a": 1}) != key({"a": 1.0})
+    assert key({"f": len}) is None
+
+
+def test_eval_cache_threads():
+    pd = data_algebra.default_data_model.pd
+    cache = data_algebra.eval_cache.EvalCache(max_entries=5)
+    frames = [pd.DataFrame({"x": [i]}) for i in range(20)]
+
+    def work(i):
+        for j in range(200):
+            k = (i + j) % 20
+            res = cache.get(k)
+            if res is None:
+                cache.put(k, frames[k])
+            else:
+                assert res["x"][0] == k
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        [f.result() for f in [executor.submit(work, i) for i in range(8)]]
+    stats = cache.stats()
+    assert stats["hits"] + stats["misses"] == 8 * 200
+    assert stats["entries"] <= 5
+
+    # branches evaluated on threads share the cache
+    d = pd.DataFrame({"k": [1, 2, 3], "x": [1.0, 2.0, 3.0]})
+    ops = (
+        describe_table(d, "d")
+        .extend({"y": "x + 1"})
+        .natural_join(
+            b=describe_table(d, "d").extend({"z": "x * 2"}).select_columns(["k", "z"]),
+            by=["k"],
+            jointype="INNER",
+        )
+    )
+    expect = ops.transform(d)
+    for _ in range(2):
+        res = ops.eval({"d": d}, cache=cache, max_workers=4)
+        assert data_algebra.test_util.equivalent_frames(expect, res)
@@ -0,0 +1,61 @@
+import data_algebra
+import data_algebra.test_util
+import data_algebra.pandas_model
+from data_algebra.data_ops import *
+
+
+def test_eval_plan_shared_node_evaluated_once():
+    d = data_algebra.default_data_model.pd.DataFrame(
+        {"g": ["a", "a", "b"], "x": [1, 2, 3]}
+    )
+
+    shared = describe_table(d, "d").extend({"y": "x * 10"})
+    ops = (
+        shared.select_rows("x > 1")
+        .extend({"z": "y + 1"})
+        .concat_rows(shared.select_rows("x <= 1").extend({"z": "y - 1"}))
+    )
+
+    model = data_algebra.pandas_model.PandasModel()
+    extended = []
+    extend_step = model.extend_step
+
+    def counting_extend_step(op, *, data_map, eval_env, narrow):
+        extended.append(op)
+        return extend_step(op, data_map=data_map, eval_env=eval_env, narrow=narrow)
+
+    model.extend_step = counting_extend_step
+    res = ops.eval({"d": d}, data_model=model)
+
+    expect = data_algebra.default_data_model.pd.DataFrame(
+        {
+            "g": ["a", "b", "a"],
+            "x": [2, 3, 1],
+            "y": [20, 30, 10],
+            "z": [21, 31, 9],
+            "source_name": ["a", "a", "b"],
+        }
+    )
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+    assert len([op for op in extended if op is shared]) == 1
+    assert len(extended) == 3
+    # plan is released when evaluation finishes
+    assert model.eval_plan is None
+
+
+def test_eval_plan_self_join():
+    d = data_algebra.default_data_model.pd.DataFrame(
+        {"g": ["a", "a", "b"], "x": [1, 2, 3]}
+    )
+
+    agg = describe_table(d, "d").project({"x": "x.max()"}, group_by=["g"])
+    ops = agg.natural_join(
+        b=agg.rename_columns({"x2": "x"}), by=["g"], jointype="INNER"
+    )
+
+    res = ops.transform(d)
+
+    expect = data_algebra.default_data_model.pd.DataFrame(
+        {"g": ["a", "b"], "x": [2, 3], "x2": [2, 3]}
+    )
+    assert data_algebra.test_util.equivalent_frames(res, expect)
@@ -0,0 +1,50 @@
+import data_algebra
+import data_algebra.test_util
+import data_algebra.SQLite
+import data_algebra.eval_profile
+from data_algebra.data_ops import *
+
+
+def test_eval_profile():
+    d = data_algebra.default_data_model.pd.DataFrame(
+        {"g": ["a", "a", "b", "c"], "x": [1.0, 2.0, 3.0, 4.0]}
+    )
+    ops = (
+        describe_table(d, "d")
+        .select_rows("x > 1")
+        .extend({"y": "x * 2"})
+        .project({"s": "y.sum()"}, group_by=["g"])
+    )
+    expect = ops.transform(d)
+
+    profile = data_algebra.eval_profile.EvalProfile()
+    res = ops.transform(d, profile=profile)
+    assert data_algebra.test_util.equivalent_frames(expect, res)
+
+    report = profile.report()
+    assert [r["node_name"] for r in report] == [
+        "TableDescription",
+        "SelectRowsNode",
+        "ExtendNode",
+        "ProjectNode",
+    ]
+    assert [r["step"] for r in report] == [0, 1, 2, 3]
+    assert [r["input_rows"] for r in report] == [4, 4, 3, 3]
+    assert [r["output_rows"] for r in report] == [4, 3, 3, 3]
+    assert [r["output_columns"] for r in report] == [2, 2, 3, 2]
+    for r in report:
+        assert r["wall_time"] >= 0
+        assert r["cpu_time"] >= 0
+        assert r["output_bytes"] > 0
+    frame = profile.to_data_frame()
+    assert frame.shape == (4, 9)
+    assert "rows 3 -> 3" in profile.annotation(ops)
+
+    # the database runs one query, recorded as the cost of the whole pipeline
+    profile_db = data_algebra.eval_profile.EvalProfile()
+    res_db = data_algebra.SQLite.SQLiteModel().eval(ops, {"d": d}, profile=profile_db)
+    assert data_algebra.test_util.equivalent_frames(expect, res_db)
+    report_db = profile_db.report()
+    assert [r["node_name"] for r in report_db] == ["TableDescription", "ProjectNode"]
+    assert report_db[1]["input_rows"] == 4
+    assert report_db[1]["output_rows"] == 3
@@ -0,0 +1,106 @@
+import numpy
+
+import data_algebra
+import data_algebra.test_util
+import data_algebra.expr_compile
+from data_algebra.data_ops import *
+
+
+def test_expr_compile_matches_pandas_eval():
+    d = data_algebra.default_data_model.pd.DataFrame(
+        {
+            "x": [1.0, 2.0, 3.0, numpy.nan],
+            "y": [4.0, 0.0, -1.0, 2.0],
+            "s": ["a", "b", "a", "c"],
+        }
+    )
+
+    ops = describe_table(d, "d").extend(
+        {
+            "a": "x + y * 2",
+            "b": "(x - y) / y",
+            "c": "-x",
+            "e": "y.exp()",
+            "f": "s == 'a'",
+            "g": "(x > 1) & (y < 1)",
+            "h": "x.is_bad()",
+            "i": "(x > 1).if_else(x, y)",
+        }
+    )
+
+    model = data_algebra.default_data_model
+    for k, opk in ops.ops.items():
+        assert data_algebra.expr_compile.compile_term(opk) is not None
+
+    res = ops.transform(d)
+
+    x = d["x"].values
+    y = d["y"].values
+    with numpy.errstate(all="ignore"):
+        expect = {
+            "a": x + y * 2,
+            "b": (x - y) / y,
+            "c": -x,
+            "e": numpy.exp(y),
+            "f": [True, False, True, False],
+            "g": [False, True, True, False],
+            "h": [False, False, False, True],
+            "i": numpy.where(x > 1, x, y),
+        }
+    for k, v in expect.items():
+        assert numpy.allclose(
+            numpy.asarray(res[k], dtype=float),
+            numpy.asarray(v, dtype=float),
+            equal_nan=True,
+        )
+    # agrees with the pandas eval() path where that path works
+    for k in ["a", "b", "c", "e", "f", "g", "h"]:
+        pandas_k = d.eval(
+            ops.ops[k].to_pandas(), local_dict=model.pandas_eval_env, global_dict={}
+        )
+        assert numpy.allclose(
+            numpy.asarray(res[k], dtype=float),
+            numpy.asarray(pandas_k, dtype=float),
+            equal_nan=True,
+        )
+
+
+def test_expr_compile_select_rows():
+    d = data_algebra.default_data_model.pd.DataFrame(
+        {"x": [1, 2, 3, 4], "s": ["a", "b", "a", "b"],}
+    )
+
+    ops = describe_table(d, "d").select_rows("(x > 1) & (s == 'a')")
+    assert data_algebra.expr_compile.compile_term(ops.expr) is not None
+
+    res = ops.transform(d)
+
+    expect = data_algebra.default_data_model.pd.DataFrame({"x": [3], "s": ["a"],})
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+
+
+def test_expr_compile_fallback():
+    d = data_algebra.default_data_model.pd.DataFrame({"x": [1.2, 2.5]})
+
+    # around() is not a NumPy ufunc, so this is left to pandas eval
+    ops = describe_table(d, "d").extend({"y": "x.around()"})
+    assert data_algebra.expr_compile.compile_term(ops.ops["y"]) is None
+
+
+def test_expr_compile_integer_zero_divisor():
+    d = data_algebra.default_data_model.pd.DataFrame(
+        {"x": [1, 2, 3, 7], "y": [0, 2, 0, 2]}
+    )
+
+    ops = describe_table(d, "d").extend({"q": "x // y", "m": "x % y"})
+    assert data_algebra.expr_compile.compile_term(ops.ops["q"]) is None
+    assert data_algebra.expr_compile.compile_term(ops.ops["m"]) is None
+
+    res = ops.transform(d)
+
+    expect = d.copy()
+    expect["q"] = d.eval("x // y")
+    expect["m"] = d.eval("x % y")
+    assert list(res["q"]) == [numpy.inf, 1.0, numpy.inf, 3.0]
+    assert numpy.isnan(res["m"][0]) and numpy.isnan(res["m"][2])
+    assert data_algebra.test_util.equivalent_frames(res, expect)
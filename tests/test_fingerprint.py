@@ -0,0 +1,154 @@
+import numpy
+
+import data_algebra
+import data_algebra.test_util
+import data_algebra.cdata
+import data_algebra.pandas_model
+from data_algebra.data_ops import *
+
+
+def test_fingerprint_structural():
+    d = data_algebra.default_data_model.pd.DataFrame(
+        {"g": ["a", "a", "b"], "x": [1, 2, 3], "y": [3, 2, 1]}
+    )
+
+    def build(*, partition_by=None, fn="x + y", jointype="INNER"):
+        td = describe_table(d, "d")
+        return (
+            td.extend({"z": fn}, partition_by=partition_by)
+            .natural_join(b=td, by=["g", "x", "y"], jointype=jointype)
+            .order_rows(["x"])
+        )
+
+    ops1 = build()
+    ops2 = build()
+    assert ops1 is not ops2
+    assert ops1.fingerprint() == ops2.fingerprint()
+    assert ops1 == ops2
+    assert hash(ops1) == hash(ops2)
+    assert len({ops1, ops2}) == 1
+    z1 = ops1.sources[0].sources[0].ops["z"]
+    z2 = ops2.sources[0].sources[0].ops["z"]
+    assert z1 is not z2
+    assert z1.fingerprint() == z2.fingerprint()
+
+    # each structural difference changes the fingerprint
+    others = [
+        build(fn="x - y"),
+        build(fn="x.max()", partition_by=["g"]),
+        build(jointype="LEFT"),
+        describe_table(d, "d2").extend({"z": "x + y"}),
+        build().order_rows(["x"], reverse=["x"]),
+    ]
+    fingerprints = {ops1.fingerprint()}.union([o.fingerprint() for o in others])
+    assert len(fingerprints) == 1 + len(others)
+    for o in others:
+        assert ops1 != o
+
+    # stable across runs
+    assert (
+        describe_table(d, "d").fingerprint()
+        == data_algebra.util.stable_fingerprint(
+            ["TableDescription", ["g", "x", "y"], "d", []]
+        )
+    )
+
+
+def test_fingerprint_record_map():
+    control = data_algebra.default_data_model.pd.DataFrame(
+        {"measure": ["a", "b"], "value": ["va", "vb"]}
+    )
+    d = data_algebra.default_data_model.pd.DataFrame(
+        {"id": [1, 2], "va": [1.0, 2.0], "vb": [3.0, 4.0]}
+    )
+
+    def build(control_table):
+        record_map = data_algebra.cdata.RecordMap(
+            blocks_out=data_algebra.cdata.RecordSpecification(
+                control_table, record_keys=["id"]
+            )
+        )
+        return describe_table(d, "d").convert_records(record_map)
+
+    control_2 = control.copy()
+    control_2["measure"] = ["a", "c"]
+    assert build(control).fingerprint() == build(control.copy()).fingerprint()
+    assert build(control).fingerprint() != build(control_2).fingerprint()
+
+
+def test_hash_consing():
+    d = data_algebra.default_data_model.pd.DataFrame({"x": [1, 2, 3]})
+
+    with hash_consing() as table:
+        a = describe_table(d, "d").extend({"y": "x + 1"})
+        b = describe_table(d, "d").extend({"y": "x + 1"})
+        ops = a.select_rows("y > 2").concat_rows(b)
+    assert a is b
+    assert ops.sources[0].sources[0] is ops.sources[1]
+    assert len(table) == 4
+    # outside of the context nodes are not shared
+    c = describe_table(d, "d").extend({"y": "x + 1"})
+    assert c is not a
+    assert c == a
+
+    res = ops.transform(d)
+    expect = data_algebra.default_data_model.pd.DataFrame(
+        {
+            "x": [2, 3, 1, 2, 3],
+            "y": [3, 4, 2, 3, 4],
+            "source_name": ["a", "a", "b", "b", "b"],
+        }
+    )
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+
+
+def test_fingerprint_user_fn():
+    d = data_algebra.default_data_model.pd.DataFrame({"g": [1, 1, 2], "x": [1, 2, 3]})
+
+    def build(fn):
+        return describe_table(d, "d").project(
+            {"y": user_fn(fn, "x")}, group_by=["g"]
+        )
+
+    ops1 = build(numpy.max)
+    assert not ops1.fingerprint_is_stable()
+    assert not ops1.order_rows(["g"]).fingerprint_is_stable()
+    assert describe_table(d, "d").extend({"y": "x + 1"}).fingerprint_is_stable()
+    # user functions are only equal to themselves
+    assert ops1.fingerprint() != build(numpy.max).fingerprint()
+    assert ops1.fingerprint() == ops1.fingerprint()
+    with hash_consing() as table:
+        a = build(numpy.max)
+        b = build(numpy.max)
+    assert a is not b
+    assert len(table) == 1  # just the shared table description
+
+
+def test_eval_plan_shares_equal_sub_dags():
+    d = data_algebra.default_data_model.pd.DataFrame({"x": [1, 2, 3]})
+
+    def build():
+        return describe_table(d, "d").extend({"y": "x + 1"})
+
+    # separately built but identical branches are evaluated once
+    ops = build().concat_rows(build())
+    model = data_algebra.pandas_model.PandasModel()
+    calls = []
+    orig_extend_step = model.extend_step
+
+    def counting_extend_step(op, **kwargs):
+        calls.append(op)
+        return orig_extend_step(op, **kwargs)
+
+    model.extend_step = counting_extend_step
+    try:
+        res = ops.transform(d, data_model=model)
+    finally:
+        del model.extend_step
+    assert len(calls) == 1
+    expect = data_algebra.default_data_model.pd.DataFrame(
+        {"x": [1, 2, 3, 1, 2, 3], "y": [2, 3, 4, 2, 3, 4]}
+    )
+    assert data_algebra.test_util.equivalent_frames(
+        res.drop(columns=["source_name"]), expect
+    )
@@ -0,0 +1,29 @@
+import subprocess
+import sys
+
+import data_algebra
+import data_algebra.pandas_model
+
+from benchmarks.import_time import run_script, sql_script
+
+
+def test_sql_generation_does_not_import_pandas():
+    loaded = run_script(sql_script).split()
+    assert "pandas" not in loaded
+    assert "black" not in loaded
+    assert "sqlparse" not in loaded
+
+
+def test_default_data_model_is_lazy():
+    script = (
+        "import sys\n"
+        "import data_algebra\n"
+        "assert 'pandas' not in sys.modules\n"
+        "m = data_algebra.default_data_model\n"
+        "assert m is data_algebra.default_data_model\n"
+        "assert 'pandas' in sys.modules\n"
+    )
+    subprocess.check_call([sys.executable, "-c", script])
+    assert isinstance(
+        data_algebra.default_data_model, data_algebra.pandas_model.PandasModel
+    )
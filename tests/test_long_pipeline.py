@@ -0,0 +1,66 @@
+import sys
+
+import data_algebra
+import data_algebra.test_util
+import data_algebra.optimizer
+import data_algebra.pandas_model
+from data_algebra.data_ops import *
+
+
+def test_long_pipeline():
+    d = data_algebra.default_data_model.pd.DataFrame({"x": [1.0, 2.0], "y": [0, 1]})
+
+    n_steps = 3000
+    assert n_steps > sys.getrecursionlimit()
+    ops = describe_table(d, "d")
+    for i in range(n_steps):
+        if i % 2 == 0:
+            ops = ops.extend({"x": "x + 1"})
+        else:
+            ops = ops.select_rows("x > 0")
+
+    model = data_algebra.pandas_model.PandasModel()
+    held = []
+    orig_extend_step = model.extend_step
+
+    def watching_extend_step(op, **kwargs):
+        held.append(len(model.eval_plan.results))
+        return orig_extend_step(op, **kwargs)
+
+    model.extend_step = watching_extend_step
+
+    res = ops.transform(d, data_model=model)
+    expect = data_algebra.default_data_model.pd.DataFrame(
+        {"x": [1.0 + n_steps / 2, 2.0 + n_steps / 2], "y": [0, 1]}
+    )
+    assert data_algebra.test_util.equivalent_frames(expect, res)
+    # intermediate results are released as soon as their consumer takes them
+    assert len(held) == n_steps / 2
+    assert max(held) <= 1
+
+    assert ops.forbidden_columns() == {"d": set()}
+    assert ops.columns_used() == {"d": {"x", "y"}}
+    assert ops == ops.replace_sources([ops.sources[0]])
+
+    # the optimizer also walks the pipeline without recursion
+    optimized = data_algebra.optimizer.optimize(ops)
+    assert optimized == ops
+    res = ops.eval({"d": d}, optimize=True)
+    assert data_algebra.test_util.equivalent_frames(expect, res)
+
+
+def test_long_pipeline_optimized():
+    d = data_algebra.default_data_model.pd.DataFrame({"x": [1.0, 2.0], "y": [0, 1]})
+
+    n_steps = 3000
+    ops = describe_table(d, "d")
+    for i in range(n_steps):
+        ops = ops.extend({"x": "x + 1"}).rename_columns({"x": "x"})
+    rules_applied = []
+    optimized = data_algebra.optimizer.optimize(ops, rules_applied=rules_applied)
+    assert len(rules_applied) > 0
+    res = optimized.transform(d)
+    expect = data_algebra.default_data_model.pd.DataFrame(
+        {"x": [1.0 + n_steps, 2.0 + n_steps], "y": [0, 1]}
+    )
+    assert data_algebra.test_util.equivalent_frames(expect, res)
@@ -0,0 +1,49 @@
+import pytest
+
+import data_algebra
+import data_algebra.test_util
+import data_algebra.memory_budget
+from data_algebra.data_ops import *
+
+
+def test_memory_budget():
+    pd = data_algebra.default_data_model.pd
+    a = pd.DataFrame({"k": [1] * 300, "x": range(300)})
+    b = pd.DataFrame({"k": [1] * 300, "y": range(300)})
+    data_map = {"a": a, "b": b}
+    # fan-out join: 300 x 300 rows
+    ops = (
+        describe_table(a, "a")
+        .natural_join(b=describe_table(b, "b"), by=["k"], jointype="INNER")
+        .extend({"z": "x + y"})
+    )
+    expect = ops.eval(data_map)
+
+    tracker = data_algebra.memory_budget.MemoryTracker()
+    res = ops.eval(data_map, memory_tracker=tracker)
+    assert data_algebra.test_util.equivalent_frames(expect, res)
+    report = tracker.report()
+    assert [r["node_name"] for r in report] == [
+        "TableDescription",
+        "TableDescription",
+        "NaturalJoinNode",
+        "ExtendNode",
+    ]
+    assert report[3]["result_bytes"] == data_algebra.memory_budget.result_size(res)
+    assert tracker.peak_bytes >= report[3]["result_bytes"]
+    assert "<- largest" in tracker.diagnosis()
+
+    # the join is refused before it is calculated
+    tracker = data_algebra.memory_budget.MemoryTracker(100000)
+    with pytest.raises(data_algebra.memory_budget.MemoryBudgetExceeded) as e:
+        ops.eval(data_map, memory_tracker=tracker)
+    assert e.value.op.node_name == "NaturalJoinNode"
+    assert e.value.needed_bytes > 100000
+    assert len(e.value.records) == 2
+    assert "NaturalJoinNode" in str(e.value)
+
+    # or evaluated spilling to disk
+    tracker = data_algebra.memory_budget.MemoryTracker(100000, on_exceeded="spill")
+    res_spill = ops.eval(data_map, memory_tracker=tracker)
+    assert tracker.spilled
+    assert data_algebra.test_util.equivalent_frames(expect, res_spill)
@@ -49,3 +49,36 @@ def test_natural_join_columns():
     conn.close()
 
     assert data_algebra.test_util.equivalent_frames(expect, res_sqlite)
+
+
+def test_natural_join_coalesce_many_columns():
+    d = data_algebra.default_data_model.pd.DataFrame(
+        {
+            "id": [1, 2, 3],
+            "a": [1.0, numpy.nan, 3.0],
+            "s": ["x", None, None],
+            "left_only": [True, False, True],
+        }
+    )
+
+    d2 = data_algebra.default_data_model.pd.DataFrame(
+        {"id": [2, 3, 4], "s": ["y", "z", "w"], "a": [20.0, 30.0, 40.0]}
+    )
+
+    ops = describe_table(d, "d").natural_join(
+        b=describe_table(d2, "d2"), by=["id"], jointype="LEFT"
+    )
+
+    res = ops.eval(data_map={"d": d, "d2": d2})
+
+    expect = data_algebra.default_data_model.pd.DataFrame(
+        {
+            "id": [1, 2, 3],
+            "a": [1.0, 20.0, 3.0],
+            "s": ["x", "y", "z"],
+            "left_only": [True, False, True],
+        }
+    )
+
+    assert data_algebra.test_util.equivalent_frames(expect, res)
+    assert [c for c in res.columns] == ["id", "a", "s", "left_only"]
@@ -0,0 +1,109 @@
+import sqlite3
+
+import data_algebra
+import data_algebra.test_util
+import data_algebra.optimizer
+import data_algebra.SQLite
+from data_algebra.data_ops import *
+
+
+def test_optimizer_select_pushdown():
+    d = data_algebra.default_data_model.pd.DataFrame(
+        {
+            "g": ["a", "a", "b", "b", "c"],
+            "x": [1, 2, 3, 4, 5],
+            "y": [5, 4, 3, 2, 1],
+        }
+    )
+
+    ops = (
+        describe_table(d, "d")
+        .extend({"z": "x + y"})
+        .extend({"m": "x.max()"}, partition_by=["g"])
+        .rename_columns({"group": "g"})
+        .select_rows("group != 'a'")
+        .select_rows("(y > 1) & (z > 0)")
+    )
+
+    rules_applied = []
+    opt = data_algebra.optimizer.optimize(ops, rules_applied=rules_applied)
+    assert "push_select_below_rename" in rules_applied
+    assert "push_select_below_extend" in rules_applied
+    # the partition condition ends up directly on the table, but the other
+    # condition would change x.max() so stays above the windowed extend
+    assert isinstance(opt, RenameColumnsNode)
+    node = opt
+    while not isinstance(node.sources[0], TableDescription):
+        node = node.sources[0]
+    assert isinstance(node, SelectRowsNode)
+    assert node.decision_columns == {"g"}
+    assert isinstance(opt.sources[0], SelectRowsNode)
+
+    expect = ops.transform(d)
+    res = ops.transform(d, optimize=True)
+    assert data_algebra.test_util.equivalent_frames(expect, res)
+
+    db_model = data_algebra.SQLite.SQLiteModel()
+    with sqlite3.connect(":memory:") as conn:
+        db_model.prepare_connection(conn)
+        db_model.insert_table(conn, d, "d")
+        res_db = db_model.read_query(conn, ops.to_sql(db_model, optimize=True))
+    assert data_algebra.test_util.equivalent_frames(expect, res_db)
+
+
+def test_optimizer_join_and_projection():
+    d1 = data_algebra.default_data_model.pd.DataFrame(
+        {"k": [1, 2, 3, 4], "a": [10, 20, 30, 40], "s": [1.0, None, 3.0, None]}
+    )
+    d2 = data_algebra.default_data_model.pd.DataFrame(
+        {"k": [1, 2, 3], "b": [100, 200, 300], "s": [9.0, 8.0, 7.0]}
+    )
+
+    ops = (
+        describe_table(d1, "d1")
+        .natural_join(b=describe_table(d2, "d2"), by=["k"], jointype="LEFT")
+        .extend({"c": "a + 1", "unused": "a * 2"})
+        .select_rows("(a > 10) & (s > 5)")
+        .select_columns(["k", "a", "c", "s"])
+    )
+
+    rules_applied = []
+    opt = data_algebra.optimizer.optimize(ops, rules_applied=rules_applied)
+    assert "prune_unused_calculations" in rules_applied
+    assert "push_select_into_join" in rules_applied
+    assert "unused" not in opt.sources[0].column_names
+
+    data_map = {"d1": d1, "d2": d2}
+    expect = ops.eval(data_map)
+    res = ops.eval(data_map, optimize=True)
+    assert data_algebra.test_util.equivalent_frames(expect, res)
+
+    # s is shared by both sides, so its condition must stay above the join
+    text = ops.explain()
+    assert "# optimized plan" in text
+    assert "push_select_into_join" in text
+
+
+def test_optimizer_identity_rename():
+    d = data_algebra.default_data_model.pd.DataFrame({"x": [1, 2], "y": [3, 4]})
+
+    ops = describe_table(d, "d").rename_columns({"x": "x", "z": "y"})
+    opt = data_algebra.optimizer.optimize(ops)
+    assert opt.column_remapping == {"z": "y"}
+    assert data_algebra.test_util.equivalent_frames(
+        ops.transform(d), opt.transform(d)
+    )
+
+
+def test_optimizer_shared_nodes_not_duplicated():
+    d = data_algebra.default_data_model.pd.DataFrame({"x": [1, 2, 3]})
+
+    shared = describe_table(d, "d").extend({"y": "x + 1"})
+    ops = shared.select_rows("x > 1").concat_rows(shared)
+
+    opt = data_algebra.optimizer.optimize(ops)
+    # the shared extend is not copied to push the filter below it
+    assert opt.sources[0].sources[0] is opt.sources[1]
+    assert data_algebra.test_util.equivalent_frames(
+        ops.transform(d), opt.transform(d)
+    )
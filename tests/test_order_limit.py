@@ -0,0 +1,59 @@
+import numpy
+
+import data_algebra
+import data_algebra.test_util
+from data_algebra.data_ops import *
+
+
+def test_order_limit_matches_full_sort():
+    rng = numpy.random.RandomState(2020)
+    n = 1000
+    x = rng.randint(0, 20, size=n).astype(float)
+    x[rng.uniform(size=n) < 0.05] = numpy.nan
+    d = data_algebra.default_data_model.pd.DataFrame(
+        {
+            "x": x,
+            "y": rng.randint(0, 5, size=n),
+            "s": [str(v) for v in rng.randint(0, 7, size=n)],
+            "i": range(n),
+        }
+    )
+
+    for columns, reverse in [
+        (["x", "i"], []),
+        (["x", "i"], ["x"]),
+        (["x", "y", "i"], ["y"]),
+        (["s", "i"], ["s"]),
+    ]:
+        ascending = [c not in reverse for c in columns]
+        for limit in [1, 5, 50, n + 10]:
+            ops = describe_table(d, "d").order_rows(
+                columns, reverse=reverse, limit=limit
+            )
+            res = ops.transform(d)
+            expect = (
+                d.sort_values(by=columns, ascending=ascending)
+                .head(limit)
+                .reset_index(drop=True)
+            )
+            assert res.shape[0] == min(limit, n)
+            assert data_algebra.test_util.equivalent_frames(
+                res, expect, check_row_order=True
+            )
+
+
+def test_order_limit_ties_and_missing():
+    d = data_algebra.default_data_model.pd.DataFrame(
+        {"x": [3.0, numpy.nan, 1.0, 1.0, 2.0], "i": [0, 1, 2, 3, 4]}
+    )
+
+    ops = describe_table(d, "d").order_rows(["x"], reverse=["x"], limit=4)
+    res = ops.transform(d)
+
+    # ties keep input order, missing values sort last
+    expect = data_algebra.default_data_model.pd.DataFrame(
+        {"x": [3.0, 2.0, 1.0, 1.0], "i": [0, 4, 2, 3]}
+    )
+    assert data_algebra.test_util.equivalent_frames(
+        res, expect, check_row_order=True
+    )
@@ -0,0 +1,109 @@
+import os
+
+import numpy
+import pytest
+
+import data_algebra
+import data_algebra.test_util
+import data_algebra.out_of_core
+from data_algebra.data_ops import *
+
+
+def _chunks(d, size):
+    return [
+        d.iloc[i : i + size, :].reset_index(drop=True)
+        for i in range(0, d.shape[0], size)
+    ]
+
+
+def _example(n=2000, seed=2020):
+    rng = numpy.random.RandomState(seed)
+    pd = data_algebra.default_data_model.pd
+    x = rng.normal(size=n)
+    x[rng.uniform(size=n) < 0.1] = numpy.nan
+    d1 = pd.DataFrame(
+        {
+            "k": rng.choice(200, size=n),
+            "g": rng.choice(["a", "b", "c", "d"], size=n),
+            "x": x,
+            "i": numpy.arange(n),
+        }
+    )
+    d2 = pd.DataFrame({"k": numpy.arange(0, 300, 2), "y": rng.normal(size=150)})
+    return d1, d2
+
+
+def test_out_of_core_matches_pandas(tmpdir):
+    d1, d2 = _example()
+
+    ops = (
+        describe_table(d1, "d1")
+        .extend(
+            {"r": "_row_number()", "m": "x.max()"}, partition_by=["g"], order_by=["i"]
+        )
+        .natural_join(b=describe_table(d2, "d2"), by=["k"], jointype="LEFT")
+        .extend({"z": "x + y"})
+    )
+    ops_project = ops.project(
+        {"med": "z.median()", "n": "_size()", "s": "z.sum()"}, group_by=["g", "k"]
+    )
+    ops_order = ops.order_rows(["g", "x", "i"], reverse=["x"])
+    ops_top = ops.order_rows(["x", "i"], limit=17)
+
+    data_map = {"d1": d1, "d2": d2}
+    evaluator = data_algebra.out_of_core.OutOfCoreEvaluator(
+        memory_budget=20000, n_partitions=4, block_rows=100, spill_dir=str(tmpdir)
+    )
+    for o in [ops, ops_project]:
+        expect = o.eval(data_map)
+        res = evaluator.eval(o, {"d1": _chunks(d1, 300), "d2": _chunks(d2, 50)})
+        assert data_algebra.test_util.equivalent_frames(expect, res)
+    for o in [ops_order, ops_top]:
+        expect = o.eval(data_map)
+        res = evaluator.eval(o, {"d1": _chunks(d1, 300), "d2": _chunks(d2, 50)})
+        assert data_algebra.test_util.equivalent_frames(
+            expect, res, check_row_order=True
+        )
+    assert evaluator.spilled_files > 0
+    # spill files are cleaned up
+    assert len(os.listdir(str(tmpdir))) == 0
+
+
+def test_out_of_core_budget():
+    d1, d2 = _example()
+
+    ops = describe_table(d1, "d1").project({"med": "x.median()"})
+    evaluator = data_algebra.out_of_core.OutOfCoreEvaluator(memory_budget=20000)
+    # needs all rows at once
+    with pytest.raises(ValueError):
+        evaluator.eval(ops, {"d1": _chunks(d1, 300)})
+    evaluator = data_algebra.out_of_core.OutOfCoreEvaluator(memory_budget=2 ** 20)
+    res = evaluator.eval(ops, {"d1": _chunks(d1, 300)})
+    assert data_algebra.test_util.equivalent_frames(ops.transform(d1), res)
+
+
+def test_out_of_core_order_rows_many_runs():
+    rng = numpy.random.RandomState(2021)
+    pd = data_algebra.default_data_model.pd
+    n = 50000
+    x = rng.normal(size=n)
+    x[rng.uniform(size=n) < 0.1] = numpy.nan
+    d = pd.DataFrame({"k": rng.choice(50, size=n), "x": x, "i": numpy.arange(n)})
+    evaluator = data_algebra.out_of_core.OutOfCoreEvaluator(
+        memory_budget=200000, block_rows=1000
+    )
+    for ops in [
+        describe_table(d, "d").order_rows(["k", "x", "i"], reverse=["x"]),
+        describe_table(d, "d").order_rows(["x", "i"], limit=3000),
+    ]:
+        expect = ops.transform(d)
+        res = evaluator.eval(ops, {"d": _chunks(d, 2000)})
+        assert data_algebra.test_util.equivalent_frames(
+            expect, res, check_row_order=True
+        )
+    assert evaluator.spilled_files > 50  # many runs of many blocks
+    # ties (in k) are merged in key order, and no rows are lost or repeated
+    ops = describe_table(d, "d").order_rows(["k"], reverse=["k"])
+    res = evaluator.eval(ops, {"d": _chunks(d, 2000)})
+    assert numpy.all(numpy.diff(res["k"]) <= 0)
+    assert sorted(res["i"]) == list(range(n))
@@ -0,0 +1,57 @@
+import threading
+
+import data_algebra
+import data_algebra.test_util
+import data_algebra.pandas_model
+from data_algebra.data_ops import *
+
+
+def test_parallel_branches():
+    pd = data_algebra.default_data_model.pd
+    fact = pd.DataFrame(
+        {"k1": [1, 2, 3, 1], "k2": ["a", "b", "a", "b"], "v": [1.0, 2.0, 3.0, 4.0]}
+    )
+    dim1 = pd.DataFrame({"k1": [1, 2, 3], "w1": [10.0, 20.0, 30.0]})
+    dim2 = pd.DataFrame({"k2": ["a", "b"], "w2": [100.0, 200.0]})
+
+    ops = (
+        describe_table(fact, "fact")
+        .extend({"v2": "v * 2"})
+        .natural_join(
+            b=describe_table(dim1, "dim1").extend({"w1x": "w1 + 1"}),
+            by=["k1"],
+            jointype="LEFT",
+        )
+        .natural_join(
+            b=describe_table(dim2, "dim2").extend({"w2x": "w2 + 1"}),
+            by=["k2"],
+            jointype="LEFT",
+        )
+        .extend({"total": "v2 + w1x + w2x"})
+    )
+    data_map = {"fact": fact, "dim1": dim1, "dim2": dim2}
+    expect = ops.eval(data_map)
+
+    # the three first extends only meet if they run at the same time
+    model = data_algebra.pandas_model.PandasModel()
+    barrier = threading.Barrier(3, timeout=10)
+    orig_extend_step = model.extend_step
+
+    def meeting_extend_step(op, **kwargs):
+        if op.sources[0].node_name == "TableDescription":
+            barrier.wait()
+        return orig_extend_step(op, **kwargs)
+
+    model.extend_step = meeting_extend_step
+
+    res = ops.eval(data_map, data_model=model, max_workers=3)
+    assert [c for c in res.columns] == [c for c in expect.columns]
+    assert data_algebra.test_util.equivalent_frames(expect, res, check_row_order=True)
+
+    # shared sub-DAGs still are evaluated once
+    shared = describe_table(fact, "fact").extend({"v2": "v * 2"})
+    ops_shared = shared.select_rows("v2 > 2").concat_rows(shared)
+    res_shared = ops_shared.eval({"fact": fact}, max_workers=2)
+    assert data_algebra.test_util.equivalent_frames(
+        ops_shared.eval({"fact": fact}), res_shared, check_row_order=True
+    )
@@ -0,0 +1,44 @@
+import numpy
+
+import data_algebra
+import data_algebra.test_util
+import data_algebra.parallel_pandas_model
+from data_algebra.data_ops import *
+
+
+def test_parallel_matches_serial():
+    rng = numpy.random.RandomState(2020)
+    n = 5000
+    x = rng.normal(size=n)
+    x[rng.uniform(size=n) < 0.1] = numpy.nan
+    g = rng.choice(["a", "b", "c", "d", "e", "f", "g"], size=n).astype(object)
+    g[rng.uniform(size=n) < 0.05] = None
+    d = data_algebra.default_data_model.pd.DataFrame(
+        {"g": g, "k": rng.choice(50, size=n), "x": x, "i": numpy.arange(n)}
+    )
+
+    td = describe_table(d, "d")
+    ops_list = [
+        td.extend(
+            {"r": "_row_number()", "cs": "x.cumsum()"}, partition_by=["g"], order_by=["i"]
+        ),
+        td.extend({"m": "x.max()", "n": "_size()"}, partition_by=["g", "k"]),
+        td.project(
+            {"s": "x.sum()", "med": "x.median()", "n": "_size()"}, group_by=["k", "g"]
+        ),
+        td.extend({"m": "x.mean()"}, partition_by=["k"])
+        .project({"m": "m.max()"}, group_by=["k"])
+        .order_rows(["k"]),
+    ]
+
+    with data_algebra.parallel_pandas_model.ParallelPandasModel(
+        max_workers=2, shard_rows=500
+    ) as model:
+        for ops in ops_list:
+            expect = ops.transform(d)
+            res = ops.transform(d, data_model=model)
+            assert [c for c in res.columns] == [c for c in expect.columns]
+            assert data_algebra.test_util.equivalent_frames(
+                expect, res, check_row_order=True
+            )
+        assert model.n_parallel_steps == 5
@@ -83,3 +83,51 @@ def test_project():
     )
 
     assert data_algebra.test_util.equivalent_frames(expect, res)
+
+
+def test_project_single_pass():
+    d = data_algebra.default_data_model.pd.DataFrame(
+        {
+            "g": ["b", "a", "b", "b", None],
+            "y": [1, 2, 3, 4, 5],
+            "z": [1.0, 2.0, 3.0, None, 5.0],
+        }
+    )
+    d["h"] = d["g"].astype("category")
+
+    ops = describe_table(d, "d").project(
+        {"ymax": "y.max()", "zmean": "z.mean()", "n": "_size()"}, group_by=["g"]
+    )
+    res = ops.transform(d)
+    expect = data_algebra.default_data_model.pd.DataFrame(
+        {"g": ["a", "b"], "ymax": [2, 4], "zmean": [2.0, 2.0], "n": [1, 3]}
+    )
+    assert data_algebra.test_util.equivalent_frames(expect, res)
+
+    # unobserved categories do not produce rows
+    ops_cat = describe_table(d, "d").project({"n": "_size()"}, group_by=["h"])
+    res_cat = ops_cat.transform(d[d["g"] == "b"])
+    expect_cat = data_algebra.default_data_model.pd.DataFrame({"h": ["b"], "n": [3]})
+    assert data_algebra.test_util.equivalent_frames(expect_cat, res_cat)
+
+
+def test_project_sorted_groups_zero_arg():
+    pd = data_algebra.default_data_model.pd
+    d = pd.DataFrame({"g": ["b", "a", "c", "a", "b"], "x": [1, 2, 3, 4, 5]})
+    ops = describe_table(d, "d").project(
+        {
+            "n": "_size()",
+            "s": "x.sum()",
+            "m": data_algebra.expr_rep.Expression(op="max", args=[]),
+        },
+        group_by=["g"],
+    )
+    res = ops.transform(d)
+    expect = pd.DataFrame(
+        {"g": ["a", "b", "c"], "n": [2, 2, 1], "s": [6, 6, 3], "m": [1, 1, 1]}
+    )
+    assert data_algebra.test_util.equivalent_frames(expect, res, check_row_order=True)
+    res = describe_table(d, "d").project(
+        {"m": data_algebra.expr_rep.Expression(op="max", args=[])}
+    ).transform(d)
+    assert list(res["m"]) == [1]
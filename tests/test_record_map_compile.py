@@ -0,0 +1,107 @@
+import pytest
+
+import data_algebra
+import data_algebra.cdata
+import data_algebra.test_util
+
+
+def _maps():
+    pd = data_algebra.default_data_model.pd
+    to_blocks = data_algebra.cdata.RecordMap(
+        blocks_out=data_algebra.cdata.RecordSpecification(
+            pd.DataFrame({"k": ["a", "b", "c"], "v": ["a", "b", "c"]}),
+            record_keys=["id"],
+            control_table_keys=["k"],
+        )
+    )
+    to_rows = data_algebra.cdata.RecordMap(
+        blocks_in=data_algebra.cdata.RecordSpecification(
+            pd.DataFrame({"k": ["a", "b", "c"], "v": ["A", "B", "C"]}),
+            record_keys=["id"],
+            control_table_keys=["k"],
+        )
+    )
+    to_blocks2 = data_algebra.cdata.RecordMap(
+        blocks_out=data_algebra.cdata.RecordSpecification(
+            pd.DataFrame({"g": ["p", "q"], "v1": ["A", "C"], "v2": ["B", None]}),
+            record_keys=["id"],
+            control_table_keys=["g"],
+        )
+    )
+    return to_blocks, to_rows, to_blocks2
+
+
+def test_record_map_compile_cached():
+    pd = data_algebra.default_data_model.pd
+    to_blocks, to_rows, _ = _maps()
+    compiled = to_blocks.compile()
+    assert isinstance(compiled, data_algebra.cdata.CompiledRecordMap)
+    assert to_blocks.compile() is compiled
+    for i in range(3):
+        d = pd.DataFrame(
+            {"id": [2 + i, 1 + i], "a": [1.0, 2.0], "b": [3.0, 4.0], "c": [5.0, 6.0]}
+        )
+        blocks = to_blocks.transform(d)
+        expect = data_algebra.cdata.rowrecs_to_blocks(
+            d, blocks_out=to_blocks.blocks_out
+        )
+        assert data_algebra.test_util.equivalent_frames(
+            blocks, expect, check_row_order=True
+        )
+        rows = to_rows.transform(blocks)
+        expect = data_algebra.cdata.blocks_to_rowrecs(
+            blocks, blocks_in=to_rows.blocks_in
+        )
+        assert data_algebra.test_util.equivalent_frames(
+            rows, expect, check_row_order=True
+        )
+        assert list(rows.columns) == ["id", "A", "B", "C"]
+
+
+def test_record_map_compose_fused():
+    pd = data_algebra.default_data_model.pd
+    to_blocks, to_rows, to_blocks2 = _maps()
+    d = pd.DataFrame(
+        {"id": [3, 1, 2], "a": [1.0, 2.0, 3.0], "b": [4.0, 5.0, 6.0], "c": [7, 8, 9]}
+    )
+    blocks = to_blocks.transform(d)
+    expect = to_blocks2.transform(to_rows.transform(blocks))
+
+    # rows to rows: no RecordMap form, the fused plan is built from the compiled maps
+    assert to_rows.compose(to_blocks) is None
+    renamer = to_rows.compile().compose(to_blocks.compile())
+    assert isinstance(renamer, data_algebra.cdata.CompiledRecordMap)
+    res = renamer.transform(d)
+    assert list(res.columns) == ["id", "A", "B", "C"]
+    assert list(res["id"]) == [1, 2, 3]
+    assert list(res["C"]) == [8, 9, 7]
+    assert res["C"].dtype == d["c"].dtype  # no trip through a mixed value column
+
+    # blocks to blocks
+    reshaper = to_blocks2.compose(to_rows)
+    assert isinstance(reshaper, data_algebra.cdata.RecordMap)
+    res = reshaper.transform(blocks)
+    assert data_algebra.test_util.equivalent_frames(res, expect, check_row_order=True)
+
+    # three maps, fused
+    res = d >> to_blocks >> to_rows >> to_blocks2
+    assert data_algebra.test_util.equivalent_frames(res, expect, check_row_order=True)
+    res = to_blocks2.compile().compose(renamer).transform(d)
+    assert data_algebra.test_util.equivalent_frames(res, expect, check_row_order=True)
+
+
+def test_record_map_missing_columns():
+    pd = data_algebra.default_data_model.pd
+    to_blocks, to_rows, _ = _maps()
+    d = pd.DataFrame({"id": [1, 2], "a": [1.0, 2.0], "b": [3.0, 4.0]})
+    with pytest.raises(ValueError):
+        to_blocks.transform(d)
+    blocks = pd.DataFrame({"id": [1, 1], "k": ["a", "b"]})
+    with pytest.raises(ValueError):
+        to_rows.transform(blocks)
+    # empty streams produce the same frame as transform() of no rows
+    empty = pd.DataFrame({c: [] for c in to_blocks.columns_needed})
+    res = [c for c in to_blocks.transform_stream([])]
+    assert len(res) == 1
+    assert [c for c in res[0].columns] == [c for c in to_blocks.transform(empty).columns]
+    assert [t for t in res[0].dtypes] == [t for t in to_blocks.transform(empty).dtypes]
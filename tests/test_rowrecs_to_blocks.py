@@ -0,0 +1,40 @@
+import data_algebra
+import data_algebra.test_util
+import data_algebra.cdata
+
+
+def test_rowrecs_to_blocks_layout_and_types():
+    pd = data_algebra.default_data_model.pd
+    d = pd.DataFrame(
+        {
+            "id": [2, 1],
+            "a": [10, 20],
+            "b": [30, 40],
+            "code_a": ["01", "02"],
+            "code_b": ["03", "04"],
+        }
+    )
+    control_table = pd.DataFrame(
+        {"part": ["b", "a"], "v": ["b", "a"], "code": ["code_b", "code_a"]}
+    )
+    record_spec = data_algebra.cdata.RecordSpecification(
+        control_table, control_table_keys=["part"], record_keys=["id"]
+    )
+    res = data_algebra.cdata.rowrecs_to_blocks(d, blocks_out=record_spec)
+    expect = pd.DataFrame(
+        {
+            "id": [1, 1, 2, 2],
+            "part": ["a", "b", "a", "b"],
+            "v": [20, 40, 10, 30],
+            "code": ["02", "04", "01", "03"],
+        }
+    )
+    assert [c for c in res.columns] == ["id", "part", "v", "code"]
+    assert data_algebra.test_util.equivalent_frames(expect, res, check_row_order=True)
+    # types come from the source columns, numeric looking strings stay strings
+    assert res["v"].dtype == d["a"].dtype
+    assert all([isinstance(v, str) for v in res["code"]])
+
+    # and back
+    back = data_algebra.cdata.blocks_to_rowrecs(res, blocks_in=record_spec)
+    assert data_algebra.test_util.equivalent_frames(d, back)
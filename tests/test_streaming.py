@@ -0,0 +1,85 @@
+import pytest
+
+import data_algebra
+import data_algebra.test_util
+from data_algebra.data_ops import *
+
+
+def _chunks(d, size):
+    return [
+        d.iloc[i : i + size, :].reset_index(drop=True)
+        for i in range(0, d.shape[0], size)
+    ]
+
+
+def test_stream_row_wise_and_concat():
+    pd = data_algebra.default_data_model.pd
+    d = pd.DataFrame({"x": range(10), "y": [i % 3 for i in range(10)]})
+
+    td = describe_table(d, "d")
+    ops = (
+        td.extend({"z": "x * 2 + y"})
+        .select_rows("z > 3")
+        .rename_columns({"w": "z"})
+        .drop_columns(["y"])
+        .concat_rows(
+            td.select_rows("y == 0").extend({"w": "x"}).select_columns(["x", "w"])
+        )
+    )
+
+    expect = ops.transform(d)
+    chunks = [c for c in ops.eval_stream({"d": _chunks(d, 3)})]
+    assert len(chunks) == 4
+    res = pd.concat(chunks, ignore_index=True)
+    assert data_algebra.test_util.equivalent_frames(expect, res)
+
+
+def test_stream_project():
+    pd = data_algebra.default_data_model.pd
+    d = pd.DataFrame(
+        {
+            "g": ["a", "b", "a", "c", "b", "a", "c"],
+            "x": [1.0, 2.0, None, 4.0, 5.0, 6.0, 7.0],
+            "y": [1, 2, 3, 4, 5, 6, 7],
+        }
+    )
+
+    ops = (
+        describe_table(d, "d")
+        .extend({"x2": "x * 2"})
+        .project(
+            {
+                "sx": "x2.sum()",
+                "mx": "x.mean()",
+                "lo": "y.min()",
+                "hi": "y.max()",
+                "n": "_size()",
+                "nx": "x.count()",
+            },
+            group_by=["g"],
+        )
+        .order_rows(["g"])  # fine on the single chunk project() result
+    )
+    expect = ops.transform(d)
+    chunks = [c for c in ops.eval_stream({"d": iter(_chunks(d, 2))})]
+    assert len(chunks) == 1
+    assert data_algebra.test_util.equivalent_frames(expect, chunks[0])
+
+    ops_total = describe_table(d, "d").project({"sy": "y.sum()", "my": "y.mean()"})
+    res = [c for c in ops_total.eval_stream({"d": _chunks(d, 3)})]
+    assert data_algebra.test_util.equivalent_frames(ops_total.transform(d), res[0])
+
+
+def test_stream_not_streamable():
+    d = data_algebra.default_data_model.pd.DataFrame({"g": [1, 2], "x": [1, 2]})
+
+    with pytest.raises(ValueError):
+        describe_table(d, "d").order_rows(["x"]).eval_stream({"d": [d]})
+    with pytest.raises(ValueError):
+        describe_table(d, "d").extend(
+            {"r": "_row_number()"}, order_by=["x"]
+        ).eval_stream({"d": [d]})
+    with pytest.raises(ValueError):
+        describe_table(d, "d").project(
+            {"m": "x.median()"}, group_by=["g"]
+        ).eval_stream({"d": [d]})
@@ -1,4 +1,6 @@
 
+import sqlite3
+
 import pytest
 
 import data_algebra.SQLite
@@ -142,7 +144,19 @@ def test_convert_records_transform_1():
     res_pandas = ops.transform(iris_small)
     assert data_algebra.test_util.equivalent_frames(res_pandas, expect)
 
+    # small control tables are written into the query
     db_model = data_algebra.SQLite.SQLiteModel()
+    temp_tables = dict()
+    sql = ops.to_sql(db_model, temp_tables=temp_tables)
+    assert len(temp_tables) == 0
+    assert "UNION ALL" in sql
+    with sqlite3.connect(":memory:") as conn:
+        db_model.insert_table(conn, iris_small, table_name="iris_small")
+        res_db = db_model.read_query(conn, sql)
+    assert data_algebra.test_util.equivalent_frames(res_db, expect)
+
+    # larger ones are returned as temporary tables
+    db_model.max_inline_control_rows = 2
     with pytest.raises(ValueError):
         ops.to_sql(db_model)
 
@@ -154,3 +168,25 @@ def test_convert_records_transform_1():
 
     data_algebra.test_util.check_transform(ops, data, expect)
 
+
+def test_convert_records_sql_narrowed():
+    pd = data_algebra.default_data_model.pd
+    d = pd.DataFrame(
+        {"id": [1, 2], "a": [1.0, 2.0], "b": [3.0, 4.0], "unused": ["x", "y"]}
+    )
+    record_spec = data_algebra.cdata.RecordSpecification(
+        pd.DataFrame({"k": ["a", "b"], "v": ["a", "b"]}),
+        control_table_keys=["k"],
+        record_keys=["id"],
+    )
+    ops = (
+        describe_table(d, "d")
+        .extend({"a": "a + 1"})
+        .convert_records(RecordMap(blocks_out=record_spec))
+    )
+    sql = ops.to_sql(data_algebra.SQLite.SQLiteModel())
+    assert "unused" not in sql
+    expect = pd.DataFrame(
+        {"id": [1, 1, 2, 2], "k": ["a", "b", "a", "b"], "v": [2.0, 3.0, 3.0, 4.0]}
+    )
+    data_algebra.test_util.check_transform(ops, d, expect)
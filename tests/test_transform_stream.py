@@ -0,0 +1,122 @@
+import numpy
+import pytest
+
+import data_algebra
+import data_algebra.cdata
+import data_algebra.test_util
+from data_algebra.data_ops import *
+
+
+def _chunks(d, size):
+    return [
+        d.iloc[i : i + size, :].reset_index(drop=True)
+        for i in range(0, d.shape[0], size)
+    ]
+
+
+def _record_map():
+    pd = data_algebra.default_data_model.pd
+    return data_algebra.cdata.RecordMap(
+        blocks_in=data_algebra.cdata.RecordSpecification(
+            pd.DataFrame({"measure": ["a", "b", "c"], "value": ["a", "b", "c"]}),
+            record_keys=["id"],
+            control_table_keys=["measure"],
+        )
+    )
+
+
+def _blocks(n=20, seed=2020):
+    # blocks sorted by id, some records missing some measures
+    rng = numpy.random.RandomState(seed)
+    pd = data_algebra.default_data_model.pd
+    d = pd.DataFrame(
+        {
+            "id": numpy.repeat(numpy.arange(n), 3),
+            "measure": ["a", "b", "c"] * n,
+            "value": rng.normal(size=3 * n),
+        }
+    )
+    return d.loc[rng.uniform(size=d.shape[0]) > 0.2].reset_index(drop=True)
+
+
+def test_transform_stream_blocks_to_rows():
+    pd = data_algebra.default_data_model.pd
+    mp = _record_map()
+    d = _blocks()
+    expect = mp.transform(d)
+    for size in [1, 2, 4, 7, 100]:
+        chunks = [c for c in mp.transform_stream(_chunks(d, size))]
+        res = pd.concat(chunks, ignore_index=True)
+        assert data_algebra.test_util.equivalent_frames(
+            expect, res, check_row_order=True
+        )
+        assert numpy.all(numpy.diff(res["id"]) > 0)  # no record split or repeated
+    res = [c for c in mp.transform_stream([])]
+    assert len(res) == 1
+    assert res[0].shape[0] == 0
+    assert list(res[0].columns) == ["id", "a", "b", "c"]
+
+    back = pd.concat(
+        [c for c in mp.inverse().transform_stream(_chunks(expect, 3))],
+        ignore_index=True,
+    )
+    assert data_algebra.test_util.equivalent_frames(
+        mp.inverse().transform(expect), back, check_row_order=True
+    )
+
+
+def test_transform_stream_unsorted():
+    mp = _record_map()
+    d = _blocks()
+    chunks = _chunks(d, 10)
+    with pytest.raises(ValueError):
+        [c for c in mp.transform_stream([chunks[1], chunks[0]])]
+
+
+def test_transform_stream_eval_stream():
+    pd = data_algebra.default_data_model.pd
+    mp = _record_map()
+    d = _blocks()
+    ops = (
+        describe_table(d, "d")
+        .extend({"value": "value * 2"})
+        .convert_records(mp)
+        .extend({"s": "a + b"})
+    )
+    expect = ops.transform(d)
+    res = pd.concat([c for c in ops.eval_stream({"d": _chunks(d, 5)})])
+    assert data_algebra.test_util.equivalent_frames(expect, res, check_row_order=True)
+
+
+def test_transform_stream_rows_sorted_across_chunks():
+    pd = data_algebra.default_data_model.pd
+    to_blocks = _record_map().inverse()
+    d = pd.DataFrame({"id": [3, 1, 2, 0], "a": [1, 2, 3, 4], "b": [5, 6, 7, 8], "c": 0})
+    # each chunk is sorted on its own, records must also be sorted across chunks
+    with pytest.raises(ValueError):
+        [c for c in to_blocks.transform_stream([d.iloc[0:2, :], d.iloc[2:4, :]])]
+    ds = d.sort_values("id").reset_index(drop=True)
+    chunks = [ds.iloc[[1, 0], :], ds.iloc[[3, 2], :]]  # unsorted within chunks is fine
+    res = pd.concat([c for c in to_blocks.transform_stream(chunks)], ignore_index=True)
+    assert data_algebra.test_util.equivalent_frames(
+        to_blocks.transform(d), res, check_row_order=True
+    )
+    # a record key repeated across chunks is a keying error when checked
+    chunks = [ds.iloc[0:2, :], ds.iloc[1:4, :]]
+    [c for c in to_blocks.transform_stream(chunks)]
+    with pytest.raises(ValueError):
+        [
+            c
+            for c in to_blocks.transform_stream(chunks, check_blocks_out_keying=True)
+        ]
+    # rows with missing keys come last
+    dn = pd.DataFrame({"id": [0.0, numpy.nan, 1.0], "a": 1, "b": 2, "c": 3})
+    with pytest.raises(ValueError):
+        [c for c in to_blocks.transform_stream([dn.iloc[0:2, :], dn.iloc[2:3, :]])]
+    res = pd.concat(
+        [c for c in to_blocks.transform_stream([dn.iloc[[0, 2], :], dn.iloc[[1], :]])],
+        ignore_index=True,
+    )
+    assert data_algebra.test_util.equivalent_frames(
+        to_blocks.transform(dn), res, check_row_order=True
+    )
@@ -0,0 +1,118 @@
+import data_algebra
+import data_algebra.test_util
+from data_algebra.data_ops import *
+
+
+def test_window_fused_orderings():
+    d = data_algebra.default_data_model.pd.DataFrame(
+        {
+            "g": ["a", "b", "a", "b", "a", "b", "a"],
+            "x": [3, 1, 1, 2, 2, 3, 4],
+            "v": [30.0, 10.0, 10.0, 20.0, 20.0, 30.0, 40.0],
+        }
+    )
+
+    ops = describe_table(d, "d").extend(
+        {
+            "row_number": "_row_number()",
+            "cumsum_v": "v.cumsum()",
+            "shift_v": "v.shift()",
+            "max_v": "v.max()",
+        },
+        partition_by=["g"],
+        order_by=["x"],
+        reverse=["x"],
+    )
+
+    res = ops.transform(d)
+
+    expect = data_algebra.default_data_model.pd.DataFrame(
+        {
+            "g": ["a", "b", "a", "b", "a", "b", "a"],
+            "x": [3, 1, 1, 2, 2, 3, 4],
+            "v": [30.0, 10.0, 10.0, 20.0, 20.0, 30.0, 40.0],
+            "row_number": [2, 3, 4, 2, 3, 1, 1],
+            "cumsum_v": [70.0, 60.0, 100.0, 50.0, 90.0, 30.0, 40.0],
+            "shift_v": [40.0, 20.0, 20.0, 30.0, 30.0, None, None],
+            "max_v": [40.0, 30.0, 40.0, 30.0, 40.0, 30.0, 40.0],
+        }
+    )
+
+    # rows come back in their original order
+    assert data_algebra.test_util.equivalent_frames(
+        res, expect, check_row_order=True
+    )
+
+
+def test_window_fused_no_partition():
+    d = data_algebra.default_data_model.pd.DataFrame(
+        {"x": [3, 1, 2], "v": [30, 10, 20],}
+    )
+
+    ops = describe_table(d, "d").extend(
+        {"row_number": "_row_number()", "cumsum_v": "v.cumsum()",}, order_by=["x"],
+    )
+
+    res = ops.transform(d)
+
+    expect = data_algebra.default_data_model.pd.DataFrame(
+        {
+            "x": [3, 1, 2],
+            "v": [30, 10, 20],
+            "row_number": [3, 1, 2],
+            "cumsum_v": [60, 10, 30],
+        }
+    )
+
+    assert data_algebra.test_util.equivalent_frames(
+        res, expect, check_row_order=True
+    )
+
+
+def test_window_fused_ties():
+    d = data_algebra.default_data_model.pd.DataFrame(
+        {"x": [1, 1, 2, 1], "v": [30, 10, 20, 20]}
+    )
+
+    ops = describe_table(d, "d").extend(
+        {"row_number": "_row_number()", "cumsum_v": "v.cumsum()"}, order_by=["x"],
+    )
+
+    res = ops.transform(d)
+
+    # ties in x: row_number keeps input order, cumsum also orders by v
+    expect = data_algebra.default_data_model.pd.DataFrame(
+        {
+            "x": [1, 1, 2, 1],
+            "v": [30, 10, 20, 20],
+            "row_number": [1, 2, 4, 3],
+            "cumsum_v": [60, 10, 80, 30],
+        }
+    )
+
+    assert data_algebra.test_util.equivalent_frames(
+        res, expect, check_row_order=True
+    )
+
+
+def test_window_fused_column_order():
+    d = data_algebra.default_data_model.pd.DataFrame(
+        {"g": [1, 1, 2, 2], "o": [2, 1, 1, 2], "x": [1.0, 2.0, 3.0, 4.0]}
+    )
+    ops = describe_table(d, "d").extend(
+        {
+            "rn": "_row_number()",
+            "cs": "x.cumsum()",
+            "cx": "o.cumsum()",
+            "m": "x.max()",
+            "s": "o.sum()",
+        },
+        partition_by=["g"],
+        order_by=["o"],
+    )
+    res = ops.transform(d)
+    assert [c for c in res.columns] == ops.column_names
+    assert list(res["rn"]) == [2, 1, 1, 2]
+    assert list(res["cs"]) == [3.0, 2.0, 3.0, 7.0]
+    assert list(res["m"]) == [2.0, 2.0, 4.0, 4.0]
+    assert list(res["s"]) == [3, 3, 3, 3]